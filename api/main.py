@@ -1,49 +1,241 @@
-import uvicorn
+# ruff: noqa: E402
+import time
+
+# startup timings: measured from the first import of this module
+_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-import yaml  # Use PyYAML to parse YAML content
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+_imported_framework = time.perf_counter()
+
+from modules import (
+    AdmissionController,
+    AdmissionRejected,
+    ArtifactRegistry,
+    DriftMonitor,
+    MetricsMiddleware,
+    MicroBatcher,
+    PredictionCache,
+    PredictionStore,
+    RequestIdMiddleware,
+    ShadowScorer,
+    TrainingJobQueue,
+    load_config,
+    render_metrics,
+    setup_audit_writer,
+    setup_logger,
+    get_logger,
+    stop_logger,
+    update_threadpool_gauges,
+)
+from modules.metrics import METRICS, STARTUP_SECONDS
+
+_imported_modules = time.perf_counter()
+
+from routes import monitoring, predict, predictions, registry, train
+
+_imported_routes = time.perf_counter()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precargar modelo, pipelines e imputaciones antes de aceptar solicitudes
+    # (with the pre-fork server they are already loaded by the master and shared)
+    started = time.perf_counter()
+    app.state.registry.snapshot()
+    ready = time.perf_counter()
+    STARTUP_SECONDS.set(ready - started, phase='artifacts')
+    STARTUP_SECONDS.set(ready - _started, phase='total')
+    app.state.logger.info(
+        f'Servidor listo en {ready - _started:.3f} s desde la importación'
+    )
+    yield
+    # Procesar los micro-lotes pendientes antes de apagar
+    if app.state.batcher is not None:
+        await app.state.batcher.close()
+    # Detener el executor de predicción
+    app.state.admission.close()
+    # Descartar el scoring en sombra pendiente
+    app.state.shadow.close()
+    # Cancelar los entrenamientos pendientes
+    app.state.training.close()
+    # Vaciar la cola de auditoría
+    if app.state.audit_writer is not None:
+        app.state.audit_writer.close()
+    # Insertar las predicciones pendientes
+    if app.state.predictions is not None:
+        app.state.predictions.close()
+    # Escribir los registros de log pendientes
+    stop_logger()
 
-from modules import init_config, setup_logger, get_logger
-from routes import predict, train
 
 # Inicialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-# Inicialize configuration
-cfg = init_config()
+# Inicialize configuration from the frozen snapshot (compiled with Hydra if stale)
+cfg = load_config()
+_loaded_config = time.perf_counter()
 
 app.state.cfg = cfg
+
+
 def custom_openapi():
     cf = app.state.cfg
     if app.openapi_schema:
         return app.openapi_schema
     try:
-        with open(cf['api']['doc'], "r") as file:
-            swagger_content = yaml.safe_load(file)  # Use yaml.safe_load to load the YAML file
+        import yaml  # Use PyYAML to parse YAML content
+
+        with open(cf['api']['doc'], 'r') as file:
+            swagger_content = yaml.safe_load(
+                file
+            )  # Use yaml.safe_load to load the YAML file
             app.openapi_schema = swagger_content
             return app.openapi_schema
     except Exception as e:
         # Log the error and provide an informative response
-        app.state.logger.error(f"Error loading OpenAPI schema from file {cf['api']['doc']}", exc_info=True)
-        return JSONResponse({"error": f"Failed to load OpenAPI schema: {str(e)}"}, status_code=500)
+        app.state.logger.error(
+            f'Error loading OpenAPI schema from file {cf["api"]["doc"]}', exc_info=True
+        )
+        return JSONResponse(
+            {'error': f'Failed to load OpenAPI schema: {str(e)}'}, status_code=500
+        )
+
 
 # Set the custom OpenAPI generation function
 app.openapi = custom_openapi
 # Inicialize logger
 setup_logger(cfg)
 app.state.logger = get_logger()
-app.state.logger.info("Logger inicializado en modo global.")
+app.state.logger.info('Logger inicializado en modo global.')
+
+# Inicialize background audit writer for logger.csv
+app.state.audit_writer = setup_audit_writer(cfg)
+
+# Inicialize artifact registry (loaded on startup, lazily if lifespan does not run)
+app.state.registry = ArtifactRegistry(cfg)
+
+# Inicialize admission control and the prediction executor
+app.state.admission = AdmissionController(cfg)
+
+# Inicialize drift monitoring of inputs, imputations and predictions
+app.state.drift = DriftMonitor.from_config(cfg)
+
+# Inicialize micro-batcher for single-claim predictions
+app.state.batcher = (
+    MicroBatcher(cfg, app.state.registry, app.state.admission, app.state.drift)
+    if cfg.batching.enabled
+    else None
+)
+
+# Inicialize shadow scoring of the candidate version
+app.state.shadow = ShadowScorer(cfg, app.state.registry)
+
+# Inicialize prediction cache
+app.state.cache = PredictionCache.from_config(cfg)
+
+# Inicialize prediction store (history by claim_id, batched inserts in the background)
+app.state.predictions = PredictionStore.from_config(cfg)
+
+# Inicialize training job queue (worker processes start with the first job)
+app.state.training = TrainingJobQueue(cfg)
+
+# Add request id to every log record
+app.add_middleware(RequestIdMiddleware)
+
+# Add request latency metrics
+app.add_middleware(MetricsMiddleware)
+
+# Queue depth gauges
+METRICS.gauge(
+    'hdi_admission_in_flight',
+    'Solicitudes admitidas en curso en el camino de predicción.',
+).set_function(lambda: app.state.admission.in_flight)
+METRICS.gauge(
+    'hdi_admission_queue_depth', 'Solicitudes esperando a ser admitidas.'
+).set_function(lambda: app.state.admission.queued)
+METRICS.gauge(
+    'hdi_predict_executor_busy_threads',
+    'Hilos ocupados del executor de predicción (pipeline, modelo y micro-lotes).',
+).set_function(lambda: app.state.admission.executor_busy)
+METRICS.gauge(
+    'hdi_predict_executor_queue_depth',
+    'Tareas esperando un hilo del executor de predicción.',
+).set_function(lambda: app.state.admission.executor_queued)
+if app.state.batcher is not None:
+    METRICS.gauge(
+        'hdi_batcher_pending', 'Siniestros esperando en el micro-batcher.'
+    ).set_function(lambda: app.state.batcher.pending)
+if app.state.audit_writer is not None:
+    METRICS.gauge(
+        'hdi_audit_queue_depth', 'Filas de auditoría pendientes de escribir.'
+    ).set_function(app.state.audit_writer.pending)
+    METRICS.gauge(
+        'hdi_audit_dropped', 'Filas de auditoría descartadas por cola llena.'
+    ).set_function(lambda: app.state.audit_writer.dropped)
+
+if app.state.predictions is not None:
+    METRICS.gauge(
+        'hdi_prediction_store_pending',
+        'Predicciones pendientes de insertar en el almacén.',
+    ).set_function(app.state.predictions.pending)
+if app.state.cache is not None:
+    METRICS.gauge(
+        'hdi_cache_entries', 'Entradas en la caché de predicciones en memoria.'
+    ).set_function(lambda: len(app.state.cache))
 
 # Add routes
 app.include_router(predict)
 app.include_router(train)
+app.include_router(registry)
+app.include_router(predictions)
+app.include_router(monitoring)
 
-@app.get("/")
+# Startup timings up to the end of this module; artifacts are loaded in lifespan
+startup_timings = {
+    'import_framework': _imported_framework - _started,
+    'import_modules': _imported_modules - _imported_framework,
+    'import_routes': _imported_routes - _imported_modules,
+    'config': _loaded_config - _imported_routes,
+    'setup': time.perf_counter() - _loaded_config,
+}
+for phase, seconds in startup_timings.items():
+    STARTUP_SECONDS.set(seconds, phase=phase)
+app.state.logger.info(
+    'Tiempos de arranque: '
+    + ', '.join(f'{phase}={seconds:.3f}s' for phase, seconds in startup_timings.items())
+)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    # shed load fast, telling the client when to retry
+    return JSONResponse(
+        {'detail': exc.detail},
+        status_code=exc.status_code,
+        headers={'Retry-After': str(exc.retry_after)},
+    )
+
+
+@app.get('/')
 def root():
-    return {"message": "Bienvenido al API de predicción de siniestros de HDI"}
+    return {'message': 'Bienvenido al API de predicción de siniestros de HDI'}
 
-if __name__ == "__main__":
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    update_threadpool_gauges()
+    return PlainTextResponse(render_metrics(), media_type='text/plain; version=0.0.4')
+
+
+if __name__ == '__main__':
     imputacion_path = cfg.pipeline.imputacion_path
-    print(f"Usando el archivo de imputación en la ruta: {imputacion_path}")
+    print(f'Usando el archivo de imputación en la ruta: {imputacion_path}')
+
+    import uvicorn
 
     # start FastAPI
     uvicorn.run(app, host=cfg.api.host, port=cfg.api.port)
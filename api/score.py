@@ -0,0 +1,66 @@
+"""Scoring masivo fuera de línea con un proceso por núcleo.
+
+Uso:
+    python -m api.score data/claims_dataset.csv predicciones.parquet --workers 8
+"""
+
+import argparse
+import sys
+
+from modules import load_config, setup_logger, stop_logger
+from modules.offline import score_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Predice un archivo de siniestros con un pool de procesos.'
+    )
+    parser.add_argument('input', help='Archivo de siniestros delimitado con cabecera.')
+    parser.add_argument('output', help='Archivo de salida (.parquet o .csv).')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Procesos (por defecto, uno por núcleo).',
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=None,
+        help='Rangos de bytes (por defecto, 4 por proceso).',
+    )
+    parser.add_argument(
+        '--chunk-rows', type=int, default=None, help='Filas por bloque vectorizado.'
+    )
+    parser.add_argument('--sep', default='|', help='Separador de columnas.')
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    setup_logger(cfg)
+    try:
+        report = score_file(
+            args.input,
+            args.output,
+            cfg,
+            workers=args.workers,
+            shards=args.shards,
+            chunk_rows=args.chunk_rows,
+            sep=args.sep,
+        )
+    finally:
+        stop_logger()
+
+    for pid, stats in sorted(report['workers'].items()):
+        print(
+            f'proceso {pid:<8} {stats["rows"]:>10} filas  {stats["seconds"]:>8.2f} s  '
+            f'{stats["rows_per_sec"]:>12.1f} filas/s'
+        )
+    print(
+        f'total            {report["rows"]:>10} filas  {report["seconds"]:>8.2f} s  '
+        f'{report["rows_per_sec"]:>12.1f} filas/s  ({report["errors"]} errores)'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
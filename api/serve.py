@@ -0,0 +1,37 @@
+"""Servidor pre-fork: un maestro carga los artefactos una vez y crea los workers con fork.
+
+Uso:
+    python -m api.serve --workers 4 --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Sirve la API con varios workers que comparten los artefactos.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Workers (por defecto server.workers; 0 para uno por núcleo).',
+    )
+    parser.add_argument(
+        '--host', default=None, help='Dirección (por defecto api.host).'
+    )
+    parser.add_argument(
+        '--port', type=int, default=None, help='Puerto (por defecto api.port).'
+    )
+    args = parser.parse_args(argv)
+
+    from api.main import app, cfg
+    from modules.prefork import PreforkServer
+
+    PreforkServer(app, cfg, workers=args.workers, host=args.host, port=args.port).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
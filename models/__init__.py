@@ -1,2 +1,3 @@
 from .claim_model import Claim
 from .train_model import TrainModelRequest
+from .registry_model import PublishVersionRequest, ShadowRequest
@@ -0,0 +1,15 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class PublishVersionRequest(BaseModel):
+    model_path: Optional[str] = None
+    metadata: Dict[str, Any] = {}
+
+    class Config:
+        protected_namespaces = ()
+
+
+class ShadowRequest(BaseModel):
+    version: Optional[str] = None
@@ -1,4 +1,22 @@
+from .preprocessing import full_pipeline, inspect_pipeline, load_pipeline, pipeline_report
+from .fused import FusedTransform
+from .linear import LinearKernel, compile_linear_model, export_linear_model, load_linear_model
 from .mlflow import load_model, train_model
-from .preprocessing import full_pipeline
-from .config_manager import init_config
-from .logger_manager import setup_logger, get_logger, log_to_csv
+from .cache import PredictionCache, cache_key
+from .predictions import PredictionStore
+from .drift import DriftMonitor, QuantileSketch
+from .rules import Rule, RuleEngine
+from .schema import CompiledSchema, SchemaError
+from .scoring import predict_frame, score_batch, score_claims
+from .config_manager import FrozenConfig, compile_config, init_config, load_config
+from .logger_manager import (
+    setup_logger, get_logger, log_to_csv, log_rows_to_csv, setup_audit_writer, AuditLogWriter,
+    start_logger, stop_logger, request_id_var, RequestIdMiddleware
+)
+from .registry import ArtifactRegistry, ArtifactSnapshot
+from .versions import ModelStore
+from .shadow import ShadowScorer
+from .admission import AdmissionController, AdmissionRejected, Deadline
+from .batching import MicroBatcher
+from .jobs import TrainingJobQueue
+from .metrics import MetricsMiddleware, render_metrics, track, update_threadpool_gauges
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import functools
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger
+from modules.metrics import METRICS, STAGE_LATENCY
+
+# cabecera con la que el cliente acorta el plazo de su solicitud, en milisegundos
+TIMEOUT_HEADER = 'x-request-timeout-ms'
+
+ADMISSION_REJECTED = METRICS.counter(
+    'hdi_admission_rejected_total',
+    'Solicitudes rechazadas por el control de admisión por motivo.',
+    ('reason',),
+)
+
+
+class AdmissionRejected(Exception):
+    """Solicitud rechazada por el control de admisión.
+
+    Args:
+        reason (str): Motivo (`queue_full`, `queue_timeout` o `deadline`).
+        status_code (int): Código HTTP de la respuesta (429 o 503).
+        retry_after (int): Segundos que el cliente debe esperar antes de reintentar.
+        detail (str): Mensaje de la respuesta.
+    """
+
+    def __init__(self, reason, status_code, retry_after, detail):
+        super().__init__(detail)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class Deadline:
+    """Plazo de una solicitud medido con `time.perf_counter`.
+
+    Args:
+        expires (float): Instante de vencimiento (perf_counter), o `math.inf` sin plazo.
+        retry_after (int): Segundos de `Retry-After` si el plazo vence.
+    """
+
+    def __init__(self, expires, retry_after=1):
+        self.expires = expires
+        self._retry_after = retry_after
+
+    def remaining(self):
+        """Segundos que quedan hasta el vencimiento (negativo si ya venció)."""
+        return self.expires - time.perf_counter()
+
+    def timeout(self):
+        """Segundos restantes como timeout de `asyncio.wait_for` (None sin plazo)."""
+        if math.isinf(self.expires):
+            return None
+        return max(0.0, self.remaining())
+
+    def check(self, stage):
+        """Comprueba el plazo antes de empezar una etapa.
+
+        Args:
+            stage (str): Etapa que se va a ejecutar.
+
+        Raises:
+            AdmissionRejected: Con código 503 si el plazo ya venció.
+        """
+        if self.remaining() <= 0:
+            ADMISSION_REJECTED.inc(reason='deadline')
+            raise AdmissionRejected(
+                'deadline',
+                503,
+                self._retry_after,
+                f'Plazo de la solicitud vencido antes de la etapa {stage}',
+            )
+
+
+class AdmissionController:
+    """Control de admisión del camino de predicción.
+
+    Admite como máximo `admission.max_concurrency` solicitudes a la vez; las siguientes esperan
+    en una cola FIFO de `admission.max_queue` posiciones durante `admission.queue_timeout_ms`
+    como máximo. Con la cola llena la solicitud se rechaza al instante con 429 y con la espera
+    o el plazo agotados con 503, en ambos casos con `Retry-After`, de modo que la latencia de
+    las solicitudes admitidas se mantiene acotada en lugar de crecer con la cola.
+
+    Cada solicitud tiene un plazo de `admission.deadline_ms` desde que llegó (el cliente puede
+    acortarlo con la cabecera `X-Request-Timeout-Ms`), que se comprueba antes de cada etapa.
+    El pipeline y el modelo se ejecutan en un executor propio de `admission.executor_workers`
+    hilos en lugar del threadpool compartido de Starlette.
+
+    El estado de admisión se modifica solo desde el event loop, por lo que no necesita locks;
+    los contadores del executor (`executor_busy`, `executor_queued`) sí, porque los actualizan
+    sus hilos.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra con la sección `admission`.
+    """
+
+    def __init__(self, cfg: 'DictConfig'):
+        admission = cfg.admission
+        self.enabled = bool(admission.enabled)
+        self.max_concurrency = int(admission.max_concurrency)
+        self.max_queue = int(admission.max_queue)
+        self._queue_timeout = float(admission.queue_timeout_ms) / 1000
+        self._deadline = float(admission.deadline_ms) / 1000
+        self._retry_after = int(admission.retry_after_seconds)
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(admission.executor_workers),
+            thread_name_prefix='predict',
+        )
+        self._in_flight = 0
+        self._waiters = deque()
+        self._executor_lock = threading.Lock()
+        self._executor_busy = 0
+        self._executor_queued = 0
+
+    @property
+    def in_flight(self):
+        """Número de solicitudes admitidas en curso."""
+        return self._in_flight
+
+    @property
+    def queued(self):
+        """Número de solicitudes esperando a ser admitidas."""
+        return len(self._waiters)
+
+    @property
+    def executor_busy(self):
+        """Número de hilos del executor de predicción ejecutando una tarea."""
+        return self._executor_busy
+
+    @property
+    def executor_queued(self):
+        """Número de tareas enviadas al executor de predicción que esperan un hilo."""
+        return self._executor_queued
+
+    def deadline(self, request):
+        """Plazo de una solicitud, medido desde su llegada.
+
+        Args:
+            request (Request): Solicitud HTTP; se usa `request.state.request_start` si existe.
+
+        Returns:
+            Deadline: Plazo de la solicitud (sin límite si el control está deshabilitado).
+        """
+        if not self.enabled:
+            return Deadline(math.inf, self._retry_after)
+        seconds = self._deadline
+        header = request.headers.get(TIMEOUT_HEADER)
+        if header:
+            try:
+                seconds = min(seconds, float(header) / 1000)
+            except ValueError:
+                pass
+        start = getattr(request.state, 'request_start', None) or time.perf_counter()
+        return Deadline(start + seconds, self._retry_after)
+
+    def _reject(self, reason, status_code, detail):
+        ADMISSION_REJECTED.inc(reason=reason)
+        get_logger().warning(
+            f'Solicitud rechazada por el control de admisión: {detail}'
+        )
+        return AdmissionRejected(reason, status_code, self._retry_after, detail)
+
+    async def _acquire(self, deadline):
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(
+                'queue_full', 429, 'Servidor saturado, cola de admisión llena'
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        remaining = deadline.timeout()
+        timeout = (
+            self._queue_timeout
+            if remaining is None
+            else min(self._queue_timeout, remaining)
+        )
+        try:
+            # el hueco se transfiere al resolver el future, sin pasar por _in_flight
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # el hueco llegó a la vez que el timeout o la cancelación
+                self._release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(
+                    'queue_timeout', 503, 'Servidor saturado, tiempo de espera agotado'
+                ) from None
+            raise
+
+    def _release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, deadline):
+        """Reserva un hueco de concurrencia durante el bloque.
+
+        Args:
+            deadline (Deadline): Plazo de la solicitud; limita también la espera en cola.
+
+        Raises:
+            AdmissionRejected: Si la cola está llena (429) o si la espera o el plazo se agotan
+                antes de obtener el hueco (503).
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        await self._acquire(deadline)
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage='admission_wait')
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def run(self, function, *args):
+        """Ejecuta una función en el executor de predicción, propagando el contexto
+        (id de la solicitud) como `run_in_threadpool`.
+
+        Returns:
+            Any: Resultado de la función.
+        """
+        context = contextvars.copy_context()
+        # la tarea sale de la cola una sola vez: al empezar en un hilo o al cancelarse antes
+        dequeued = []
+        with self._executor_lock:
+            self._executor_queued += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                functools.partial(self._call, dequeued, context, function, *args),
+            )
+        finally:
+            self._dequeue(dequeued)
+
+    def _dequeue(self, dequeued):
+        with self._executor_lock:
+            if not dequeued:
+                dequeued.append(True)
+                self._executor_queued -= 1
+
+    def _call(self, dequeued, context, function, *args):
+        self._dequeue(dequeued)
+        with self._executor_lock:
+            self._executor_busy += 1
+        try:
+            return context.run(function, *args)
+        finally:
+            with self._executor_lock:
+                self._executor_busy -= 1
+
+    def close(self):
+        """Detiene el executor sin esperar a las tareas en curso."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
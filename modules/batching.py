@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+from typing import TYPE_CHECKING
+
+from starlette.concurrency import run_in_threadpool
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger, request_id_var
+
+from .scoring import score_claims
+
+
+class MicroBatcher:
+    """Agrupa predicciones individuales concurrentes en micro-lotes.
+
+    Cada solicitud se encola y espera como máximo `batching.max_wait_ms` milisegundos; el lote
+    se procesa antes si alcanza `batching.max_batch_size` siniestros. Cada lote ejecuta una sola
+    pasada vectorizada del pipeline y del modelo, y cada solicitud recibe su propia fila.
+
+    Los logs de un lote llevan su propio id (`lote-<hex>`) en lugar del id de la solicitud que
+    lo abrió, y el primer registro del lote enumera los ids de las solicitudes que agrupa.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra con la sección `batching`.
+        registry (ArtifactRegistry): Registro del que se obtienen los artefactos de cada lote.
+        admission (AdmissionController, optional): Control de admisión en cuyo executor se
+            procesan los lotes; sin él se usa el threadpool de Starlette.
+        monitor (DriftMonitor, optional): Recibe los nulos imputados de cada lote.
+    """
+
+    def __init__(self, cfg: 'DictConfig', registry, admission=None, monitor=None):
+        self._cfg = cfg
+        self._registry = registry
+        self._monitor = monitor
+        self._run_in_executor = (
+            admission.run if admission is not None else run_in_threadpool
+        )
+        self._max_wait = float(cfg.batching.max_wait_ms) / 1000
+        self._max_batch_size = int(cfg.batching.max_batch_size)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    @property
+    def pending(self):
+        """Número de siniestros encolados a la espera de formar un lote."""
+        return len(self._pending)
+
+    async def submit(self, claim):
+        """Encola un siniestro y espera su predicción.
+
+        Args:
+            claim (Claim): Siniestro validado.
+
+        Returns:
+            float: Predicción del siniestro.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((claim, future, request_id_var.get()))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        # el contexto del task es una copia del de la solicitud que abrió el lote
+        request_id_var.set(f'lote-{uuid.uuid4().hex[:8]}')
+        logger = get_logger()
+        request_ids = ', '.join(str(request_id) for _, _, request_id in batch)
+        logger.info(
+            f'Procesando micro-lote de {len(batch)} siniestros de las solicitudes: {request_ids}'
+        )
+
+        claims = [claim for claim, _, _ in batch]
+        try:
+            artifacts = self._registry.snapshot()
+            resultados = await self._run_in_executor(
+                score_claims, claims, self._cfg, artifacts, None, self._monitor
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), resultado in zip(batch, resultados):
+            if future.done():
+                continue
+            if resultado['error'] is not None:
+                future.set_exception(RuntimeError(resultado['error']))
+            else:
+                future.set_result(resultado['prediccion'])
+
+    async def close(self):
+        """Procesa los siniestros pendientes y espera a que terminen los lotes en curso."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
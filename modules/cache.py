@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger
+from modules.metrics import METRICS
+
+# campos de `Claim` que determinan la predicción (claim_id no interviene)
+KEY_FIELDS = (
+    'marca_vehiculo',
+    'antiguedad_vehiculo',
+    'tipo_poliza',
+    'taller',
+    'partes_a_reparar',
+    'partes_a_reemplazar',
+)
+
+CACHE_REQUESTS = METRICS.counter(
+    'hdi_cache_requests_total',
+    'Consultas a la caché de predicciones por nivel y resultado.',
+    ('tier', 'result'),
+)
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cache_key(claim):
+    """Tupla canónica de variables de un siniestro validado.
+
+    Args:
+        claim (Claim): Siniestro validado; sus campos ya tienen los tipos de `Claim`.
+
+    Returns:
+        tuple: Valores de `KEY_FIELDS` en orden.
+    """
+    return tuple(getattr(claim, field) for field in KEY_FIELDS)
+
+
+class SQLiteCacheTier:
+    """Nivel de caché compartido en disco entre procesos, sobre SQLite en modo WAL.
+
+    Args:
+        path (str): Ruta del archivo SQLite, relativa a la raíz del proyecto.
+        ttl_seconds (float): Vigencia de cada entrada en segundos.
+    """
+
+    def __init__(self, path, ttl_seconds):
+        self.path = os.path.join(root_dir, path)
+        self._ttl = float(ttl_seconds)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT PRIMARY KEY, prediccion REAL NOT NULL, expires REAL NOT NULL)'
+            )
+
+    def _connection(self):
+        # una conexión por hilo y por proceso: sqlite3 no comparte conexiones entre hilos ni
+        # entre los workers creados con fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _serialize(version, key):
+        return json.dumps([version, *key])
+
+    def get(self, version, key):
+        row = (
+            self._connection()
+            .execute(
+                'SELECT prediccion FROM predictions WHERE key = ? AND expires > ?',
+                (self._serialize(version, key), time.time()),
+            )
+            .fetchone()
+        )
+        return None if row is None else row[0]
+
+    def put(self, version, key, value):
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO predictions (key, prediccion, expires) '
+                'VALUES (?, ?, ?)',
+                (self._serialize(version, key), float(value), time.time() + self._ttl),
+            )
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM predictions')
+
+
+class PredictionCache:
+    """Caché LRU con TTL de predicciones, indexada por la tupla canónica de variables y la
+    versión de los artefactos.
+
+    Cuando el registro entrega una versión distinta (cambió el modelo, un pipeline o las
+    imputaciones), la caché en memoria se vacía; el nivel en disco incluye la versión en la
+    clave, por lo que sus entradas antiguas dejan de coincidir y caducan por TTL.
+
+    Args:
+        max_entries (int): Número máximo de entradas en memoria.
+        ttl_seconds (float): Vigencia de cada entrada en segundos.
+        disk_tier (SQLiteCacheTier, optional): Nivel compartido en disco.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, disk_tier=None):
+        self._max_entries = int(max_entries)
+        self._ttl = float(ttl_seconds)
+        self._disk = disk_tier
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, cfg: 'DictConfig'):
+        """Construye la caché desde la sección `cache`, o devuelve None si está deshabilitada."""
+        cache = cfg.cache
+        if not cache.enabled:
+            return None
+        disk_tier = (
+            SQLiteCacheTier(cache.disk_path, cache.ttl_seconds)
+            if cache.get('disk_path')
+            else None
+        )
+        return cls(cache.max_entries, cache.ttl_seconds, disk_tier)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def has_disk_tier(self):
+        """True si las escrituras también van al nivel en disco (y pueden bloquear)."""
+        return self._disk is not None
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._version is not None:
+                get_logger().info(
+                    f'Nueva versión de artefactos {version}, vaciando la caché de predicciones'
+                )
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, key):
+        """Devuelve la predicción guardada o None.
+
+        Args:
+            version (str): Versión de los artefactos (`ArtifactSnapshot.version`).
+            key (tuple): Resultado de `cache_key`.
+
+        Returns:
+            float | None: Predicción en caché.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(tier='memory', result='hit')
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            CACHE_REQUESTS.inc(tier='memory', result='miss')
+
+        value = None
+        if self._disk is not None:
+            try:
+                value = self._disk.get(version, key)
+            except sqlite3.Error as e:
+                get_logger().error(f'Error al leer la caché en disco: {e}')
+            CACHE_REQUESTS.inc(tier='disk', result='miss' if value is None else 'hit')
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            # las entradas del disco se promueven a memoria
+            self.hits += 1
+            self._store(version, key, value, now)
+        return value
+
+    def put(self, version, key, value):
+        """Guarda una predicción en memoria y, si está configurado, en disco."""
+        with self._lock:
+            self._store(version, key, value, time.monotonic())
+        if self._disk is not None:
+            try:
+                self._disk.put(version, key, value)
+            except sqlite3.Error as e:
+                get_logger().error(f'Error al escribir la caché en disco: {e}')
+
+    def _store(self, version, key, value, now):
+        self._check_version(version)
+        self._entries[key] = (value, now + self._ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vacía la caché en memoria y en disco."""
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
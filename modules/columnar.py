@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from models import Claim
+from modules.metrics import track
+
+from .streaming import audit_records, score_frame
+
+# tipos de contenido por formato; el de la respuesta se elige con el mismo nombre
+MEDIA_TYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# otros tipos de contenido aceptados en la solicitud
+INPUT_MEDIA_TYPES = {
+    **{media_type: name for name, media_type in MEDIA_TYPES.items()},
+    'application/vnd.apache.arrow.file': 'arrow',
+    'application/x-parquet': 'parquet',
+}
+
+# columnas de `Claim` y su tipo de Python
+FIELDS = dict(Claim.__annotations__)
+
+
+class ColumnarError(ValueError):
+    """Cuerpo columnar que no se puede predecir: formato ilegible, columnas que faltan o con
+    un tipo que no corresponde a `Claim`."""
+
+
+def body_format(content_type):
+    """Formato de un cuerpo según su `Content-Type`.
+
+    Returns:
+        str | None: "arrow", "parquet" o None si el tipo de contenido no es columnar.
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return INPUT_MEDIA_TYPES.get(media_type)
+
+
+def read_claims(body, input_format):
+    """Lee siniestros de un cuerpo Arrow IPC (stream o archivo) o Parquet.
+
+    Los tipos y los nulos se validan por columna con pyarrow en lugar de construir un `Claim`
+    por fila; las columnas numéricas sin nulos pasan a NumPy sin copiarse.
+
+    Args:
+        body (bytes): Cuerpo de la solicitud.
+        input_format (str): "arrow" o "parquet".
+
+    Raises:
+        ColumnarError: Si el cuerpo no se puede leer o le falta alguna columna de `Claim` o
+            alguna tiene un tipo incompatible.
+
+    Returns:
+        tuple: Tabla de pyarrow leída, DataFrame con las columnas de `Claim` de las filas
+            válidas y array de errores por fila (None en las filas válidas).
+    """
+    # pyarrow se importa al usarse para no alargar el arranque de la API
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    buffer = pa.py_buffer(body)
+    try:
+        if input_format == 'parquet':
+            table = pq.read_table(pa.BufferReader(buffer))
+        elif body[:6] == b'ARROW1':
+            table = pa.ipc.open_file(buffer).read_all()
+        else:
+            table = pa.ipc.open_stream(buffer).read_all()
+    except (pa.ArrowException, OSError) as e:
+        raise ColumnarError(f'Cuerpo {input_format} inválido: {e}') from None
+
+    missing = [field for field in FIELDS if field not in table.column_names]
+    if missing:
+        raise ColumnarError(f'Faltan las columnas: {", ".join(missing)}')
+
+    invalid = {}
+    columns = {}
+    for field, kind in FIELDS.items():
+        column = table.column(field)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        if kind is str:
+            if not (
+                pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+            ):
+                raise ColumnarError(
+                    f"La columna '{field}' debe ser de texto, no {column.type}"
+                )
+            bad = column.is_null()
+        elif pa.types.is_integer(column.type):
+            bad = column.is_null()
+        elif pa.types.is_floating(column.type):
+            # como en `Claim`, un float entero se acepta como entero
+            integral = pc.and_(pc.is_finite(column), pc.equal(column, pc.trunc(column)))
+            bad = pc.invert(pc.fill_null(integral, False))
+            column = pc.if_else(bad, 0, column).cast(pa.int64())
+        else:
+            raise ColumnarError(
+                f"La columna '{field}' debe ser entera, no {column.type}"
+            )
+        invalid[field] = bad.to_numpy(zero_copy_only=False)
+        columns[field] = column
+
+    errors = np.full(table.num_rows, None, dtype=object)
+    rows = np.flatnonzero(np.logical_or.reduce(list(invalid.values())))
+    for row in rows:
+        fields = [field for field, bad in invalid.items() if bad[row]]
+        errors[row] = (
+            f'Datos inválidos: valores nulos o no enteros en {", ".join(fields)}'
+        )
+
+    valid = pa.table(columns)
+    if len(rows):
+        mask = np.ones(table.num_rows, dtype=bool)
+        mask[rows] = False
+        valid = valid.filter(pa.array(mask))
+    return table, valid.to_pandas(), errors
+
+
+def write_results(claim_ids, predicciones, errors, output_format):
+    """Serializa los resultados como Arrow IPC (stream) o Parquet.
+
+    Args:
+        claim_ids (ChunkedArray): Columna `claim_id` de la solicitud, tal como llegó.
+        predicciones (ndarray): Predicciones float64, NaN en las filas con error.
+        errors (ndarray): Mensaje de error por fila, o None.
+        output_format (str): "arrow" o "parquet".
+
+    Returns:
+        bytes: Tabla con las columnas `claim_id`, `prediccion` y `error`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.table(
+        {
+            'claim_id': claim_ids,
+            'prediccion': pa.array(predicciones, from_pandas=True),
+            'error': pa.array(errors, type=pa.string(), from_pandas=True),
+        }
+    )
+    sink = pa.BufferOutputStream()
+    if output_format == 'parquet':
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def score_columnar(
+    body, input_format, output_format, cfg, artifacts, monitor=None, audit=None
+):
+    """Predice un cuerpo columnar y serializa los resultados en el formato pedido.
+
+    Las filas válidas se predicen con `score_frame` en una sola pasada vectorizada; las filas
+    con nulos o valores no enteros devuelven su error sin pasar por el pipeline.
+
+    Args:
+        body (bytes): Cuerpo Arrow IPC o Parquet con las columnas de `Claim`.
+        input_format (str): "arrow" o "parquet".
+        output_format (str): "arrow" o "parquet".
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Modelo, pipelines e imputaciones cargados.
+        monitor (DriftMonitor, optional): Recibe las entradas, las imputaciones y las
+            predicciones de las filas sin error.
+        audit (list, optional): Recibe las filas de auditoría de las filas sin error (ver
+            `audit_records`).
+
+    Raises:
+        ColumnarError: Si el cuerpo no se puede leer (ver `read_claims`).
+
+    Returns:
+        tuple: Cuerpo de la respuesta (bytes), número de filas y número de filas con error.
+    """
+    with track('columnar_decode'):
+        table, df, errors = read_claims(body, input_format)
+
+    predicciones = np.full(table.num_rows, np.nan)
+    valid = np.flatnonzero(pd.isna(errors))
+    if len(valid):
+        scored = score_frame(df, cfg, artifacts, monitor)
+        predicciones[valid] = scored['prediccion'].to_numpy(
+            dtype=float, na_value=np.nan
+        )
+        errors[valid] = scored['error'].to_numpy(dtype=object)
+        if audit is not None:
+            audit.extend(audit_records(df, scored))
+
+    with track('columnar_encode'):
+        content = write_results(
+            table.column('claim_id'), predicciones, errors, output_format
+        )
+    return content, table.num_rows, int(np.count_nonzero(pd.notna(errors)))
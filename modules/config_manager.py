@@ -1,25 +1,222 @@
+import hashlib
+import json
 import os
+import re
+import tempfile
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
 
-import hydra
 from dotenv import load_dotenv
-from hydra import compose, initialize
-from omegaconf import DictConfig
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
 
 # load environment variables
 load_dotenv()
 
-def init_config(config_name: str = "config") -> DictConfig:
+# module dir: Hydra resolves CONFIG_PATH relative to this file
+module_dir = os.path.dirname(os.path.abspath(__file__))
+
+# interpolaciones de entorno que se resuelven al cargar el snapshot congelado
+ENV_INTERPOLATION = re.compile(
+    r'^\$\{(?:oc\.)?env:([A-Za-z_][A-Za-z0-9_]*)(?:,([^}]*))?\}$'
+)
+
+
+def init_config(config_name: str = 'config') -> 'DictConfig':
     """
     Inicializa Hydra y carga la configuración, utilizando una variable de entorno para el directorio de configuración.
 
+    La variable de entorno `CONFIG_OVERRIDES` admite overrides de Hydra separados por espacios
+    (por ejemplo `logger.csv_file=/tmp/logger.csv`).
+
     Args:
         config_name (str): Nombre del archivo de configuración (sin extensión).
 
     Returns:
         DictConfig: Configuración cargada por Hydra.
     """
+    # hydra solo se importa al componer la configuración, no al cargar el snapshot congelado
+    from hydra import compose, initialize
+    from hydra.core.global_hydra import GlobalHydra
+
     config_path = os.getenv('CONFIG_PATH')
+    overrides = os.getenv('CONFIG_OVERRIDES', '').split()
 
+    if GlobalHydra.instance().is_initialized():
+        GlobalHydra.instance().clear()
     initialize(config_path=config_path, version_base=None)
-    cfg = compose(config_name=config_name)
+    cfg = compose(config_name=config_name, overrides=overrides)
     return cfg
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return FrozenConfig(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, FrozenConfig):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class FrozenConfig(Mapping):
+    """Configuración inmutable con acceso por atributo sobre diccionarios y tuplas de Python.
+
+    Expone la misma interfaz de lectura que usa el código sobre `DictConfig` (`cfg.a.b`,
+    `cfg['a']`, `cfg.get('a')`, iteración de listas) sin la resolución de OmegaConf en cada
+    acceso.
+
+    Args:
+        data (Mapping): Configuración ya resuelta.
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        object.__setattr__(
+            self, '_data', {str(key): _freeze(value) for key, value in data.items()}
+        )
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(f'La configuración no tiene la clave {name}')
+
+    def __setattr__(self, name, value):
+        raise AttributeError('La configuración congelada es de solo lectura')
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f'FrozenConfig({self.to_dict()!r})'
+
+    def __reduce__(self):
+        return FrozenConfig, (self.to_dict(),)
+
+    def to_dict(self):
+        """Devuelve una copia mutable como diccionarios y listas de Python."""
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+
+def _resolve_env(value):
+    if isinstance(value, dict):
+        return {key: _resolve_env(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve_env(item) for item in value]
+    if isinstance(value, str):
+        match = ENV_INTERPOLATION.match(value)
+        if match:
+            return os.environ.get(match.group(1), match.group(2))
+    return value
+
+
+def _config_digest(config_name):
+    """Huella de los archivos de configuración y de los overrides."""
+    config_dir = os.path.normpath(
+        os.path.join(module_dir, os.getenv('CONFIG_PATH', '../config'))
+    )
+    digest = hashlib.sha1(
+        f'{config_name}|{os.getenv("CONFIG_OVERRIDES", "")}'.encode('utf-8')
+    )
+    for current, dirs, files in sorted(os.walk(config_dir)):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(('.yaml', '.yml')):
+                with open(os.path.join(current, name), 'rb') as file:
+                    digest.update(name.encode('utf-8') + file.read())
+    return digest.hexdigest(), config_dir
+
+
+def compile_config(config_name: str = 'config', path=None):
+    """Compone la configuración con Hydra y la guarda como snapshot congelado en JSON.
+
+    Las interpolaciones `${env:...}` y `${oc.env:...}` se guardan sin resolver y se resuelven
+    al cargar el snapshot; cualquier otra interpolación se resuelve al compilar.
+
+    Args:
+        config_name (str): Nombre del archivo de configuración (sin extensión).
+        path (str, optional): Ruta del snapshot. Por defecto `<config_name>.frozen.json` en el
+            directorio de configuración.
+
+    Returns:
+        str: Ruta del snapshot escrito.
+    """
+    from omegaconf import OmegaConf
+
+    digest, config_dir = _config_digest(config_name)
+    path = path or os.path.join(config_dir, f'{config_name}.frozen.json')
+
+    cfg = init_config(config_name)
+    raw = OmegaConf.to_container(cfg, resolve=False)
+
+    def resolve(value, node_path):
+        # el resto de interpolaciones se resuelven con OmegaConf sobre su nodo
+        if isinstance(value, dict):
+            return {
+                key: resolve(item, f'{node_path}.{key}') for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [resolve(item, f'{node_path}[{i}]') for i, item in enumerate(value)]
+        if (
+            isinstance(value, str)
+            and '${' in value
+            and not ENV_INTERPOLATION.match(value)
+        ):
+            return OmegaConf.select(cfg, node_path.lstrip('.'))
+        return value
+
+    data = {'digest': digest, 'config': resolve(raw, '')}
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.frozen.')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_config(config_name: str = 'config', path=None) -> FrozenConfig:
+    """Carga la configuración desde el snapshot congelado, compilándolo si no existe o si los
+    archivos de configuración o `CONFIG_OVERRIDES` cambiaron desde que se compiló.
+
+    Con un snapshot vigente no se importan Hydra ni OmegaConf.
+
+    Args:
+        config_name (str): Nombre del archivo de configuración (sin extensión).
+        path (str, optional): Ruta del snapshot.
+
+    Returns:
+        FrozenConfig: Configuración inmutable.
+    """
+    digest, config_dir = _config_digest(config_name)
+    path = path or os.path.join(config_dir, f'{config_name}.frozen.json')
+
+    data = None
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            data = json.load(file)
+    if data is None or data.get('digest') != digest:
+        compile_config(config_name, path)
+        with open(path, 'r') as file:
+            data = json.load(file)
+
+    return FrozenConfig(_resolve_env(data['config']))
+
+
+if __name__ == '__main__':
+    # python -m modules.config_manager
+    print(f'Snapshot de configuración escrito en {compile_config()}')
@@ -0,0 +1,487 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger
+
+from .offline import byte_shards, iter_shard_lines
+from .streaming import score_chunk
+
+# variables de entrada que se vigilan
+CATEGORICAL = ('marca_vehiculo', 'taller', 'tipo_poliza')
+NUMERIC = ('antiguedad_vehiculo', 'partes_a_reparar', 'partes_a_reemplazar')
+
+# cuantiles que se comparan con la línea base
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# por debajo de este tamaño el sketch se actualiza en Python, sin pasar por NumPy
+SMALL_BATCH = 16
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class QuantileSketch:
+    """Sketch de cuantiles con error relativo acotado (buckets logarítmicos, como DDSketch).
+
+    Cada valor distinto de cero se cuenta en el bucket `ceil(log(|x|) / log(gamma))`, por lo que
+    añadir un valor es O(1) y la memoria depende del rango de los valores, no de su número.
+    Los cuantiles tienen un error relativo de `relative_accuracy`. Dos sketches con la misma
+    precisión se pueden sumar.
+
+    Args:
+        relative_accuracy (float): Error relativo máximo de los cuantiles.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zero = 0
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def add_many(self, values):
+        """Añade valores; los no finitos se ignoran.
+
+        Args:
+            values (Sequence | ndarray): Valores numéricos.
+        """
+        if len(values) <= SMALL_BATCH:
+            for value in values:
+                if value is None:
+                    continue
+                value = float(value)
+                if value > 0 and value != math.inf:
+                    self.positive[self._key(value)] += 1
+                elif value < 0 and value != -math.inf:
+                    self.negative[self._key(-value)] += 1
+                elif value == 0:
+                    self.zero += 1
+                else:
+                    continue
+                self.count += 1
+            return
+
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        for store, selected in (
+            (self.positive, values[values > 0]),
+            (self.negative, -values[values < 0]),
+        ):
+            if len(selected):
+                keys = np.ceil(np.log(selected) / self._log_gamma).astype(np.int64)
+                store.update(keys.tolist())
+        self.zero += int((values == 0).sum())
+        self.count += len(values)
+
+    def _buckets(self):
+        """Pares `(valor representativo, cuenta)` en orden ascendente."""
+        return [
+            *(
+                (-self._value(key), n)
+                for key, n in sorted(self.negative.items(), reverse=True)
+            ),
+            *([(0.0, self.zero)] if self.zero else []),
+            *((self._value(key), n) for key, n in sorted(self.positive.items())),
+        ]
+
+    def quantiles(self, qs):
+        """Cuantiles aproximados, o None para cada uno si el sketch está vacío."""
+        if not self.count:
+            return [None for _ in qs]
+        buckets = self._buckets()
+        results = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            seen = 0
+            for value, n in buckets:
+                seen += n
+                if seen > rank:
+                    break
+            results.append(value)
+        return results
+
+    def cdf(self, points):
+        """Fracción de los valores menores o iguales que cada punto."""
+        buckets = self._buckets()
+        values = np.array([value for value, _ in buckets])
+        cumulative = np.cumsum([n for _, n in buckets])
+        index = np.searchsorted(values, points, side='right')
+        below = np.where(index > 0, cumulative[np.maximum(index - 1, 0)], 0)
+        return below / max(self.count, 1)
+
+    def merge(self, other):
+        """Suma otro sketch con la misma precisión."""
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zero += other.zero
+        self.count += other.count
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'positive': dict(self.positive),
+            'negative': dict(self.negative),
+            'zero': self.zero,
+            'count': self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.positive = Counter({int(key): n for key, n in data['positive'].items()})
+        sketch.negative = Counter({int(key): n for key, n in data['negative'].items()})
+        sketch.zero = data['zero']
+        sketch.count = data['count']
+        return sketch
+
+
+def _category(value):
+    """Normaliza un valor categórico: los nulos pasan a None y los float enteros a int, para
+    que `1`, `1.0` y los NaN de un CSV cuenten como el mismo valor."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def psi(expected, actual, epsilon=1e-4):
+    """Índice de estabilidad de la población entre dos distribuciones de proporciones."""
+    expected = np.maximum(np.asarray(expected, dtype=float), epsilon)
+    actual = np.maximum(np.asarray(actual, dtype=float), epsilon)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class DriftMonitor:
+    """Estadísticos en streaming de las entradas, de las imputaciones y de las predicciones.
+
+    Cuenta los valores de las variables categóricas (incluidas las marcas que el pipeline no
+    reconoce), mantiene un `QuantileSketch` por variable numérica y para la predicción, y
+    cuenta los nulos imputados por columna. Cada actualización es O(1) por fila bajo un lock.
+
+    `report` compara los estadísticos con una línea base del mismo tipo, calculada sobre los
+    datos de entrenamiento, con el PSI por variable.
+
+    Args:
+        relative_accuracy (float): Precisión de los sketches de cuantiles.
+        psi_threshold (float): PSI a partir del cual una variable se marca con deriva.
+        baseline (DriftMonitor, optional): Estadísticos de referencia.
+    """
+
+    def __init__(self, relative_accuracy=0.01, psi_threshold=0.2, baseline=None):
+        self.relative_accuracy = relative_accuracy
+        self.psi_threshold = psi_threshold
+        self.baseline = baseline
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Descarta los estadísticos acumulados."""
+        with self._lock:
+            self.started = time.time()
+            self.rows = 0
+            self.categories = {field: Counter() for field in CATEGORICAL}
+            self.sketches = {
+                field: QuantileSketch(self.relative_accuracy)
+                for field in (*NUMERIC, 'prediction')
+            }
+            self.imputed = Counter()
+            self.imputation_rows = 0
+
+    @classmethod
+    def from_config(cls, cfg: 'DictConfig'):
+        """Construye el monitor desde la sección `drift`, o devuelve None si está
+        deshabilitado. La línea base se carga de `drift.baseline_path` si existe."""
+        drift = cfg.drift
+        if not drift.enabled:
+            return None
+        baseline = None
+        path = os.path.join(root_dir, drift.baseline_path)
+        if os.path.exists(path):
+            baseline = cls.load(path)
+            get_logger().info(f'Línea base de deriva cargada desde: {path}')
+        return cls(drift.relative_accuracy, drift.psi_threshold, baseline)
+
+    def observe(self, columns, predictions=None):
+        """Añade filas servidas.
+
+        Los bloques de más de `SMALL_BATCH` filas se cuentan con pandas y NumPy, sin crear un
+        objeto de Python por fila.
+
+        Args:
+            columns (Mapping): Columna -> valores de las filas; basta con que tenga las columnas
+                de `CATEGORICAL` y `NUMERIC` (un DataFrame sirve).
+            predictions (Sequence, optional): Predicciones de las mismas filas.
+        """
+        rows = len(columns[CATEGORICAL[0]])
+        if rows > SMALL_BATCH:
+            values = {field: columns[field] for field in NUMERIC}
+            counts = {
+                field: Counter(
+                    {
+                        _category(key): n
+                        for key, n in pd.Series(columns[field])
+                        .value_counts(dropna=False)
+                        .items()
+                    }
+                )
+                for field in CATEGORICAL
+            }
+        else:
+            values = {
+                field: columns[field].tolist()
+                if hasattr(columns[field], 'tolist')
+                else list(columns[field])
+                for field in (*CATEGORICAL, *NUMERIC)
+            }
+            counts = {
+                field: Counter(map(_category, values[field])) for field in CATEGORICAL
+            }
+        with self._lock:
+            self.rows += rows
+            for field in CATEGORICAL:
+                self.categories[field].update(counts[field])
+            for field in NUMERIC:
+                self.sketches[field].add_many(values[field])
+            if predictions is not None:
+                self.sketches['prediction'].add_many(predictions)
+
+    def observe_claims(self, claims, predictions):
+        """Añade siniestros servidos (objetos `Claim` o diccionarios con sus campos)."""
+        columns = {
+            field: [
+                claim.get(field) if isinstance(claim, dict) else getattr(claim, field)
+                for claim in claims
+            ]
+            for field in (*CATEGORICAL, *NUMERIC)
+        }
+        self.observe(columns, predictions)
+
+    def observe_imputation(self, columns, counts, rows):
+        """Añade los nulos imputados por columna en un bloque de `rows` filas."""
+        with self._lock:
+            self.imputation_rows += rows
+            for column, count in zip(columns, counts):
+                self.imputed[column] += int(count)
+
+    def merge(self, other):
+        """Suma los estadísticos de otro monitor (por ejemplo, de otro bloque de
+        entrenamiento)."""
+        with self._lock:
+            self.rows += other.rows
+            for field in CATEGORICAL:
+                self.categories[field].update(other.categories[field])
+            for field, sketch in self.sketches.items():
+                sketch.merge(other.sketches[field])
+            self.imputed.update(other.imputed)
+            self.imputation_rows += other.imputation_rows
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'rows': self.rows,
+                'categories': {
+                    field: {json.dumps(key): n for key, n in counts.items()}
+                    for field, counts in self.categories.items()
+                },
+                'sketches': {
+                    field: sketch.to_dict() for field, sketch in self.sketches.items()
+                },
+                'imputed': dict(self.imputed),
+                'imputation_rows': self.imputation_rows,
+            }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        first = next(iter(data['sketches'].values()))
+        monitor = cls(first['relative_accuracy'], **kwargs)
+        monitor.rows = data['rows']
+        for field, counts in data['categories'].items():
+            monitor.categories[field] = Counter(
+                {json.loads(key): n for key, n in counts.items()}
+            )
+        for field, sketch in data['sketches'].items():
+            monitor.sketches[field] = QuantileSketch.from_dict(sketch)
+        monitor.imputed = Counter(data['imputed'])
+        monitor.imputation_rows = data['imputation_rows']
+        return monitor
+
+    def save(self, path):
+        """Guarda los estadísticos como JSON de forma atómica."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+    def _compare_categorical(self, field, baseline):
+        current = self.categories[field]
+        total = sum(current.values())
+        result = {'count': total}
+        shares = {key: n / total for key, n in current.most_common(20)} if total else {}
+        result['shares'] = {str(key): share for key, share in shares.items()}
+        if baseline is None:
+            return result
+
+        reference = baseline.categories[field]
+        reference_total = sum(reference.values())
+        keys = set(current) | set(reference)
+        result['baseline_shares'] = (
+            {str(key): reference[key] / reference_total for key in shares}
+            if reference_total
+            else {}
+        )
+        result['unseen'] = {
+            str(key): n for key, n in current.most_common() if key not in reference
+        }
+        if total and reference_total:
+            result['psi'] = psi(
+                [reference[key] / reference_total for key in keys],
+                [current[key] / total for key in keys],
+            )
+        return result
+
+    def _compare_numeric(self, field, baseline):
+        sketch = self.sketches[field]
+        result = {
+            'count': sketch.count,
+            'quantiles': dict(zip(map(str, QUANTILES), sketch.quantiles(QUANTILES))),
+        }
+        if baseline is None:
+            return result
+
+        reference = baseline.sketches[field]
+        result['baseline_quantiles'] = dict(
+            zip(map(str, QUANTILES), reference.quantiles(QUANTILES))
+        )
+        if sketch.count and reference.count:
+            # deciles de la línea base como límites de los intervalos del PSI
+            edges = sorted(set(reference.quantiles(np.linspace(0.1, 0.9, 9))))
+            expected = np.diff(np.concatenate([[0], reference.cdf(edges), [1]]))
+            actual = np.diff(np.concatenate([[0], sketch.cdf(edges), [1]]))
+            result['psi'] = psi(expected, actual)
+        return result
+
+    def report(self):
+        """Estadísticos actuales comparados con la línea base.
+
+        Returns:
+            dict: `rows`, `since`, `baseline_rows`, la comparación de cada variable y de la
+                predicción, las tasas de imputación y la lista `drifted` de variables cuyo PSI
+                supera `psi_threshold`.
+        """
+        baseline = self.baseline
+        with self._lock:
+            features = {
+                **{
+                    field: self._compare_categorical(field, baseline)
+                    for field in CATEGORICAL
+                },
+                **{
+                    field: self._compare_numeric(field, baseline)
+                    for field in (*NUMERIC, 'prediction')
+                },
+            }
+            reference_imputed = baseline.imputed if baseline is not None else {}
+            imputation = {
+                column: {
+                    'rate': self.imputed[column] / self.imputation_rows
+                    if self.imputation_rows
+                    else None,
+                    'baseline_rate': reference_imputed.get(column, 0)
+                    / baseline.imputation_rows
+                    if baseline is not None and baseline.imputation_rows
+                    else None,
+                }
+                for column in sorted(set(self.imputed) | set(reference_imputed))
+            }
+            rows = self.rows
+        return {
+            'rows': rows,
+            'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'baseline_rows': baseline.rows if baseline is not None else None,
+            'drifted': sorted(
+                field
+                for field, result in features.items()
+                if result.get('psi', 0) > self.psi_threshold
+            ),
+            'features': features,
+            'imputation': imputation,
+        }
+
+
+def build_baseline(path, cfg: 'DictConfig', artifacts, chunk_rows=None, sep='|'):
+    """Calcula la línea base prediciendo un archivo de siniestros con `artifacts`.
+
+    Args:
+        path (str): Archivo delimitado por `sep` con cabecera (por ejemplo, el de entrenamiento).
+        cfg (DictConfig): Configuración de Hydra (secciones `drift` y `streaming`).
+        artifacts (ArtifactSnapshot): Modelo, pipelines e imputaciones con los que se predice.
+        chunk_rows (int, optional): Filas por bloque. Por defecto `streaming.chunk_rows`.
+        sep (str): Separador de columnas.
+
+    Returns:
+        DriftMonitor: Estadísticos del archivo.
+    """
+    monitor = DriftMonitor(cfg.drift.relative_accuracy, cfg.drift.psi_threshold)
+    header, ranges = byte_shards(path, 1)
+    for start, end in ranges:
+        for lines in iter_shard_lines(
+            path, start, end, chunk_rows or cfg.streaming.chunk_rows
+        ):
+            score_chunk(header, lines, cfg, artifacts, sep=sep, monitor=monitor)
+    get_logger().info(
+        f'Línea base de deriva calculada con {monitor.rows} filas de {path}'
+    )
+    return monitor
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from modules.config_manager import load_config
+    from modules.logger_manager import setup_logger
+    from modules.registry import ArtifactRegistry
+
+    parser = argparse.ArgumentParser(
+        description='Calcula la línea base de deriva con el modelo configurado.'
+    )
+    parser.add_argument('input', help='Archivo de siniestros delimitado por |')
+    parser.add_argument(
+        '--output', help='Ruta de salida (por defecto drift.baseline_path)'
+    )
+    args = parser.parse_args()
+
+    cfg = load_config()
+    setup_logger(cfg)
+    baseline = build_baseline(args.input, cfg, ArtifactRegistry(cfg).load())
+    baseline.save(args.output or os.path.join(root_dir, cfg.drift.baseline_path))
@@ -0,0 +1,347 @@
+import dis
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger
+from utils import validate_types
+
+from .preprocessing import full_pipeline
+from .schema import SchemaError
+
+# columnas que produce el transform fusionado, en el orden por defecto
+FEATURES = (
+    'log_total_piezas',
+    'marca_vehiculo_encoded',
+    'valor_vehiculo',
+    'valor_por_pieza',
+    'antiguedad_vehiculo',
+)
+
+# columnas que validate_types convierte a entero
+INT_FEATURES = (
+    'marca_vehiculo_encoded',
+    'valor_vehiculo',
+    'valor_por_pieza',
+    'antiguedad_vehiculo',
+)
+
+
+def _int_lookup(mapping):
+    """Construye un arreglo de búsqueda indexado por clave entera; la última posición es NaN."""
+    size = max(int(key) for key in mapping) + 2 if mapping else 1
+    table = np.full(size, np.nan)
+    for key, value in mapping.items():
+        table[int(key)] = value
+    return table
+
+
+def _take(table, keys):
+    """Busca claves numéricas en un arreglo de `_int_lookup`; las claves ausentes devuelven NaN."""
+    keys = np.asarray(keys, dtype=float)
+    with np.errstate(invalid='ignore'):
+        valid = (
+            np.isfinite(keys)
+            & (keys >= 0)
+            & (keys < len(table) - 1)
+            & (keys == np.floor(keys))
+        )
+    index = np.where(valid, keys, -1).astype(np.intp)
+    return table[index]
+
+
+def extract_map_tables(pipeline):
+    """Extrae del bytecode de un paso dill los diccionarios literales usados en
+    `df[destino] = df[origen].map(diccionario)`.
+
+    Solo se interpreta ese patrón; cualquier otra instrucción descarta el estado en curso.
+
+    Args:
+        pipeline (Callable): Función del pipeline cargada con dill.
+
+    Returns:
+        dict: Columna destino -> (columna origen, diccionario).
+    """
+    tables = {}
+    local_dicts = {}
+    stack = []
+
+    for instruction in dis.get_instructions(pipeline.__code__):
+        op, arg = instruction.opname, instruction.argval
+        if op in ('RESUME', 'NOP', 'CACHE', 'PRECALL', 'PUSH_NULL', 'KW_NAMES'):
+            continue
+        if op == 'LOAD_CONST':
+            stack.append(('const', arg))
+        elif (
+            op == 'BUILD_CONST_KEY_MAP'
+            and len(stack) > arg
+            and all(kind == 'const' for kind, _ in stack[-arg - 1 :])
+        ):
+            keys = stack.pop()[1]
+            values = [stack.pop()[1] for _ in range(arg)][::-1]
+            stack.append(('dict', dict(zip(keys, values))))
+        elif op == 'STORE_FAST' and stack and stack[-1][0] == 'dict':
+            local_dicts[arg] = stack.pop()[1]
+        elif op == 'LOAD_FAST':
+            stack.append(
+                ('dict', local_dicts[arg]) if arg in local_dicts else ('frame', arg)
+            )
+        elif (
+            op == 'BINARY_SUBSCR'
+            and len(stack) >= 2
+            and stack[-1][0] == 'const'
+            and stack[-2][0] == 'frame'
+        ):
+            column = stack.pop()[1]
+            stack.pop()
+            stack.append(('column', column))
+        elif (
+            op in ('LOAD_METHOD', 'LOAD_ATTR')
+            and arg == 'map'
+            and stack
+            and stack[-1][0] == 'column'
+        ):
+            stack.append(('map', stack.pop()[1]))
+        elif (
+            op == 'CALL'
+            and len(stack) >= 2
+            and stack[-2][0] == 'map'
+            and stack[-1][0] == 'dict'
+        ):
+            mapping = stack.pop()[1]
+            stack.append(('mapped', (stack.pop()[1], mapping)))
+        elif (
+            op == 'STORE_SUBSCR'
+            and len(stack) >= 3
+            and stack[-3][0] == 'mapped'
+            and stack[-1][0] == 'const'
+        ):
+            target = stack.pop()[1]
+            stack.pop()
+            tables[target] = stack.pop()[1]
+        else:
+            stack = []
+
+    return tables
+
+
+class FusedTransform:
+    """Transform declarativo que reemplaza la cadena de pipelines dill y la imputación en una sola
+    pasada sobre arreglos NumPy.
+
+    Produce las cinco variables del modelo (`FEATURES`) con los mismos valores que
+    `full_pipeline` seguido de `validate_types`.
+
+    Args:
+        marca_vehiculo (Mapping): Codificación de `marca_vehiculo` (pipe3).
+        valor_vehiculo (Mapping): Valor por marca codificada (pipe4, `dict_marca`).
+        valor_por_pieza (Mapping): Valor por taller (pipe4, `dict_taller`).
+        imputation_dict (Mapping): Diccionario de imputaciones.
+    """
+
+    # columna destino -> columna origen de cada tabla de búsqueda de los pasos dill
+    TABLES = {
+        'marca_vehiculo_encoded': 'marca_vehiculo',
+        'valor_vehiculo': 'marca_vehiculo_encoded',
+        'valor_por_pieza': 'taller',
+    }
+
+    def __init__(
+        self, marca_vehiculo, valor_vehiculo, valor_por_pieza, imputation_dict
+    ):
+        self.marca_vehiculo = dict(marca_vehiculo)
+        self.valor_vehiculo = dict(valor_vehiculo)
+        self.valor_por_pieza = dict(valor_por_pieza)
+        self._brand_index = pd.Index(list(marca_vehiculo.keys()))
+        self._brand_codes = np.append(
+            np.asarray(list(marca_vehiculo.values()), dtype=float), np.nan
+        )
+        self._valor_vehiculo = _int_lookup(valor_vehiculo)
+        self._valor_por_pieza = _int_lookup(valor_por_pieza)
+        self._fill = np.array([float(imputation_dict[feature]) for feature in FEATURES])
+
+    @classmethod
+    def from_pipelines(cls, pipelines, imputation_dict):
+        """Construye el transform con las tablas de búsqueda de los pasos dill.
+
+        Las tablas se leen de las constantes de cada paso, de modo que el transform no depende de
+        una copia de los diccionarios que pueda quedar desactualizada.
+
+        Args:
+            pipelines (Sequence): Funciones de los pasos del pipeline.
+            imputation_dict (Mapping): Diccionario de imputaciones.
+
+        Raises:
+            ValueError: Si algún paso no define una de las tablas necesarias.
+
+        Returns:
+            FusedTransform: Transform compilado.
+        """
+        tables = {}
+        for pipeline in pipelines:
+            tables.update(extract_map_tables(pipeline))
+
+        mappings = {}
+        for target, source in cls.TABLES.items():
+            if target not in tables or tables[target][0] != source:
+                raise ValueError(
+                    f'Los pipelines no definen la tabla {source} -> {target}'
+                )
+            mappings[target] = tables[target][1]
+
+        return cls(
+            mappings['marca_vehiculo_encoded'],
+            mappings['valor_vehiculo'],
+            mappings['valor_por_pieza'],
+            imputation_dict,
+        )
+
+    def transform(self, df, features=FEATURES, monitor=None):
+        """Calcula la matriz de variables del modelo.
+
+        Args:
+            df (DataFrame | Mapping): Columnas en crudo de los siniestros.
+            features (Sequence): Orden de las columnas de salida.
+            monitor (DriftMonitor, optional): Recibe los nulos imputados por columna.
+
+        Raises:
+            SchemaError: Con las filas de cada variable entera que no es finita después de
+                imputar.
+
+        Returns:
+            ndarray: Matriz float64 contigua de forma (filas, len(features)).
+        """
+        reparar = np.asarray(df['partes_a_reparar'], dtype=float)
+        reemplazar = np.asarray(df['partes_a_reemplazar'], dtype=float)
+        taller = np.asarray(df['taller'], dtype=float)
+
+        # pipe3: codificación de marca (las marcas desconocidas quedan en NaN)
+        marca_encoded = self._brand_codes[
+            self._brand_index.get_indexer(
+                np.asarray(df['marca_vehiculo'], dtype=object)
+            )
+        ]
+
+        columns = np.empty((len(reparar), len(FEATURES)), dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns[:, 0] = np.log(reparar + reemplazar)  # pipe1 + pipe2
+        columns[:, 1] = marca_encoded  # pipe3
+        columns[:, 2] = _take(self._valor_vehiculo, marca_encoded)  # pipe4
+        columns[:, 3] = _take(self._valor_por_pieza, taller)  # pipe4
+        columns[:, 4] = np.asarray(df['antiguedad_vehiculo'], dtype=float)
+
+        # null_imputation
+        nulls = np.isnan(columns)
+        if nulls.any():
+            columns = np.where(nulls, self._fill, columns)
+
+        # validate_types: las variables enteras se truncan como en astype(int)
+        integer = columns[:, 1:]
+        invalid = ~np.isfinite(integer)
+        if invalid.any():
+            index = getattr(df, 'index', None)
+            raise SchemaError(
+                [
+                    (
+                        FEATURES[j + 1],
+                        (
+                            index[invalid[:, j]]
+                            if index is not None
+                            else np.flatnonzero(invalid[:, j])
+                        ).tolist(),
+                        f"Valores no finitos en la columna entera '{FEATURES[j + 1]}'",
+                    )
+                    for j in np.flatnonzero(invalid.any(axis=0))
+                ]
+            )
+        columns[:, 1:] = np.trunc(integer)
+
+        if monitor is not None:
+            monitor.observe_imputation(FEATURES, nulls.sum(axis=0), len(columns))
+
+        order = [FEATURES.index(feature) for feature in features]
+        return np.ascontiguousarray(columns[:, order])
+
+
+def probe_frame(fused):
+    """Genera siniestros sintéticos que cubren todas las claves de las tablas de búsqueda,
+    valores desconocidos y nulos."""
+    brands = list(fused.marca_vehiculo.keys()) + ['desconocida', np.nan]
+    talleres = list(fused.valor_por_pieza.keys()) + [
+        0,
+        max(fused.valor_por_pieza.keys()) + 1,
+        np.nan,
+    ]
+    size = max(len(brands), len(talleres))
+    return pd.DataFrame(
+        {
+            'claim_id': np.arange(size),
+            'marca_vehiculo': [brands[i % len(brands)] for i in range(size)],
+            'antiguedad_vehiculo': [
+                np.nan if i == size - 1 else i % 10 for i in range(size)
+            ],
+            'tipo_poliza': [1 + i % 4 for i in range(size)],
+            'taller': [talleres[i % len(talleres)] for i in range(size)],
+            'partes_a_reparar': [i % 5 + 1 for i in range(size)],
+            'partes_a_reemplazar': [np.nan if i == 0 else i % 3 for i in range(size)],
+        }
+    )
+
+
+def check_equivalence(fused, cfg, artifacts, df=None):
+    """Compara el transform fusionado con la cadena de pipelines dill.
+
+    Args:
+        fused (FusedTransform): Transform a verificar.
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Pipelines e imputaciones de referencia.
+        df (DataFrame, optional): Datos de prueba. Por defecto `probe_frame(fused)`.
+
+    Returns:
+        bool: True si ambos caminos producen las mismas variables.
+    """
+    df = probe_frame(fused) if df is None else df
+    expected = validate_types(full_pipeline(df.copy(), cfg, artifacts))
+    expected = expected[list(FEATURES)].to_numpy(dtype=float)
+    actual = fused.transform(df)
+    return expected.shape == actual.shape and np.allclose(
+        expected, actual, equal_nan=True
+    )
+
+
+def compile_fused(cfg: 'DictConfig', artifacts):
+    """Compila el transform fusionado y lo verifica contra la cadena dill.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Pipelines e imputaciones cargados.
+
+    Returns:
+        FusedTransform | None: El transform, o None si está deshabilitado o no es equivalente.
+    """
+    logger = get_logger()
+
+    if not cfg.pipeline.fused.enabled:
+        return None
+
+    try:
+        fused = FusedTransform.from_pipelines(
+            artifacts.pipelines, artifacts.imputation_dict
+        )
+        equivalent = check_equivalence(fused, cfg, artifacts)
+    except Exception as e:
+        logger.error(f'No se pudo compilar el transform fusionado: {e}')
+        return None
+
+    if not equivalent:
+        logger.error(
+            'El transform fusionado no es equivalente a los pipelines, se usarán los pipelines dill'
+        )
+        return None
+
+    logger.info('Transform fusionado compilado y verificado contra los pipelines')
+    return fused
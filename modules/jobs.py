@@ -0,0 +1,270 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger, setup_logger
+from modules.metrics import METRICS
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# estados de un trabajo; los tres últimos son finales
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = (
+    'queued',
+    'running',
+    'succeeded',
+    'failed',
+    'cancelled',
+)
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+TRAINING_JOBS = METRICS.counter(
+    'hdi_training_jobs_total',
+    'Trabajos de entrenamiento terminados por estado.',
+    ('status',),
+)
+
+
+class JobCancelled(Exception):
+    """El trabajo se canceló mientras se ejecutaba."""
+
+
+def _write_json(path, data):
+    # escritura atómica: quien lee el estado nunca ve un archivo a medio escribir
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def _init_job_worker(cfg, nice):
+    """Inicializa el proceso de entrenamiento con menor prioridad que el servidor."""
+    if nice and hasattr(os, 'nice'):
+        os.nice(int(nice))
+    setup_logger(cfg)
+
+
+def run_training_job(job_dir, cfg: 'DictConfig'):
+    """Ejecuta un trabajo de entrenamiento en el proceso del pool.
+
+    El estado y el avance se escriben en `status.json` dentro de `job_dir`; el trabajo se
+    interrumpe en el siguiente bloque si aparece el archivo `cancel`.
+
+    Args:
+        job_dir (str): Directorio del trabajo, con el archivo de entrada `input.csv`.
+        cfg (DictConfig): Configuración de Hydra.
+
+    Returns:
+        str: Estado final del trabajo.
+    """
+    from .training import train_model_streaming
+
+    logger = get_logger()
+    status_path = os.path.join(job_dir, 'status.json')
+    cancel_path = os.path.join(job_dir, 'cancel')
+    input_path = os.path.join(job_dir, 'input.csv')
+
+    job = _read_json(status_path)
+    if os.path.exists(cancel_path):
+        job.update(status=CANCELLED, finished_at=time.time())
+        _write_json(status_path, job)
+        return CANCELLED
+
+    job.update(status=RUNNING, started_at=time.time())
+    _write_json(status_path, job)
+    logger.info(f'Iniciando el trabajo de entrenamiento {job["job_id"]}')
+
+    def progress(done_bytes, total_bytes):
+        if os.path.exists(cancel_path):
+            raise JobCancelled()
+        job['progress'] = {
+            'bytes': done_bytes,
+            'total_bytes': total_bytes,
+            'fraction': round(done_bytes / total_bytes, 4) if total_bytes else 1.0,
+        }
+        _write_json(status_path, job)
+
+    try:
+        result = train_model_streaming(input_path, cfg, progress=progress)
+        job.update(status=SUCCEEDED, result=result)
+        logger.info(f'Trabajo de entrenamiento {job["job_id"]} terminado')
+    except JobCancelled:
+        job.update(status=CANCELLED)
+        logger.info(f'Trabajo de entrenamiento {job["job_id"]} cancelado')
+    except Exception as e:
+        job.update(status=FAILED, error=str(e))
+        logger.error(f'Error en el trabajo de entrenamiento {job["job_id"]}: {e}')
+    finally:
+        job['finished_at'] = time.time()
+        _write_json(status_path, job)
+        if os.path.exists(input_path):
+            os.remove(input_path)
+    return job['status']
+
+
+class TrainingJobQueue:
+    """Cola de trabajos de entrenamiento ejecutados en procesos separados del servidor.
+
+    Cada trabajo tiene un directorio en `jobs.dir` con su archivo de entrada y un `status.json`
+    que el proceso de entrenamiento actualiza; por eso cualquier proceso del servidor puede
+    consultar el estado de un trabajo. El pool se crea con el primer trabajo.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra (sección `jobs`).
+    """
+
+    def __init__(self, cfg: 'DictConfig'):
+        self._cfg = cfg
+        self.jobs_dir = os.path.join(root_dir, cfg.jobs.dir)
+        self._workers = int(cfg.jobs.workers)
+        self._nice = int(cfg.jobs.nice)
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id):
+        # los ids son hex de uuid4; se rechaza cualquier otro valor para no salir de jobs_dir
+        if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            raise KeyError(job_id)
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: el proceso de entrenamiento no hereda los hilos del servidor
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_job_worker,
+                initargs=(self._cfg, self._nice),
+            )
+        return self._executor
+
+    def submit(self, file):
+        """Copia el archivo de entrenamiento al directorio del trabajo y lo encola.
+
+        Args:
+            file (BinaryIO): Archivo de entrenamiento delimitado por `|` con cabecera.
+
+        Returns:
+            dict: Estado inicial del trabajo.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir)
+        with open(os.path.join(job_dir, 'input.csv'), 'wb') as spooled:
+            shutil.copyfileobj(file, spooled, 1 << 20)
+
+        job = {
+            'job_id': job_id,
+            'status': QUEUED,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'progress': {'bytes': 0, 'total_bytes': None, 'fraction': 0.0},
+            'result': None,
+            'error': None,
+        }
+        _write_json(os.path.join(job_dir, 'status.json'), job)
+
+        with self._lock:
+            future = self._get_executor().submit(run_training_job, job_dir, self._cfg)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        get_logger().info(f'Trabajo de entrenamiento {job_id} encolado')
+        return job
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            status = CANCELLED
+        elif future.exception() is not None:
+            # el proceso murió antes de registrar su estado final
+            status = FAILED
+            job = self.status(job_id)
+            job.update(
+                status=FAILED, error=str(future.exception()), finished_at=time.time()
+            )
+            _write_json(os.path.join(self._job_dir(job_id), 'status.json'), job)
+        else:
+            status = future.result()
+        TRAINING_JOBS.inc(status=status)
+
+    def status(self, job_id):
+        """Devuelve el estado y el avance de un trabajo.
+
+        Raises:
+            KeyError: Si el trabajo no existe.
+        """
+        status_path = os.path.join(self._job_dir(job_id), 'status.json')
+        if not os.path.exists(status_path):
+            raise KeyError(job_id)
+        return _read_json(status_path)
+
+    def list(self):
+        """Devuelve el estado de todos los trabajos, del más reciente al más antiguo."""
+        if not os.path.isdir(self.jobs_dir):
+            return []
+        jobs = []
+        for job_id in os.listdir(self.jobs_dir):
+            try:
+                jobs.append(self.status(job_id))
+            except (KeyError, ValueError):
+                continue
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+
+    def cancel(self, job_id):
+        """Cancela un trabajo encolado o en ejecución.
+
+        Un trabajo encolado se descarta de inmediato; uno en ejecución se detiene en el
+        siguiente bloque.
+
+        Raises:
+            KeyError: Si el trabajo no existe.
+
+        Returns:
+            dict: Estado del trabajo.
+        """
+        job_dir = self._job_dir(job_id)
+        job = self.status(job_id)
+        if job['status'] in FINAL_STATES:
+            return job
+
+        open(os.path.join(job_dir, 'cancel'), 'w').close()
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            job.update(status=CANCELLED, finished_at=time.time())
+            _write_json(os.path.join(job_dir, 'status.json'), job)
+            input_path = os.path.join(job_dir, 'input.csv')
+            if os.path.exists(input_path):
+                os.remove(input_path)
+        get_logger().info(f'Cancelación solicitada para el trabajo {job_id}')
+        return job
+
+    def close(self):
+        """Cancela los trabajos pendientes y detiene el pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            job_ids = list(self._futures)
+        for job_id in job_ids:
+            try:
+                self.cancel(job_id)
+            except KeyError:
+                continue
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# estimadores de sklearn cuyo predict es una combinación lineal sin función de enlace
+LINEAR_MODELS = ('LinearRegression', 'Ridge', 'Lasso', 'ElasticNet')
+
+
+class LinearKernel:
+    """Modelo lineal compilado que predice con un producto punto de NumPy.
+
+    Expone `feature_names_in_`, `coef_`, `intercept_` y `predict` para poder reemplazar a un
+    `LinearRegression` de sklearn en el camino de predicción sin sus validaciones por llamada.
+
+    Args:
+        features (Sequence): Nombres de las variables en el orden de los coeficientes.
+        coef (Sequence): Coeficientes del modelo.
+        intercept (float): Intercepto del modelo.
+    """
+
+    def __init__(self, features, coef, intercept):
+        self.feature_names_in_ = np.asarray(features, dtype=object)
+        self.coef_ = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept_ = float(intercept)
+        self.n_features_in_ = len(self.coef_)
+
+    def predict(self, X):
+        """Predice sobre una matriz float64 (filas, variables) o un DataFrame con las variables.
+
+        Args:
+            X (ndarray | DataFrame): Variables del modelo.
+
+        Returns:
+            ndarray: Predicciones.
+        """
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names_in_].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f'Se esperaban {self.n_features_in_} variables, se recibieron {X.shape}'
+            )
+        if not np.isfinite(X).all():
+            # mismo contrato que sklearn: las filas no finitas se aíslan en el camino fila a fila
+            raise ValueError('Las variables contienen valores NaN o infinitos')
+        return X @ self.coef_ + self.intercept_
+
+    def to_dict(self):
+        return {
+            'model_type': 'linear',
+            'features': [str(feature) for feature in self.feature_names_in_],
+            'coef': self.coef_.tolist(),
+            'intercept': self.intercept_,
+        }
+
+
+def compile_linear_model(model):
+    """Compila un modelo lineal de sklearn en un `LinearKernel`.
+
+    Solo se compilan los estimadores cuyo `predict` es exactamente `X @ coef_ + intercept_`
+    (`LINEAR_MODELS`); el resto, incluidos los modelos lineales generalizados con función de
+    enlace, se devuelven sin cambios para seguir usando su `predict` de sklearn.
+
+    Args:
+        model: Modelo cargado.
+
+    Returns:
+        LinearKernel | object: Kernel compilado o el modelo original.
+    """
+    if isinstance(model, LinearKernel):
+        return model
+    if (
+        type(model).__module__.split('.')[0] != 'sklearn'
+        or type(model).__name__ not in LINEAR_MODELS
+    ):
+        return model
+
+    coef = getattr(model, 'coef_', None)
+    intercept = getattr(model, 'intercept_', None)
+    features = getattr(model, 'feature_names_in_', None)
+    if coef is None or features is None or not hasattr(model, 'predict'):
+        return model
+
+    coef = np.asarray(coef)
+    if coef.ndim != 1 or np.ndim(intercept) != 0 or len(coef) != len(features):
+        return model
+
+    return LinearKernel(features, coef, intercept)
+
+
+def export_linear_model(model, path):
+    """Exporta los coeficientes de un modelo lineal a un artefacto JSON.
+
+    Args:
+        model: Modelo lineal de sklearn o `LinearKernel`.
+        path (str): Ruta del artefacto de salida.
+
+    Raises:
+        TypeError: Si el modelo no es lineal.
+    """
+    kernel = compile_linear_model(model)
+    if not isinstance(kernel, LinearKernel):
+        raise TypeError(
+            f'El modelo {type(model).__name__} no es lineal y no se puede exportar'
+        )
+
+    abs_path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    with open(abs_path, 'w') as file:
+        json.dump(kernel.to_dict(), file, indent=4)
+
+
+def load_linear_model(path):
+    """Carga un artefacto JSON exportado con `export_linear_model`.
+
+    Args:
+        path (str): Ruta del artefacto.
+
+    Returns:
+        LinearKernel: Kernel de predicción.
+    """
+    with open(path, 'r') as file:
+        artifact = json.load(file)
+
+    if artifact.get('model_type') != 'linear':
+        raise ValueError(f'El artefacto {path} no contiene un modelo lineal')
+
+    return LinearKernel(artifact['features'], artifact['coef'], artifact['intercept'])
+
+
+if __name__ == '__main__':
+    # python -m modules.linear models/linear_regression.pkl models/linear_regression.json
+    import joblib
+
+    export_linear_model(joblib.load(sys.argv[1]), sys.argv[2])
@@ -1,16 +1,129 @@
+import atexit
+import contextvars
 import csv
+import io
+import json
 import logging
 import os
+import queue
+import threading
+import time
+import uuid
+import zlib
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import TYPE_CHECKING
 
-from omegaconf import DictConfig
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
 
 logger = None
+listener = None
+audit_writer = None
+
+# id de la solicitud en curso, propagado a los hilos por run_in_threadpool
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+CSV_FIELDNAMES = [
+    'timestamp',
+    'claim_id',
+    'marca_vehiculo',
+    'antiguedad_vehiculo',
+    'tipo_poliza',
+    'taller',
+    'partes_a_reparar',
+    'partes_a_reemplazar',
+    'prediction',
+    'execution_time',
+]
+
+
+class RequestContextFilter(logging.Filter):
+    """Añade el id de la solicitud en curso a cada registro y muestrea los mensajes INFO.
+
+    El muestreo se decide por solicitud a partir del hash de su id, de modo que una solicitud
+    conserva todos sus mensajes o ninguno. Los mensajes WARNING o superiores y los emitidos
+    fuera de una solicitud se conservan siempre.
+
+    Args:
+        info_sample_rate (float): Fracción de solicitudes cuyos mensajes INFO se conservan.
+    """
+
+    def __init__(self, info_sample_rate: float = 1.0):
+        super().__init__()
+        self._threshold = int(max(0.0, min(1.0, info_sample_rate)) * 0xFFFFFFFF)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        record.request_id = request_id or '-'
+        if (
+            request_id is None
+            or record.levelno > logging.INFO
+            or self._threshold >= 0xFFFFFFFF
+        ):
+            return True
+        return zlib.crc32(request_id.encode('utf-8')) <= self._threshold
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea los registros como una línea JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'timestamp': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'logger': record.name,
+            'level': record.levelname,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI que asigna un id a cada solicitud HTTP.
+
+    Usa la cabecera `X-Request-ID` si viene en la solicitud y la devuelve en la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_id = (
+            dict(scope['headers']).get(b'x-request-id', b'').decode('latin-1')
+            or uuid.uuid4().hex
+        )
+        header = (b'x-request-id', request_id.encode('latin-1'))
 
-def setup_logger(cfg: DictConfig) -> logging.Logger:
+        async def send_with_request_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def setup_logger(cfg: 'DictConfig') -> logging.Logger:
     """Configura el logger de la aplicación.
 
+    Con `logger.queue` activo, el logger solo encola los registros en un `QueueHandler` y un
+    `QueueListener` los formatea y escribe en un hilo en segundo plano.
+
     Args:
         cfg (DictConfig): Configuración de Hydra que contiene la configuración de logger.
 
@@ -23,11 +136,11 @@ def setup_logger(cfg: DictConfig) -> logging.Logger:
     max_bytes = cfg.logger.max_bytes
     backup_count = cfg.logger.backup_count
 
-    global logger
+    global logger, listener
 
     if logger is None:
         # Crear el logger
-        logger = logging.getLogger("process_logger")
+        logger = logging.getLogger('process_logger')
         logger.setLevel(log_level)
 
         # Crear directorio si no existe
@@ -35,10 +148,7 @@ def setup_logger(cfg: DictConfig) -> logging.Logger:
 
         # Configurar el manejador de rotación de archivo
         file_handler = RotatingFileHandler(
-            log_path,
-            maxBytes=max_bytes,
-            backupCount=backup_count,
-            encoding="utf-8"
+            log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
         )
 
         # Configurar el manejador de consola (terminal)
@@ -46,49 +156,321 @@ def setup_logger(cfg: DictConfig) -> logging.Logger:
         console_handler.setLevel(log_level)
 
         # Formato del logger
-        formatter = logging.Formatter(
-            "%(asctime)s | %(name)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
-        )
+        if cfg.logger.json:
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(
+                '%(asctime)s | %(name)s | %(levelname)s | %(request_id)s | %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S',
+            )
         file_handler.setFormatter(formatter)
         console_handler.setFormatter(formatter)
 
+        # Id de solicitud y muestreo antes de encolar o escribir
+        logger.addFilter(RequestContextFilter(cfg.logger.info_sample_rate))
+
         # Añadir ambos manejadores al logger
         if not logger.hasHandlers():
-            logger.addHandler(file_handler)
-            logger.addHandler(console_handler)
+            if cfg.logger.queue:
+                listener = QueueListener(
+                    queue.SimpleQueue(),
+                    file_handler,
+                    console_handler,
+                    respect_handler_level=True,
+                )
+                logger.addHandler(QueueHandler(listener.queue))
+                listener.start()
+                atexit.register(stop_logger)
+            else:
+                logger.addHandler(file_handler)
+                logger.addHandler(console_handler)
+
+    return logger
 
-        return logger
 
+def stop_logger():
+    """Detiene el `QueueListener` escribiendo antes los registros pendientes.
+
+    Los registros posteriores se escriben de forma síncrona con los mismos manejadores.
+    """
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+            logger.removeHandler(handler)
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+        listener = None
 
-def log_to_csv(data: dict, cfg: DictConfig):
+
+def start_logger():
+    """Vuelve a encolar los registros en un `QueueListener` después de `stop_logger`.
+
+    Se usa en los workers creados con `fork`, que heredan los manejadores del proceso maestro
+    pero no el hilo del listener.
+    """
+    global listener
+    if logger is None or listener is not None:
+        return
+    handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+    listener = QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(listener.queue))
+    listener.start()
+
+
+def log_to_csv(data: dict, cfg: 'DictConfig'):
     """Registra los datos de consulta en un archivo CSV para monitoreo.
 
     Args:
         data (dict): Información de entrada y salida de la consulta.
         cfg (DictConfig): Configuración de Hydra para la ruta del archivo CSV.
     """
-    csv_path = cfg.logger.csv_file
-    fieldnames = [
-        "timestamp", "claim_id", "marca_vehiculo", "antiguedad_vehiculo",
-        "tipo_poliza", "taller", "partes_a_reparar", "partes_a_reemplazar",
-        "prediction", "execution_time"
-    ]
+    log_rows_to_csv([data], cfg)
+
+
+def log_rows_to_csv(rows: list, cfg: 'DictConfig'):
+    """Registra varias consultas en el archivo CSV de monitoreo abriendo el archivo una sola vez.
+
+    Si el escritor de auditoría en segundo plano está activo, las filas se encolan y la
+    escritura ocurre fuera del camino de la solicitud.
+
+    Args:
+        rows (list): Lista de diccionarios con la información de entrada y salida de cada consulta.
+        cfg (DictConfig): Configuración de Hydra para la ruta del archivo CSV.
+    """
+    if audit_writer is not None:
+        audit_writer.write_many(rows)
+        return
+
+    write_csv_rows(cfg.logger.csv_file, rows)
+
+
+def write_csv_rows(
+    csv_path: str, rows: list, max_bytes: int = 0, backup_count: int = 0
+):
+    """Añade filas al CSV de monitoreo con una sola escritura bajo bloqueo de archivo.
+
+    El tamaño, la rotación y la cabecera se deciden con el bloqueo tomado, de modo que varios
+    procesos pueden escribir el mismo archivo sin duplicar cabeceras ni rotarlo dos veces.
+
+    Args:
+        csv_path (str): Ruta del archivo CSV.
+        rows (list): Filas a escribir.
+        max_bytes (int): Tamaño máximo antes de rotar el archivo (0 desactiva la rotación).
+        backup_count (int): Número de archivos rotados a conservar.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDNAMES)
+    writer.writerows(rows)
+    content = buffer.getvalue()
+
+    while True:
+        with open(csv_path, mode='a', newline='', encoding='utf-8') as csvfile:
+            if fcntl is not None:
+                fcntl.flock(csvfile, fcntl.LOCK_EX)
+            try:
+                # Otro proceso pudo rotar el archivo mientras se esperaba el bloqueo
+                stat = os.fstat(csvfile.fileno())
+                if not os.path.exists(csv_path) or not os.path.samestat(
+                    stat, os.stat(csv_path)
+                ):
+                    continue
+
+                # Rotar como RotatingFileHandler si se supera el tamaño máximo
+                size = stat.st_size
+                if max_bytes > 0 and size > 0 and size + len(content) > max_bytes:
+                    _rotate(csv_path, backup_count)
+                    continue
+
+                # Escribir la cabecera si el archivo está vacío
+                if size == 0:
+                    header = io.StringIO()
+                    csv.DictWriter(header, fieldnames=CSV_FIELDNAMES).writeheader()
+                    content = header.getvalue() + content
+
+                csvfile.write(content)
+                csvfile.flush()
+                return
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(csvfile, fcntl.LOCK_UN)
+
+
+def _rotate(path: str, backup_count: int):
+    if backup_count <= 0:
+        os.remove(path)
+        return
+    for index in range(backup_count - 1, 0, -1):
+        source = f'{path}.{index}'
+        if os.path.exists(source):
+            os.replace(source, f'{path}.{index + 1}')
+    os.replace(path, f'{path}.1')
+
+
+class AuditLogWriter:
+    """Escritor del CSV de auditoría en un hilo en segundo plano.
+
+    Las filas llegan por una cola acotada y se escriben en lotes cuando se alcanza `batch_size`
+    o pasan `flush_interval` segundos desde la primera fila pendiente. Si la cola está llena la
+    fila se descarta y se contabiliza en `dropped`, para no bloquear el event loop.
+
+    Args:
+        csv_path (str): Ruta del archivo CSV.
+        queue_size (int): Capacidad de la cola.
+        batch_size (int): Filas máximas por escritura.
+        flush_interval (float): Segundos máximos que una fila espera en memoria.
+        max_bytes (int): Tamaño máximo del archivo antes de rotarlo.
+        backup_count (int): Número de archivos rotados a conservar.
+    """
+
+    _STOP = object()
+    # nombre de lo que se escribe, usado en los mensajes de error
+    label = 'auditoría'
 
-    # Crear el archivo si no existe y escribir la cabecera
-    file_exists = os.path.isfile(csv_path)
-    with open(csv_path, mode='a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
+    def __init__(
+        self,
+        csv_path,
+        queue_size=10000,
+        batch_size=256,
+        flush_interval=1.0,
+        max_bytes=0,
+        backup_count=0,
+    ):
+        self.csv_path = csv_path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._thread = None
+        self._lock = threading.Lock()
 
-        writer.writerow(data)
+    def start(self):
+        """Arranca el hilo de escritura si no está en ejecución."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def write(self, row: dict) -> bool:
+        """Encola una fila de auditoría.
+
+        Returns:
+            bool: False si la cola estaba llena y la fila se descartó.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            # varios hilos pueden descartar a la vez y `dropped` alimenta una métrica
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if logger is not None:
+                logger.error(
+                    f'Cola de {self.label} llena, fila descartada (total descartadas: {dropped})'
+                )
+            return False
+
+    def write_many(self, rows: list):
+        """Encola varias filas de auditoría."""
+        for row in rows:
+            self.write(row)
+
+    def pending(self):
+        """Número aproximado de filas encoladas pendientes de escribir."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Bloquea hasta que todas las filas encoladas se hayan escrito."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Escribe las filas pendientes y detiene el hilo de escritura."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(self._STOP)
+        thread.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            deadline = None
+            while len(batch) < self._batch_size:
+                timeout = (
+                    self._flush_interval
+                    if deadline is None
+                    else deadline - time.monotonic()
+                )
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    if logger is not None:
+                        logger.error(f'Error al escribir el log de {self.label}: {e}')
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def _write(self, batch):
+        """Escribe un lote de filas; las subclases lo redefinen para otros destinos."""
+        write_csv_rows(self.csv_path, batch, self._max_bytes, self._backup_count)
+
+
+def setup_audit_writer(cfg: 'DictConfig'):
+    """Configura el escritor de auditoría en segundo plano según `logger.audit`.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra.
+
+    Returns:
+        AuditLogWriter | None: Escritor configurado, o None si está deshabilitado.
+    """
+    global audit_writer
+
+    audit = cfg.logger.audit
+    if not audit.enabled or audit_writer is not None:
+        return audit_writer
+
+    audit_writer = AuditLogWriter(
+        cfg.logger.csv_file,
+        queue_size=audit.queue_size,
+        batch_size=audit.batch_size,
+        flush_interval=audit.flush_interval,
+        max_bytes=audit.max_bytes,
+        backup_count=audit.backup_count,
+    )
+    atexit.register(audit_writer.close)
+    return audit_writer
 
 
 def get_logger():
     global logger
     if logger is None:
-        raise Exception("Logger is not initialized. Call setup_logger() first.")
+        raise Exception('Logger is not initialized. Call setup_logger() first.')
     return logger
-
-
-
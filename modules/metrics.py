@@ -0,0 +1,285 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from anyio.to_thread import current_default_thread_limiter
+
+# buckets de latencia en segundos, desde 50µs hasta 10s
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [
+        f'{name}="{_escape(value)}"'
+        for name, value in list(zip(labelnames, values)) + list(extra)
+    ]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    """Contador monotónico con etiquetas."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Valor instantáneo. Puede calcularse al momento de exponer las métricas con `set_function`."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Registra una función sin argumentos cuyo resultado se expone como valor del gauge."""
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception:
+                pass
+        return super().render()
+
+
+class Histogram(_Metric):
+    """Histograma acumulado con buckets fijos, compatible con el formato de Prometheus."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state is not None else 0
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, key, [('le', _format_value(float(bound)))]
+                )
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Colección de métricas del proceso expuestas en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+STAGE_LATENCY = METRICS.histogram(
+    'hdi_stage_latency_seconds', 'Latencia por etapa de la predicción.', ('stage',)
+)
+STAGE_ERRORS = METRICS.counter(
+    'hdi_stage_errors_total', 'Errores por etapa de la predicción.', ('stage',)
+)
+REQUEST_LATENCY = METRICS.histogram(
+    'hdi_request_latency_seconds',
+    'Latencia total de las solicitudes HTTP.',
+    ('method', 'route', 'status'),
+)
+# threadpool de anyio de Starlette; las predicciones usan el executor de `AdmissionController`
+THREADPOOL_BUSY = METRICS.gauge(
+    'hdi_threadpool_busy_threads',
+    'Hilos ocupados del threadpool de Starlette (sin el executor de predicción).',
+)
+THREADPOOL_SIZE = METRICS.gauge(
+    'hdi_threadpool_size', 'Tamaño del threadpool de Starlette.'
+)
+THREADPOOL_QUEUE = METRICS.gauge(
+    'hdi_threadpool_queue_depth',
+    'Tareas esperando un hilo del threadpool de Starlette.',
+)
+STARTUP_SECONDS = METRICS.gauge(
+    'hdi_startup_seconds',
+    'Duración de cada fase del arranque del proceso (importaciones, configuración, artefactos).',
+    ('phase',),
+)
+
+
+@contextmanager
+def track(stage):
+    """Mide la latencia de una etapa y cuenta sus errores.
+
+    Args:
+        stage (str): Nombre de la etapa.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+
+def observe_since(stage, start):
+    """Registra como latencia de una etapa el tiempo transcurrido desde `start` (perf_counter)."""
+    if start is not None:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+
+def update_threadpool_gauges():
+    """Actualiza los gauges del threadpool por defecto. Debe llamarse desde el event loop."""
+    limiter = current_default_thread_limiter()
+    statistics = limiter.statistics()
+    THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+    THREADPOOL_SIZE.set(statistics.total_tokens)
+    THREADPOOL_QUEUE.set(statistics.tasks_waiting)
+
+
+def render_metrics():
+    """Devuelve todas las métricas en formato de texto de Prometheus."""
+    return METRICS.render()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide la latencia total de cada solicitud HTTP y guarda su instante de
+    inicio en `request.state.request_start` para medir el parseo de la solicitud."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope.setdefault('state', {})['request_start'] = start
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope['method'],
+                route=route,
+                status=status['code'],
+            )
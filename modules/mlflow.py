@@ -1,32 +1,37 @@
 import os
-
-import joblib
-import mlflow
-import mlflow.sklearn
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import train_test_split
+import tempfile
 
 from modules.logger_manager import get_logger
 
+from .linear import export_linear_model, load_linear_model
+
 # set the path of the root dir
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
-def load_model(cfg):
+def load_model(cfg, model_path=None):
     """Carga el modelo preentrenado basado en la configuración de Hydra.
 
     Args:
         cfg (DictConfig): Configuración cargada por Hydra.
+        model_path (str, optional): Ruta del modelo. Por defecto `models.model_path`.
 
     Returns:
-        joblib(pkl): Modelo cargado.
+        joblib(pkl) | LinearKernel: Modelo cargado.
     """
     logger = get_logger()
 
-    model_path = cfg.models.model_path
+    model_path = model_path or cfg.models.model_path
     abs_model_path = os.path.join(root_dir, model_path)
 
-    logger.info(f"Cargando el modelo desde: {model_path}")
+    logger.info(f'Cargando el modelo desde: {model_path}')
+
+    # artefacto de coeficientes exportado, no requiere sklearn
+    if abs_model_path.endswith('.json'):
+        return load_linear_model(abs_model_path)
+
+    # joblib solo se importa para modelos serializados con pickle
+    import joblib
 
     return joblib.load(abs_model_path)
 
@@ -41,7 +46,14 @@ def train_model(df, cfg):
     Returns:
         str: Mensaje de éxito con las métricas obtenidas.
     """
-    logger.info("Iniciando el entrenamiento del modelo...")
+    # mlflow y sklearn solo se importan al entrenar para no cargarlos al servir predicciones
+    import mlflow
+    import mlflow.sklearn
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import train_test_split
+
+    logger = get_logger()
+    logger.info('Iniciando el entrenamiento del modelo...')
     # load model
     modelo = load_model(cfg.train.model_path)
 
@@ -55,41 +67,62 @@ def train_model(df, cfg):
     )
 
     # train the model
-    logger.info("Entrenando el modelo...")
+    logger.info('Entrenando el modelo...')
     modelo.fit(X_train, y_train)
 
     # evaluate the model
-    logger.info("Evaluando el modelo...")
+    logger.info('Evaluando el modelo...')
     y_pred = modelo.predict(X_test)
     accuracy = accuracy_score(y_test, y_pred)
 
     # log the model
-    logger.info("Registrando el modelo en MLflow...")
+    logger.info('Registrando el modelo en MLflow...')
     with mlflow.start_run():
-        mlflow.log_param("test_size", cfg.train.test_size)
-        mlflow.log_param("random_state", cfg.train.random_state)
-        mlflow.log_metric("accuracy", accuracy)
-        mlflow.sklearn.log_model(modelo, "modelo_reentrenado")
+        mlflow.log_param('test_size', cfg.train.test_size)
+        mlflow.log_param('random_state', cfg.train.random_state)
+        mlflow.log_metric('accuracy', accuracy)
+        mlflow.sklearn.log_model(modelo, 'modelo_reentrenado')
 
-    logger.info("Modelo reentrenado guardado en MLflow")
+    logger.info('Modelo reentrenado guardado en MLflow')
     save_model(modelo, cfg.models.retrained_model_path)
 
-    return f"Modelo reentrenado con accuracy de: {accuracy}"
+    return f'Modelo reentrenado con accuracy de: {accuracy}'
 
 
 def save_model(model, path):
     """Guarda el modelo entrenado en la ruta especificada.
 
+    Si la ruta termina en `.json` se exportan los coeficientes con `export_linear_model`. El
+    archivo se escribe de forma atómica.
+
     Args:
         model (joblib): Modelo entrenado que se va a guardar.
         path (str): Ruta donde se guardará el archivo del modelo.
     """
+    logger = get_logger()
+
     # get absolute path
     abs_model_path = os.path.abspath(path)
 
     # create directory if it doesn't exist
     os.makedirs(os.path.dirname(abs_model_path), exist_ok=True)
 
-    # save the model
-    logger.info(f"Guardando el modelo en: {abs_model_path}")
-    joblib.dump(model, abs_model_path)
+    # save the model to a temporary file and swap it in atomically, so readers of the
+    # path never see a partially written model
+    logger.info(f'Guardando el modelo en: {abs_model_path}')
+    directory, name = os.path.split(abs_model_path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f'.{name}.', suffix=os.path.splitext(name)[1]
+    )
+    os.close(fd)
+    try:
+        if abs_model_path.endswith('.json'):
+            export_linear_model(model, tmp_path)
+        else:
+            import joblib
+
+            joblib.dump(model, tmp_path)
+        os.replace(tmp_path, abs_model_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,216 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger, setup_logger
+
+from .registry import ArtifactRegistry
+from .streaming import OUTPUT_COLUMNS, score_chunk
+
+# estado de cada proceso del pool, cargado una sola vez por `_init_worker`
+_worker = {}
+
+
+def byte_shards(path, n_shards):
+    """Divide un archivo delimitado por líneas en rangos de bytes de tamaño similar.
+
+    Cada línea pertenece al rango que contiene su primer byte, por lo que los rangos pueden
+    cortar líneas: `iter_shard_lines` se encarga de alinearlos.
+
+    Args:
+        path (str): Ruta del archivo.
+        n_shards (int): Número de rangos.
+
+    Returns:
+        tuple: Cabecera (bytes) y lista de rangos `(inicio, fin)` sobre los datos.
+    """
+    with open(path, 'rb') as file:
+        header = file.readline()
+        data_start = file.tell()
+    size = os.path.getsize(path)
+
+    n_shards = max(1, min(n_shards, size - data_start))
+    step = (size - data_start) / n_shards
+    bounds = [data_start + round(step * i) for i in range(n_shards)] + [size]
+    shards = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    return header.rstrip(b'\r\n'), shards
+
+
+def iter_shard_lines(path, start, end, chunk_rows):
+    """Lee en bloques las líneas cuyo primer byte está en `[start, end)`.
+
+    Args:
+        path (str): Ruta del archivo.
+        start (int): Primer byte del rango.
+        end (int): Byte siguiente al último del rango.
+        chunk_rows (int): Líneas por bloque.
+
+    Yields:
+        list: Líneas (bytes) del bloque, sin saltos de línea.
+    """
+    with open(path, 'rb') as file:
+        # la línea que empieza antes de `start` pertenece al rango anterior
+        file.seek(start - 1)
+        if file.read(1) != b'\n':
+            file.readline()
+
+        lines = []
+        while file.tell() < end:
+            line = file.readline()
+            if not line:
+                break
+            line = line.rstrip(b'\r\n')
+            if line.strip():
+                lines.append(line)
+            if len(lines) >= chunk_rows:
+                yield lines
+                lines = []
+        if lines:
+            yield lines
+
+
+def _init_worker(cfg):
+    """Inicializa un proceso del pool: logger y artefactos se cargan una sola vez."""
+    setup_logger(cfg)
+    _worker['cfg'] = cfg
+    _worker['artifacts'] = ArtifactRegistry(cfg).load()
+
+
+def score_shard(path, start, end, header, chunk_rows, sep='|'):
+    """Predice un rango de bytes del archivo en el proceso actual del pool.
+
+    Args:
+        path (str): Ruta del archivo de siniestros.
+        start (int): Primer byte del rango.
+        end (int): Byte siguiente al último del rango.
+        header (bytes): Cabecera del archivo.
+        chunk_rows (int): Filas por bloque vectorizado.
+        sep (str): Separador de columnas.
+
+    Returns:
+        tuple: Pid del proceso, segundos de scoring y DataFrame con `OUTPUT_COLUMNS`.
+    """
+    cfg, artifacts = _worker['cfg'], _worker['artifacts']
+    started = time.perf_counter()
+
+    chunks = [
+        score_chunk(header, lines, cfg, artifacts, sep=sep)
+        for lines in iter_shard_lines(path, start, end, chunk_rows)
+    ]
+    result = (
+        pd.concat(chunks, ignore_index=True)
+        if chunks
+        else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    )
+    result['prediccion'] = pd.to_numeric(result['prediccion'], errors='coerce')
+    return os.getpid(), time.perf_counter() - started, result
+
+
+def write_results(result, output_path, sep='|'):
+    """Escribe los resultados en Parquet, o en CSV si la ruta termina en `.csv`.
+
+    Args:
+        result (DataFrame): Resultados con `OUTPUT_COLUMNS`.
+        output_path (str): Ruta de salida.
+        sep (str): Separador de columnas del CSV.
+    """
+    abs_path = os.path.abspath(output_path)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    if abs_path.endswith('.csv'):
+        result.to_csv(abs_path, sep=sep, index=False)
+    else:
+        result.to_parquet(abs_path, index=False)
+
+
+def score_file(
+    input_path,
+    output_path,
+    cfg: 'DictConfig',
+    workers=None,
+    shards=None,
+    chunk_rows=None,
+    sep='|',
+):
+    """Predice un archivo de siniestros en paralelo con un pool de procesos.
+
+    El archivo se divide en rangos de bytes que se reparten entre `workers` procesos; cada
+    proceso carga los artefactos una vez y procesa sus rangos en bloques vectorizados. Los
+    resultados se escriben en el orden de entrada.
+
+    Args:
+        input_path (str): Archivo de siniestros delimitado por `sep` con cabecera.
+        output_path (str): Archivo de salida (`.parquet` o `.csv`).
+        cfg (DictConfig): Configuración de Hydra.
+        workers (int, optional): Procesos del pool. Por defecto, uno por núcleo.
+        shards (int, optional): Rangos de bytes. Por defecto, cuatro por proceso.
+        chunk_rows (int, optional): Filas por bloque. Por defecto `streaming.chunk_rows`.
+        sep (str): Separador de columnas.
+
+    Returns:
+        dict: Filas, errores, segundos y filas por segundo totales y por proceso.
+    """
+    logger = get_logger()
+
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * 4
+    chunk_rows = chunk_rows or int(cfg.streaming.chunk_rows)
+
+    started = time.perf_counter()
+    header, ranges = byte_shards(input_path, shards)
+    logger.info(
+        f'Scoring de {input_path} en {len(ranges)} rangos con {workers} procesos'
+    )
+
+    # spawn: los procesos no heredan los hilos del logger del proceso principal
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(cfg,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                score_shard, input_path, start, end, header, chunk_rows, sep
+            )
+            for start, end in ranges
+        ]
+        outputs = [future.result() for future in futures]
+
+    frames = [frame for _, _, frame in outputs]
+    result = (
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    )
+    write_results(result, output_path, sep=sep)
+    seconds = time.perf_counter() - started
+
+    per_worker = {}
+    for pid, busy, frame in outputs:
+        stats = per_worker.setdefault(pid, {'rows': 0, 'seconds': 0.0})
+        stats['rows'] += len(frame)
+        stats['seconds'] += busy
+    for stats in per_worker.values():
+        stats['rows_per_sec'] = (
+            stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        )
+
+    report = {
+        'rows': len(result),
+        'errors': int(result['error'].notna().sum()),
+        'seconds': seconds,
+        'rows_per_sec': len(result) / seconds if seconds else 0.0,
+        'workers': per_worker,
+    }
+    logger.info(
+        f'Archivo de {report["rows"]} siniestros procesado en {round(seconds, 4)}s '
+        f'con {report["errors"]} errores'
+    )
+    return report
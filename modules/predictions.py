@@ -0,0 +1,236 @@
+import atexit
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import AuditLogWriter
+from modules.metrics import METRICS
+
+from .cache import KEY_FIELDS
+
+# columnas de la tabla `predictions`, en el orden de inserción
+COLUMNS = (
+    'claim_id',
+    'timestamp',
+    'version',
+    *KEY_FIELDS,
+    'prediction',
+    'execution_time',
+)
+
+STORE_LOOKUPS = METRICS.counter(
+    'hdi_prediction_store_lookups_total',
+    'Consultas idempotentes al almacén de predicciones por resultado.',
+    ('result',),
+)
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PredictionStore(AuditLogWriter):
+    """Historial de predicciones en SQLite (modo WAL), indexado por `claim_id` y fecha.
+
+    Las filas se encolan desde la solicitud y un hilo en segundo plano las inserta en lotes,
+    una transacción por lote, igual que el CSV de auditoría. La consulta por `claim_id` usa el
+    índice `(claim_id, timestamp)`, por lo que su coste es logarítmico en el tamaño de la tabla;
+    el índice por `timestamp` permite agregar un rango de fechas sin recorrer la tabla.
+
+    Las filas encoladas que aún no se insertaron se consultan en memoria, de modo que una
+    predicción se puede leer en cuanto se responde.
+
+    Args:
+        path (str): Ruta del archivo SQLite, relativa a la raíz del proyecto.
+        queue_size (int): Capacidad de la cola de inserción.
+        batch_size (int): Filas máximas por transacción.
+        flush_interval (float): Segundos máximos que una fila espera en memoria.
+    """
+
+    label = 'predicciones'
+
+    def __init__(self, path, queue_size=10000, batch_size=512, flush_interval=0.5):
+        super().__init__(
+            os.path.join(root_dir, path),
+            queue_size=queue_size,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        self.path = self.csv_path
+        self._local = threading.local()
+        # claim_id -> filas encoladas pendientes de insertar
+        self._unwritten = {}
+        self._unwritten_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'id INTEGER PRIMARY KEY, claim_id INTEGER NOT NULL, '
+                'timestamp REAL NOT NULL, version TEXT, marca_vehiculo TEXT, '
+                'antiguedad_vehiculo INTEGER, tipo_poliza INTEGER, taller INTEGER, '
+                'partes_a_reparar INTEGER, partes_a_reemplazar INTEGER, '
+                'prediction REAL NOT NULL, execution_time REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS predictions_claim_id '
+                'ON predictions (claim_id, timestamp)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS predictions_timestamp '
+                'ON predictions (timestamp)'
+            )
+
+    @classmethod
+    def from_config(cls, cfg: 'DictConfig'):
+        """Construye el almacén desde la sección `predictions`, o devuelve None si está
+        deshabilitado."""
+        predictions = cfg.predictions
+        if not predictions.enabled:
+            return None
+        store = cls(
+            predictions.path,
+            queue_size=predictions.queue_size,
+            batch_size=predictions.batch_size,
+            flush_interval=predictions.flush_interval,
+        )
+        atexit.register(store.close)
+        return store
+
+    def _connection(self):
+        # una conexión por hilo y por proceso, como en la caché en disco
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def record(self, rows, version):
+        """Encola predicciones para insertarlas en segundo plano.
+
+        Args:
+            rows (list): Filas del CSV de auditoría (campos de `Claim`, `prediction` y
+                `execution_time`); `timestamp` se toma del momento de la llamada.
+            version (str): Versión de los artefactos que hizo las predicciones.
+        """
+        timestamp = datetime.now().timestamp()
+        for row in rows:
+            record = {
+                **{column: row.get(column) for column in COLUMNS},
+                'timestamp': timestamp,
+                'version': version,
+            }
+            with self._unwritten_lock:
+                self._unwritten.setdefault(record['claim_id'], []).append(record)
+            if not self.write(record):
+                self._forget([record])
+
+    def _forget(self, batch):
+        with self._unwritten_lock:
+            for record in batch:
+                pending = self._unwritten.get(record['claim_id'])
+                if pending is None:
+                    continue
+                pending[:] = [item for item in pending if item is not record]
+                if not pending:
+                    del self._unwritten[record['claim_id']]
+
+    def _write(self, batch):
+        try:
+            with self._connection() as connection:
+                connection.executemany(
+                    f'INSERT INTO predictions ({", ".join(COLUMNS)}) '
+                    f'VALUES ({", ".join("?" * len(COLUMNS))})',
+                    [tuple(record[column] for column in COLUMNS) for record in batch],
+                )
+        finally:
+            self._forget(batch)
+
+    @staticmethod
+    def _format(record):
+        return {
+            **record,
+            'timestamp': datetime.fromtimestamp(record['timestamp']).strftime(
+                '%Y-%m-%d %H:%M:%S'
+            ),
+        }
+
+    def history(self, claim_id, limit=100):
+        """Predicciones de un siniestro, de la más reciente a la más antigua.
+
+        Args:
+            claim_id (int): Id del siniestro.
+            limit (int): Número máximo de predicciones.
+
+        Returns:
+            list: Diccionarios con las columnas de `COLUMNS`.
+        """
+        with self._unwritten_lock:
+            pending = list(self._unwritten.get(claim_id, ()))
+        rows = (
+            self._connection()
+            .execute(
+                f'SELECT {", ".join(COLUMNS)} FROM predictions WHERE claim_id = ? '
+                'ORDER BY timestamp DESC, id DESC LIMIT ?',
+                (claim_id, limit),
+            )
+            .fetchall()
+        )
+        # las pendientes son más recientes que todas las insertadas
+        records = [*reversed(pending), *(dict(row) for row in rows)][:limit]
+        return [self._format(record) for record in records]
+
+    def lookup(self, claim, version):
+        """Predicción más reciente de un siniestro ya evaluado con las mismas variables y la
+        misma versión de artefactos.
+
+        Args:
+            claim (Claim): Siniestro validado.
+            version (str): Versión de los artefactos que sirven la solicitud
+                (`ArtifactSnapshot.version`).
+
+        Returns:
+            float | None: Predicción guardada, o None si el siniestro no se evaluó, sus
+                variables cambiaron o se evaluó con otra versión del modelo o de los pipelines.
+        """
+        latest = self.history(claim.claim_id, limit=1)
+        if (
+            latest
+            and latest[0]['version'] == version
+            and all(latest[0][field] == getattr(claim, field) for field in KEY_FIELDS)
+        ):
+            STORE_LOOKUPS.inc(result='hit')
+            return latest[0]['prediction']
+        STORE_LOOKUPS.inc(result='miss')
+        return None
+
+    def daily(self, start, end):
+        """Número de predicciones y predicción media por día en `[start, end)`, sobre las
+        filas ya insertadas.
+
+        Args:
+            start (datetime): Inicio del rango.
+            end (datetime): Fin del rango (excluido).
+
+        Returns:
+            list: Diccionarios con `day`, `count` y `mean_prediction`.
+        """
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT date(timestamp, 'unixepoch', 'localtime') AS day, "
+                'COUNT(*) AS count, AVG(prediction) AS mean_prediction '
+                'FROM predictions WHERE timestamp >= ? AND timestamp < ? '
+                'GROUP BY day ORDER BY day',
+                (start.timestamp(), end.timestamp()),
+            )
+            .fetchall()
+        )
+        return [dict(row) for row in rows]
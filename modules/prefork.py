@@ -0,0 +1,238 @@
+import gc
+import os
+import select
+import signal
+import time
+
+import uvicorn
+
+from modules.logger_manager import get_logger, start_logger, stop_logger
+
+# demora máxima entre reinicios de un worker que falla nada más arrancar
+MAX_RESTART_DELAY = 10.0
+
+
+class WorkerServer(uvicorn.Server):
+    """Servidor uvicorn de un worker que envía un latido al maestro desde su event loop.
+
+    El latido se escribe en `on_tick`, que uvicorn llama desde el propio event loop, por lo que
+    solo llega si el loop sigue respondiendo. Si el maestro terminó, el worker se detiene.
+    """
+
+    def __init__(self, config, heartbeat_fd, heartbeat_interval):
+        super().__init__(config)
+        self._heartbeat_fd = heartbeat_fd
+        self._heartbeat_interval = heartbeat_interval
+        self._last_heartbeat = 0.0
+
+    async def on_tick(self, counter):
+        now = time.monotonic()
+        if now - self._last_heartbeat >= self._heartbeat_interval:
+            self._last_heartbeat = now
+            try:
+                os.write(self._heartbeat_fd, b'.')
+            except OSError:
+                self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class PreforkServer:
+    """Servidor con un proceso maestro y varios workers creados con `fork`.
+
+    El maestro carga la configuración, el modelo, los pasos del pipeline y las imputaciones,
+    abre el socket y crea los workers con `fork`: los artefactos de solo lectura se comparten
+    copy-on-write en lugar de cargarse una vez por worker. Antes del fork se congela el
+    recolector de basura (`gc.freeze`) para que los workers no escriban en las páginas de los
+    objetos heredados al recorrerlos.
+
+    El maestro vigila a los workers: reinicia los que terminan y mata los que dejan de enviar
+    latidos durante `server.heartbeat_timeout` segundos. Con SIGTERM o SIGINT deja de
+    reiniciarlos y les reenvía SIGTERM; cada worker deja de aceptar conexiones, termina las
+    solicitudes en curso durante `server.graceful_timeout` segundos y ejecuta el apagado del
+    lifespan.
+
+    Args:
+        app (FastAPI): Aplicación ya importada en el maestro.
+        cfg (DictConfig): Configuración (secciones `api` y `server`).
+        workers (int, optional): Número de workers; por defecto `server.workers`, y con 0 uno
+            por núcleo.
+        host (str, optional): Dirección de escucha; por defecto `api.host`.
+        port (int, optional): Puerto; por defecto `api.port`.
+    """
+
+    def __init__(self, app, cfg, workers=None, host=None, port=None):
+        self.app = app
+        self._cfg = cfg
+        workers = cfg.server.workers if workers is None else workers
+        self.workers = int(workers) or os.cpu_count() or 1
+        self.host = host or cfg.api.host or '127.0.0.1'
+        self.port = int(port or cfg.api.port or 8000)
+        self._graceful_timeout = float(cfg.server.graceful_timeout)
+        self._heartbeat_interval = float(cfg.server.heartbeat_interval)
+        self._heartbeat_timeout = float(cfg.server.heartbeat_timeout)
+        self._socket = None
+        # pid -> (descriptor de lectura de latidos, instante de arranque, último latido)
+        self._children = {}
+        self._failures = 0
+        self._stopping = False
+
+    def _uvicorn_config(self):
+        return uvicorn.Config(
+            self.app,
+            host=self.host,
+            port=self.port,
+            backlog=int(self._cfg.server.backlog),
+            timeout_graceful_shutdown=self._graceful_timeout,
+            lifespan='on',
+        )
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        """Carga los artefactos, crea los workers y los vigila hasta recibir SIGTERM o SIGINT.
+
+        Raises:
+            RuntimeError: Si el sistema no admite `fork`.
+        """
+        if not hasattr(os, 'fork'):
+            raise RuntimeError('El servidor pre-fork requiere os.fork (Linux o macOS)')
+        logger = get_logger()
+
+        started = time.perf_counter()
+        snapshot = self.app.state.registry.load()
+        logger.info(
+            f'Artefactos de la versión {snapshot.version} cargados en el maestro en '
+            f'{time.perf_counter() - started:.3f} s'
+        )
+        self._socket = self._uvicorn_config().bind_socket()
+
+        # los workers no heredan hilos: el listener del logger se detiene antes del fork
+        stop_logger()
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info(
+            f'Maestro {os.getpid()} escuchando en {self.host}:{self.port} con '
+            f'{self.workers} workers'
+        )
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while not self._stopping:
+                self._supervise()
+        finally:
+            self._drain()
+            self._socket.close()
+        logger.info('Servidor pre-fork detenido')
+
+    def _spawn(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_worker(write_fd)
+        os.close(write_fd)
+        now = time.monotonic()
+        self._children[pid] = (read_fd, now, now)
+        get_logger().info(f'Worker {pid} iniciado')
+
+    def _run_worker(self, heartbeat_fd):
+        status = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            for read_fd, _, _ in self._children.values():
+                os.close(read_fd)
+            if self._cfg.logger.queue:
+                start_logger()
+            server = WorkerServer(
+                self._uvicorn_config(), heartbeat_fd, self._heartbeat_interval
+            )
+            server.run(sockets=[self._socket])
+            # uvicorn no marca el servidor como iniciado si falla el arranque del lifespan
+            status = 0 if server.started else 3
+        except BaseException as e:
+            get_logger().error(f'Error en el worker {os.getpid()}: {e}')
+        finally:
+            # sin volver a la pila del maestro ni ejecutar sus manejadores de atexit
+            os._exit(status)
+
+    def _supervise(self):
+        fds = {read_fd: pid for pid, (read_fd, _, _) in self._children.items()}
+        try:
+            readable, _, _ = select.select(list(fds), [], [], self._heartbeat_interval)
+        except InterruptedError:
+            readable = []
+        now = time.monotonic()
+        for read_fd in readable:
+            pid = fds[read_fd]
+            if os.read(read_fd, 4096):
+                _, spawned_at, _ = self._children[pid]
+                self._children[pid] = (read_fd, spawned_at, now)
+
+        for pid, (_, _, last_heartbeat) in list(self._children.items()):
+            if now - last_heartbeat > self._heartbeat_timeout:
+                get_logger().error(
+                    f'Worker {pid} sin latido desde hace {now - last_heartbeat:.1f} s, '
+                    'se reinicia'
+                )
+                self._kill(pid, signal.SIGKILL)
+
+        while self._children and not self._stopping:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            self._reap(pid, status)
+            self._restart()
+
+    def _reap(self, pid, status):
+        read_fd, spawned_at, _ = self._children.pop(pid, (None, None, None))
+        if read_fd is None:
+            return
+        os.close(read_fd)
+        get_logger().warning(
+            f'Worker {pid} terminó con código {os.waitstatus_to_exitcode(status)}'
+        )
+        # un worker que falla nada más arrancar se reinicia con espera creciente
+        if time.monotonic() - spawned_at < self._heartbeat_timeout:
+            self._failures += 1
+        else:
+            self._failures = 0
+
+    def _restart(self):
+        if self._failures:
+            delay = min(0.1 * 2 ** (self._failures - 1), MAX_RESTART_DELAY)
+            deadline = time.monotonic() + delay
+            while not self._stopping and time.monotonic() < deadline:
+                time.sleep(min(0.1, delay))
+        if not self._stopping:
+            self._spawn()
+
+    def _kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _drain(self):
+        """Reenvía SIGTERM a los workers y espera a que terminen sus solicitudes en curso."""
+        get_logger().info(f'Deteniendo {len(self._children)} workers')
+        for pid in list(self._children):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self._graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.05)
+                continue
+            read_fd, _, _ = self._children.pop(pid, (None, None, None))
+            if read_fd is not None:
+                os.close(read_fd)
+        for pid in list(self._children):
+            get_logger().error(f'Worker {pid} no terminó a tiempo, se mata')
+            self._kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            os.close(self._children.pop(pid)[0])
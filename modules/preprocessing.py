@@ -1,27 +1,224 @@
+import builtins
+import dis
 import os
+import types
+from typing import NamedTuple
 
 import dill
 import numpy as np
 import pandas as pd
 
 from modules.logger_manager import get_logger
-from utils import load_dict, validate_types
+from modules.metrics import track
+from utils import load_dict
 
-from .imputation import null_imputation
+from .schema import CompiledSchema
 
 # root dir
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# llamadas bloqueantes que se neutralizan en modo producción
+SLEEP_CALLS = {('time', 'sleep')}
 
-def pipeline_run(df, pipeline_file):
-    """Ejecuta un pipeline de transformación sobre los datos en un contexto de ejecución donde np está disponible.
+# llamadas de E/S de archivos o red que se rechazan en modo producción
+IO_CALLS = {
+    ('builtins', 'open'),
+    ('builtins', 'input'),
+    ('io', 'open'),
+    ('os', 'system'),
+    ('os', 'popen'),
+    ('os', 'open'),
+    ('numpy', 'load'),
+    ('numpy', 'save'),
+    ('numpy', 'loadtxt'),
+    ('numpy', 'savetxt'),
+    ('numpy', 'fromfile'),
+}
+# alias convencionales de módulos que pueden no estar en los globales serializados por dill
+MODULE_ALIASES = {'np': 'numpy', 'pd': 'pandas'}
+
+IO_MODULES = {
+    'socket',
+    'subprocess',
+    'requests',
+    'urllib',
+    'http',
+    'ftplib',
+    'smtplib',
+    'shutil',
+    'pathlib',
+}
+
+# reporte de llamadas bloqueantes encontradas por archivo de pipeline
+_pipeline_reports = {}
+
+
+class BlockingCall(NamedTuple):
+    """Llamada bloqueante encontrada en el código de un paso del pipeline."""
+
+    call: str
+    kind: str
+    line: int
+    action: str
+
+
+def _classify_call(module, attr):
+    if (module, attr) in SLEEP_CALLS:
+        return 'sleep'
+    if (module, attr) in IO_CALLS or module.split('.')[0] in IO_MODULES:
+        return 'io'
+    if module == 'pandas' and (attr.startswith('read_') or attr.startswith('to_')):
+        return 'io'
+    return None
+
+
+def inspect_pipeline(pipeline):
+    """Inspecciona el bytecode de un paso del pipeline buscando llamadas bloqueantes.
+
+    Se detectan `time.sleep` y llamadas de E/S de archivos o red, tanto si el módulo se importa
+    dentro de la función como si se referencia desde sus globales. El análisis incluye las
+    funciones anidadas. Los nombres `np` y `pd` se resuelven como `numpy` y `pandas` aunque no
+    estén en los globales de la función.
+
+    El análisis es estático y solo sigue referencias a módulos: las llamadas a métodos de objetos
+    (por ejemplo `df.to_csv(...)` o `df.to_parquet(...)` sobre un DataFrame) no se detectan.
+
+    Args:
+        pipeline (Callable): Función del pipeline cargada con dill.
+
+    Returns:
+        list: Lista de `BlockingCall` con la llamada, su tipo y la línea donde aparece.
+    """
+    func_globals = getattr(pipeline, '__globals__', {})
+    findings = []
+
+    def resolve_global(name):
+        value = func_globals.get(name)
+        if isinstance(value, types.ModuleType):
+            return value.__name__
+        if value is None and name in MODULE_ALIASES:
+            return MODULE_ALIASES[name]
+        if value is None and hasattr(builtins, name):
+            return 'builtins'
+        return None
+
+    def walk(code):
+        aliases = {}
+        current = None
+        line = code.co_firstlineno
+        for instruction in dis.get_instructions(code):
+            if instruction.starts_line is not None:
+                line = instruction.starts_line
+            op, arg = instruction.opname, instruction.argval
+
+            if op == 'IMPORT_NAME':
+                current = ('module', arg)
+            elif op == 'IMPORT_FROM' and current is not None and current[0] == 'module':
+                kind = _classify_call(current[1], arg)
+                if kind is not None:
+                    findings.append(BlockingCall(f'{current[1]}.{arg}', kind, line, ''))
+            elif op in ('STORE_FAST', 'STORE_NAME', 'STORE_GLOBAL', 'STORE_DEREF'):
+                if current is not None and current[0] == 'module':
+                    aliases[arg] = current[1]
+                current = None
+            elif op in ('LOAD_FAST', 'LOAD_DEREF', 'LOAD_NAME', 'LOAD_GLOBAL'):
+                module = (
+                    aliases.get(arg)
+                    if op in ('LOAD_FAST', 'LOAD_DEREF')
+                    else resolve_global(arg)
+                )
+                if module == 'builtins':
+                    kind = _classify_call('builtins', arg)
+                    if kind is not None:
+                        findings.append(BlockingCall(arg, kind, line, ''))
+                    current = None
+                else:
+                    current = ('module', module) if module is not None else None
+            elif (
+                op in ('LOAD_ATTR', 'LOAD_METHOD')
+                and current is not None
+                and current[0] == 'module'
+            ):
+                kind = _classify_call(current[1], arg)
+                if kind is not None:
+                    findings.append(BlockingCall(f'{current[1]}.{arg}', kind, line, ''))
+                current = ('module', f'{current[1]}.{arg}')
+            else:
+                current = None
+
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                walk(const)
+
+    code = getattr(pipeline, '__code__', None)
+    if code is not None:
+        walk(code)
+    return findings
+
+
+def _noop_sleep(*args, **kwargs):
+    return None
+
+
+def _sanitize_pipeline(pipeline):
+    """Reconstruye la función con un contexto propio en el que `time.sleep` es un no-op."""
+    safe_time = types.ModuleType('time')
+    safe_time.__dict__.update(__import__('time').__dict__)
+    safe_time.sleep = _noop_sleep
+
+    def safe_import(name, *args, **kwargs):
+        if name == 'time':
+            return safe_time
+        return builtins.__import__(name, *args, **kwargs)
+
+    safe_builtins = dict(builtins.__dict__)
+    safe_builtins['__import__'] = safe_import
+
+    func_globals = {
+        name: (safe_time if value is __import__('time') else value)
+        for name, value in pipeline.__globals__.items()
+    }
+    func_globals.update({'np': np, 'pd': pd, '__builtins__': safe_builtins})
+    if func_globals.get('sleep') is __import__('time').sleep:
+        func_globals['sleep'] = _noop_sleep
+
+    sanitized = types.FunctionType(
+        pipeline.__code__,
+        func_globals,
+        pipeline.__name__,
+        pipeline.__defaults__,
+        pipeline.__closure__,
+    )
+    sanitized.__kwdefaults__ = pipeline.__kwdefaults__
+    sanitized.__dict__.update(pipeline.__dict__)
+    return sanitized
+
+
+def pipeline_report():
+    """Devuelve las llamadas bloqueantes encontradas en los pipelines cargados.
+
+    Returns:
+        dict: Lista de `BlockingCall` por ruta absoluta de pipeline.
+    """
+    return {path: list(findings) for path, findings in _pipeline_reports.items()}
+
+
+def load_pipeline(pipeline_file, mode='production'):
+    """Carga un paso del pipeline serializado con dill y le inyecta np y pd en su contexto de ejecución.
+
+    Antes de entregarlo se inspecciona su código en busca de llamadas bloqueantes. En modo
+    "production" las llamadas a `time.sleep` se reemplazan por no-ops y las llamadas de E/S de
+    archivos o red hacen que el pipeline se rechace. En modo "development" solo se reportan.
 
     Args:
-        df (DataFrame): DataFrame con datos a transformar.
         pipeline_file (str): Ruta al archivo del pipeline.
+        mode (str): "production" o "development".
+
+    Raises:
+        RuntimeError: Si en modo producción el pipeline contiene llamadas de E/S.
 
     Returns:
-        DataFrame: DataFrame transformado.
+        Callable: Función del pipeline lista para ejecutarse.
     """
     abs_pipeline_file = os.path.join(root_dir, pipeline_file)
 
@@ -32,9 +229,54 @@ def pipeline_run(df, pipeline_file):
     with open(abs_pipeline_file, 'rb') as file:
         pipeline = dill.load(file)
 
-    if hasattr(pipeline, '__globals__'):
+    if not hasattr(pipeline, '__globals__'):
+        return pipeline
+
+    # Inspeccionar llamadas bloqueantes
+    production = mode == 'production'
+    findings = inspect_pipeline(pipeline)
+    if production:
+        findings = [
+            finding._replace(action='patched' if finding.kind == 'sleep' else 'refused')
+            for finding in findings
+        ]
+    else:
+        findings = [finding._replace(action='reported') for finding in findings]
+    _pipeline_reports[abs_pipeline_file] = findings
+
+    for finding in findings:
+        logger.warning(
+            f'Llamada bloqueante {finding.call} en la línea {finding.line} de {pipeline_file}: {finding.action}'
+        )
+
+    if not production:
         pipeline.__globals__['np'] = np
         pipeline.__globals__['pd'] = pd
+        return pipeline
+
+    refused = [finding.call for finding in findings if finding.action == 'refused']
+    if refused:
+        raise RuntimeError(
+            f'El pipeline {pipeline_file} contiene llamadas de E/S no permitidas: {refused}'
+        )
+
+    return _sanitize_pipeline(pipeline)
+
+
+def pipeline_run(df, pipeline):
+    """Ejecuta un pipeline de transformación sobre los datos en un contexto de ejecución donde np está disponible.
+
+    Args:
+        df (DataFrame): DataFrame con datos a transformar.
+        pipeline (str | Callable): Ruta al archivo del pipeline o función ya cargada con `load_pipeline`.
+
+    Returns:
+        DataFrame: DataFrame transformado.
+    """
+    logger = get_logger()
+
+    if isinstance(pipeline, str):
+        pipeline = load_pipeline(pipeline)
 
     # Ejecutar el pipeline directamente
     try:
@@ -47,12 +289,15 @@ def pipeline_run(df, pipeline_file):
     return result
 
 
-def full_pipeline(df, cfg):
+def full_pipeline(df, cfg, artifacts=None, monitor=None):
     """Ejecuta el pipeline basado en pasos de transformación sobre los datos.
 
     Args:
         df (DataFrame): Dataframe con datos a transformar.
         cfg (DictConfig): Configuración de Hydra que contiene las rutas de los pipelines e imputaciones.
+        artifacts (ArtifactSnapshot, optional): Pasos e imputaciones ya cargados por el registro de
+            artefactos. Si no se entrega, se leen desde disco.
+        monitor (DriftMonitor, optional): Recibe los nulos imputados por columna.
 
     Returns:
         DataFrame: Dataframe con datos transformados por el pipeline completo.
@@ -60,30 +305,37 @@ def full_pipeline(df, cfg):
     logger = get_logger()
 
     # pipeline steps
-    for step in cfg.pipeline.steps:
-        logger.info(f'Ejecutando {step.name} con pipeline: {step.pipeline}')
-        df = pipeline_run(df, step.pipeline)
+    steps = [(step.name, step.pipeline) for step in cfg.pipeline.steps]
+    if artifacts is not None:
+        pipelines = artifacts.pipelines
+        steps = artifacts.steps or steps
+    else:
+        pipelines = [load_pipeline(path, cfg.pipeline.mode) for _, path in steps]
+    for (name, path), pipeline in zip(steps, pipelines):
+        logger.info(f'Ejecutando {name} con pipeline: {path}')
+        with track(f'pipeline:{name}'):
+            df = pipeline_run(df, pipeline)
 
     # df to json
     # logger.info("Transformando a JSON...")
     # df_json = df.to_json(orient="records")
     # print(f"Pipeline completo: {df_json}")
 
-    # load imputation dict
-    logger.info('Cargando el diccionario de imputaciones...')
-    imputation_path = cfg.pipeline.imputacion_path
-    imputation_dict = load_dict(imputation_path)
-
-    # null imputation
-    logger.info('Imputando valores nulos...')
-    df = null_imputation(df, imputation_dict)
-
-    # print("Transformando a JSON...")
-    # df_json = df.to_json(orient="records")
-    # print(f"Datos post imputación: {df_json}")
+    # load imputation schema
+    if artifacts is not None and artifacts.schema is not None:
+        schema = artifacts.schema
+    else:
+        if artifacts is not None:
+            imputation_dict = artifacts.imputation_dict
+        else:
+            logger.info('Cargando el diccionario de imputaciones...')
+            imputation_path = cfg.pipeline.imputacion_path
+            imputation_dict = load_dict(imputation_path)
+        schema = CompiledSchema(imputation_dict)
 
-    # validate columns and types
-    logger.info('Validando columnas y tipos...')
-    validate_types(df)
+    # null imputation, columns and types in a single pass
+    logger.info('Imputando valores nulos y validando columnas y tipos...')
+    with track('schema'):
+        df = schema.apply(df, monitor)
 
     return df
@@ -0,0 +1,329 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Tuple
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger
+from utils import load_dict
+
+from .fused import compile_fused
+from .linear import compile_linear_model
+from .mlflow import load_model
+from .preprocessing import load_pipeline
+from .rules import RuleEngine
+from .schema import CompiledSchema
+from .scoring import predict_frame
+from .versions import ModelStore
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# siniestro con el que se calienta una versión antes de activarla
+WARMUP_CLAIM = {
+    'claim_id': 0,
+    'marca_vehiculo': 'ferd',
+    'antiguedad_vehiculo': 1,
+    'tipo_poliza': 1,
+    'taller': 1,
+    'partes_a_reparar': 1,
+    'partes_a_reemplazar': 1,
+}
+
+
+@dataclass(frozen=True)
+class ArtifactSnapshot:
+    """Conjunto inmutable de artefactos que se entrega a cada solicitud.
+
+    Attributes:
+        model: Modelo cargado. Se comparte entre solicitudes y debe tratarse como solo lectura.
+        pipelines (tuple): Funciones de los pasos del pipeline, en el orden de `cfg.pipeline.steps`.
+        imputation_dict (Mapping): Diccionario de imputaciones de solo lectura.
+        version (str): Huella de los archivos que originaron el snapshot.
+        fused (FusedTransform): Transform fusionado verificado contra los pipelines, o None.
+        rules (RuleEngine): Reglas de negocio que se evalúan antes del pipeline, o None.
+        steps (tuple): Pares `(nombre, ruta)` de los pasos del pipeline. Vacío si son los de
+            `cfg.pipeline.steps`.
+        schema (CompiledSchema): Esquema de imputación y tipos compilado desde
+            `imputation_dict`, o None para compilarlo en cada llamada.
+    """
+
+    model: Any
+    pipelines: Tuple[Callable, ...]
+    imputation_dict: Mapping[str, Any]
+    version: str
+    fused: Any = None
+    rules: Any = None
+    steps: Tuple[Tuple[str, str], ...] = ()
+    schema: Any = None
+
+
+class ArtifactRegistry:
+    """Registro de artefactos del proceso: carga el modelo, los pasos del pipeline y el
+    diccionario de imputaciones una sola vez y los recarga solo cuando cambian en disco.
+
+    Las recargas posteriores a la primera carga se hacen en un hilo de fondo, de modo que
+    `snapshot` nunca bloquea el event loop; si una recarga falla se registra el error y se
+    sigue sirviendo el snapshot anterior.
+
+    Con un almacén de versiones (`registry.store`), los artefactos se leen de la versión a la
+    que apunta `ACTIVE` y, si hay una versión en `SHADOW`, se mantiene además cargado su
+    snapshot para el scoring en sombra. Cada solicitud usa el snapshot que obtuvo al empezar,
+    por lo que el cambio de versión es un reemplazo atómico de la referencia entre solicitudes.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra con las rutas de los artefactos.
+    """
+
+    def __init__(self, cfg: 'DictConfig'):
+        self._cfg = cfg
+        self._check_interval = float(cfg.registry.check_interval)
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._snapshot = None
+        self._fingerprints = {}
+        self._last_check = 0.0
+        self.store = ModelStore.from_config(cfg)
+        self._shadow = None
+
+    def _sources(self, version=None):
+        """Devuelve la versión, las rutas absolutas de los artefactos indexadas por tipo y los
+        pares `(nombre, ruta)` de los pasos del pipeline.
+
+        Sin `version` se usa la versión activa del almacén o, si no hay, la configuración.
+        """
+        if version is None and self.store is not None:
+            version = self.store.active()
+        if version is not None:
+            paths, steps = self.store.paths(version)
+            return version, paths, steps
+
+        steps = tuple((step.name, step.pipeline) for step in self._cfg.pipeline.steps)
+        paths = {
+            'model': os.path.join(root_dir, self._cfg.models.model_path),
+            'imputation': os.path.join(root_dir, self._cfg.pipeline.imputacion_path),
+            **{
+                f'pipeline_{i}': os.path.join(root_dir, path)
+                for i, (_, path) in enumerate(steps)
+            },
+        }
+        return None, paths, steps
+
+    @staticmethod
+    def _fingerprint(path: str) -> tuple:
+        """Huella barata de un archivo basada en su ruta, mtime y tamaño."""
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> ArtifactSnapshot:
+        """Fuerza la carga de todos los artefactos (usado en el arranque de la API).
+
+        Returns:
+            ArtifactSnapshot: Snapshot recién cargado.
+        """
+        with self._lock:
+            self._fingerprints = {}
+            self._reload()
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Recarga los artefactos cuyo archivo cambió desde la última carga.
+
+        Returns:
+            bool: True si se recargó algún artefacto.
+        """
+        with self._lock:
+            return self._reload()
+
+    def snapshot(self) -> ArtifactSnapshot:
+        """Devuelve el snapshot vigente, comprobando cambios en disco como máximo una vez
+        cada `registry.check_interval` segundos.
+
+        Solo la primera carga es síncrona; las comprobaciones siguientes se lanzan en un hilo
+        de fondo y esta llamada devuelve el snapshot vigente sin esperarlas.
+
+        Returns:
+            ArtifactSnapshot: Referencias inmutables a los artefactos cargados.
+        """
+        if self._snapshot is None:
+            self.refresh()
+        elif (
+            time.monotonic() - self._last_check >= self._check_interval
+            and self._reload_lock.acquire(blocking=False)
+        ):
+            self._last_check = time.monotonic()
+            self._reload_thread = threading.Thread(
+                target=self._background_refresh,
+                name='artifact-registry-reload',
+                daemon=True,
+            )
+            self._reload_thread.start()
+        return self._snapshot
+
+    def shadow_snapshot(self):
+        """Devuelve el snapshot de la versión en sombra, o None si no hay."""
+        return self._shadow
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            get_logger().error(
+                f'Error al recargar los artefactos, se mantiene la versión {self._snapshot.version}: {e}'
+            )
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self) -> bool:
+        self._last_check = time.monotonic()
+
+        version, paths, steps = self._sources()
+        snapshot, fingerprints = self._build(
+            version, paths, steps, self._snapshot, self._fingerprints
+        )
+        if snapshot is not None:
+            self._snapshot = snapshot
+            self._fingerprints = fingerprints
+            get_logger().info(
+                f'Artefactos disponibles en la versión {snapshot.version}'
+            )
+
+        if self.store is not None:
+            try:
+                self._reload_shadow()
+            except Exception as e:
+                # la versión en sombra nunca afecta a la versión en servicio
+                get_logger().error(f'Error al cargar la versión en sombra: {e}')
+        return snapshot is not None
+
+    def _reload_shadow(self):
+        version = self.store.shadow()
+        current = self._shadow.version if self._shadow is not None else None
+        if version == current:
+            return
+        if version is None:
+            get_logger().info(f'Versión en sombra {current} desactivada')
+            self._shadow = None
+            return
+        self._shadow = self._prepare(version)[0]
+        get_logger().info(f'Versión {version} cargada en sombra')
+
+    def _build(self, version, paths, steps, current, known):
+        """Construye un snapshot reutilizando los artefactos de `current` cuyo archivo no
+        cambió según las huellas `known`.
+
+        Returns:
+            tuple: Nuevo snapshot (None si nada cambió) y huellas de sus archivos.
+        """
+        logger = get_logger()
+
+        fingerprints = {key: self._fingerprint(path) for key, path in paths.items()}
+        changed = [key for key in paths if fingerprints[key] != known.get(key)]
+        if not changed and current is not None:
+            return None, fingerprints
+
+        model = current.model if current is not None else None
+        imputation_dict = current.imputation_dict if current is not None else None
+        schema = current.schema if current is not None else None
+        pipelines = [
+            current.pipelines[i]
+            if current is not None and i < len(current.pipelines)
+            else None
+            for i in range(len(steps))
+        ]
+
+        for key in changed:
+            logger.info(f'Cargando artefacto {key} desde: {paths[key]}')
+            if key == 'model':
+                model = load_model(self._cfg, paths[key])
+                if self._cfg.models.compile_linear:
+                    model = compile_linear_model(model)
+            elif key == 'imputation':
+                imputation_dict = MappingProxyType(load_dict(paths[key]))
+                schema = CompiledSchema(imputation_dict)
+            else:
+                index = int(key.split('_')[1])
+                pipelines[index] = load_pipeline(
+                    steps[index][1], self._cfg.pipeline.mode
+                )
+
+        digest = hashlib.sha1(
+            repr(sorted(fingerprints.items())).encode('utf-8')
+        ).hexdigest()[:12]
+        snapshot = ArtifactSnapshot(
+            model=model,
+            pipelines=tuple(pipelines),
+            imputation_dict=imputation_dict,
+            version=version or digest,
+            rules=RuleEngine.from_config(self._cfg),
+            steps=steps,
+            schema=schema,
+        )
+        if current is not None and changed == ['model']:
+            fused = current.fused
+        else:
+            fused = compile_fused(self._cfg, snapshot)
+        return replace(snapshot, fused=fused), fingerprints
+
+    def _prepare(self, version):
+        """Carga una versión del almacén y la calienta con una predicción, sin publicarla."""
+        version, paths, steps = self._sources(version)
+        snapshot, fingerprints = self._build(version, paths, steps, None, {})
+        # la primera predicción paga la inicialización perezosa del modelo y del pipeline
+        predict_frame(
+            pd.DataFrame([WARMUP_CLAIM]), self._cfg, replace(snapshot, rules=None)
+        )
+        return snapshot, fingerprints
+
+    def activate(self, version) -> ArtifactSnapshot:
+        """Carga, calienta y activa una versión del almacén.
+
+        La versión se prepara antes de tomar el lock; el cambio es el reemplazo del puntero
+        `ACTIVE` y de la referencia al snapshot, por lo que las solicitudes en curso terminan
+        con la versión anterior y las siguientes usan la nueva. Los demás procesos la cargan en
+        su próxima comprobación.
+
+        Args:
+            version (str): Versión publicada en el almacén.
+
+        Raises:
+            KeyError: Si la versión no existe.
+            RuntimeError: Si no hay almacén de versiones configurado.
+
+        Returns:
+            ArtifactSnapshot: Snapshot activado.
+        """
+        if self.store is None:
+            raise RuntimeError('No hay un almacén de versiones configurado')
+        snapshot, fingerprints = self._prepare(version)
+        with self._lock:
+            self.store.set_active(version)
+            self._snapshot = snapshot
+            self._fingerprints = fingerprints
+        get_logger().info(f'Versión {version} activada')
+        return snapshot
+
+    def set_shadow(self, version):
+        """Carga una versión del almacén en sombra; con None se desactiva el modo sombra.
+
+        Raises:
+            KeyError: Si la versión no existe.
+            RuntimeError: Si no hay almacén de versiones configurado.
+        """
+        if self.store is None:
+            raise RuntimeError('No hay un almacén de versiones configurado')
+        shadow = self._prepare(version)[0] if version is not None else None
+        with self._lock:
+            self.store.set_shadow(version)
+            self._shadow = shadow
+        get_logger().info(
+            f'Versión {version} en sombra' if version else 'Modo sombra desactivado'
+        )
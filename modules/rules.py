@@ -0,0 +1,112 @@
+import operator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.metrics import METRICS
+
+RULE_MATCHES = METRICS.counter(
+    'hdi_rule_matches_total',
+    'Siniestros resueltos por una regla de negocio sin ejecutar el pipeline.',
+    ('rule',),
+)
+
+# operadores admitidos: (escalar, vectorizado sobre un arreglo de NumPy)
+OPERATORS = {
+    'eq': (operator.eq, operator.eq),
+    'ne': (operator.ne, operator.ne),
+    'lt': (operator.lt, operator.lt),
+    'le': (operator.le, operator.le),
+    'gt': (operator.gt, operator.gt),
+    'ge': (operator.ge, operator.ge),
+    'in': (lambda a, b: a in b, lambda a, b: np.isin(a, list(b))),
+    'not_in': (lambda a, b: a not in b, lambda a, b: ~np.isin(a, list(b))),
+}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Regla de negocio que fija la predicción de un siniestro sin ejecutar el modelo.
+
+    Attributes:
+        name (str): Nombre de la regla, usado en logs y métricas.
+        field (str): Campo de `Claim` que se evalúa.
+        op (str): Operador de `OPERATORS`.
+        value: Valor con el que se compara el campo (una lista para `in` y `not_in`).
+        prediction: Predicción que se devuelve cuando la regla se cumple.
+    """
+
+    name: str
+    field: str
+    op: str
+    value: Any
+    prediction: Any
+
+
+class RuleEngine:
+    """Evalúa reglas de negocio sobre los siniestros en crudo, antes de cualquier
+    preprocesamiento. Se aplica la primera regla que se cumple.
+
+    Args:
+        rules (Sequence[Rule]): Reglas en orden de prioridad.
+
+    Raises:
+        ValueError: Si una regla usa un operador desconocido.
+    """
+
+    def __init__(self, rules):
+        for rule in rules:
+            if rule.op not in OPERATORS:
+                raise ValueError(
+                    f'Operador {rule.op} desconocido en la regla {rule.name}'
+                )
+        self.rules: Tuple[Rule, ...] = tuple(rules)
+
+    @classmethod
+    def from_config(cls, cfg: 'DictConfig'):
+        """Construye el motor desde la sección `rules`, o devuelve None si está deshabilitada."""
+        if not cfg.rules.enabled:
+            return None
+        return cls([Rule(**dict(rule)) for rule in cfg.rules.definitions])
+
+    def match(self, claim):
+        """Devuelve la primera regla que cumple un siniestro, o None.
+
+        Args:
+            claim (Claim): Siniestro validado.
+
+        Returns:
+            Rule | None: Regla aplicada.
+        """
+        for rule in self.rules:
+            if OPERATORS[rule.op][0](getattr(claim, rule.field), rule.value):
+                RULE_MATCHES.inc(rule=rule.name)
+                return rule
+        return None
+
+    def evaluate(self, df):
+        """Evalúa las reglas sobre todas las filas con máscaras vectorizadas.
+
+        Args:
+            df (DataFrame): Siniestros en crudo.
+
+        Returns:
+            tuple: Máscara booleana de filas resueltas por alguna regla y arreglo float con
+            su predicción (NaN en las filas no resueltas).
+        """
+        matched = np.zeros(len(df), dtype=bool)
+        predictions = np.full(len(df), np.nan)
+        for rule in self.rules:
+            mask = np.asarray(
+                OPERATORS[rule.op][1](df[rule.field].to_numpy(), rule.value)
+            )
+            mask &= ~matched
+            if mask.any():
+                predictions[mask] = rule.prediction
+                matched |= mask
+                RULE_MATCHES.inc(int(mask.sum()), rule=rule.name)
+        return matched, predictions
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+from utils import EXPECTED_COLUMNS
+
+
+class SchemaError(ValueError):
+    """Error de validación con el detalle por columna y por fila.
+
+    Attributes:
+        errors (list): Tuplas `(columna, filas, mensaje)`; `filas` son las etiquetas del índice
+            afectadas, o None si el error afecta a todas (columna ausente).
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self._row_sets = [None if rows is None else set(rows) for _, rows, _ in errors]
+        super().__init__(
+            'Error al validar los datos: '
+            + '; '.join(
+                message if rows is None else f'{message} en las filas {rows}'
+                for _, rows, message in self.errors
+            )
+        )
+
+    @property
+    def rows(self):
+        """Filas con algún error, o None si alguno afecta a todas las filas."""
+        rows = set()
+        for _, error_rows, _ in self.errors:
+            if error_rows is None:
+                return None
+            rows.update(error_rows)
+        return sorted(rows)
+
+    def message_for(self, row):
+        """Mensajes de los errores que afectan a una fila, o None si la fila es válida."""
+        messages = [
+            message
+            for (_, _, message), rows in zip(self.errors, self._row_sets)
+            if rows is None or row in rows
+        ]
+        return '; '.join(messages) if messages else None
+
+
+class CompiledSchema:
+    """Esquema compilado una vez a partir del diccionario de imputaciones y de los tipos que
+    requiere el modelo.
+
+    `apply` reemplaza a `null_imputation` seguido de `validate_types`: las columnas tipadas se
+    copian a un bloque NumPy preasignado en el que la imputación de nulos, la comprobación de
+    valores finitos y el truncado de los enteros se hacen en una sola pasada vectorizada, y
+    solo se reescriben en el DataFrame las columnas que cambian de tipo o de valor.
+
+    Args:
+        imputation_dict (Mapping): Columna -> valor con el que se imputan sus nulos.
+        dtypes (Mapping): Columna -> tipo (`int` o `float`) que requiere el modelo.
+    """
+
+    def __init__(self, imputation_dict, dtypes=EXPECTED_COLUMNS):
+        self.columns = tuple(dtypes)
+        self.dtypes = tuple(np.dtype(dtype) for dtype in dtypes.values())
+        self.required = tuple(dict.fromkeys([*imputation_dict, *self.columns]))
+        self._integer = np.array([dtype.kind in 'iu' for dtype in self.dtypes])
+        self._fill = np.array(
+            [float(imputation_dict.get(column, np.nan)) for column in self.columns]
+        )
+        # columnas que solo se imputan, sin tipo requerido
+        self._fill_only = {
+            column: value
+            for column, value in imputation_dict.items()
+            if column not in dtypes
+        }
+
+    def _read_block(self, df, columns):
+        """Copia las columnas a un bloque float64; devuelve también los errores de las
+        columnas tipadas con valores no numéricos."""
+        try:
+            return df[columns].to_numpy(dtype=float, na_value=np.nan), []
+        except (TypeError, ValueError):
+            pass
+
+        errors = []
+        block = np.empty((len(df), len(columns)))
+        for j, column in enumerate(columns):
+            series = df[column]
+            try:
+                block[:, j] = series.to_numpy(dtype=float, na_value=np.nan)
+            except (TypeError, ValueError):
+                coerced = pd.to_numeric(series, errors='coerce').to_numpy(
+                    dtype=float, na_value=np.nan
+                )
+                invalid = np.isnan(coerced) & series.notna().to_numpy()
+                errors.append(
+                    (
+                        column,
+                        df.index[invalid].tolist(),
+                        f"Valores no numéricos en la columna '{column}'",
+                    )
+                )
+                block[:, j] = coerced
+        return block, errors
+
+    def apply(self, df, monitor=None):
+        """Imputa los nulos, comprueba las columnas y convierte los tipos en el lugar.
+
+        Args:
+            df (DataFrame): Salida de los pasos del pipeline.
+            monitor (DriftMonitor, optional): Recibe los nulos imputados por columna.
+
+        Raises:
+            SchemaError: Con todas las columnas ausentes, o con las filas de cada columna que
+                no son numéricas o que quedan sin un valor finito en una columna entera.
+
+        Returns:
+            DataFrame: El mismo DataFrame, imputado y con los tipos requeridos.
+        """
+        missing = [column for column in self.required if column not in df.columns]
+        if missing:
+            raise SchemaError(
+                [
+                    (column, None, f"Falta la columna '{column}' en el DataFrame")
+                    for column in missing
+                ]
+            )
+
+        # las columnas sin tipo requerido que son float se imputan en el mismo bloque; las
+        # enteras no tienen nulos y las demás se imputan con fillna
+        source_dtypes = df.dtypes
+        float_fill, other_fill = [], {}
+        for column, value in self._fill_only.items():
+            kind = source_dtypes[column].kind
+            if kind == 'f' and isinstance(value, (int, float)):
+                float_fill.append(column)
+            elif kind not in 'iub':
+                other_fill[column] = value
+
+        columns = [*self.columns, *float_fill]
+        fill = np.concatenate(
+            [self._fill, [float(self._fill_only[column]) for column in float_fill]]
+        )
+        integer = np.concatenate([self._integer, np.zeros(len(float_fill), bool)])
+        block, errors = self._read_block(df, columns)
+        typed = len(self.columns)
+        error_columns = {column for column, _, _ in errors}
+
+        # imputación de todas las columnas a la vez
+        nulls = np.isnan(block)
+        filled = nulls.any(axis=0)
+        if filled.any():
+            np.copyto(block, fill, where=nulls)
+
+        # las columnas enteras deben quedar finitas, como exige astype(int)
+        invalid = ~np.isfinite(block) & integer
+        for j in np.flatnonzero(invalid.any(axis=0)):
+            if columns[j] not in error_columns:
+                errors.append(
+                    (
+                        columns[j],
+                        df.index[invalid[:, j]].tolist(),
+                        f"Valores no finitos en la columna entera '{columns[j]}'",
+                    )
+                )
+        if errors:
+            raise SchemaError(errors)
+
+        if monitor is not None:
+            imputed = np.flatnonzero(~np.isnan(fill))
+            monitor.observe_imputation(
+                [*(columns[j] for j in imputed), *other_fill],
+                [
+                    *nulls[:, imputed].sum(axis=0),
+                    *(df[column].isna().sum() for column in other_fill),
+                ],
+                len(df),
+            )
+
+        np.trunc(block, out=block, where=integer)
+
+        # solo se reescriben las columnas imputadas o con otro tipo, agrupadas por tipo
+        targets = [*self.dtypes, *(np.dtype(float) for _ in float_fill)]
+        rewrite = {}
+        for j, column in enumerate(columns):
+            if filled[j] or (j < typed and source_dtypes[column] != targets[j]):
+                rewrite.setdefault(targets[j], []).append(j)
+        for dtype, indexes in rewrite.items():
+            df[[columns[j] for j in indexes]] = block[:, indexes].astype(dtype)
+
+        fill_other = {
+            column: value for column, value in other_fill.items() if df[column].hasnans
+        }
+        if fill_other:
+            df.fillna(fill_other, inplace=True)
+        return df
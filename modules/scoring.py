@@ -0,0 +1,212 @@
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from models import Claim
+from modules.logger_manager import get_logger
+from modules.metrics import track
+
+from .cache import cache_key
+from .linear import LinearKernel
+from .preprocessing import full_pipeline
+from .schema import SchemaError
+
+
+def predict_frame(df, cfg, artifacts, monitor=None):
+    """Ejecuta el pipeline completo y la predicción una sola vez sobre todas las filas.
+
+    Las filas que cumplen una regla de negocio (`artifacts.rules`) toman la predicción de la
+    regla y no pasan por el pipeline ni por el modelo.
+
+    Args:
+        df (DataFrame): Dataframe con los siniestros en crudo.
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Modelo, pipelines e imputaciones cargados.
+        monitor (DriftMonitor, optional): Recibe los nulos imputados por columna.
+
+    Returns:
+        ndarray: Predicciones en el mismo orden que las filas de entrada.
+    """
+    if artifacts.rules is not None:
+        with track('rules'):
+            matched, prediccion = artifacts.rules.evaluate(df)
+        if matched.all():
+            return prediccion
+        if matched.any():
+            prediccion[~matched] = _predict_model(
+                df.loc[~matched].reset_index(drop=True), cfg, artifacts, monitor
+            )
+            return prediccion
+
+    return _predict_model(df, cfg, artifacts, monitor)
+
+
+class _PendingImputation:
+    """Retiene las imputaciones de una pasada hasta que el modelo predice sin error.
+
+    Si la pasada falla, los reintentos (por bloque o fila a fila) vuelven a imputar las mismas
+    filas; reportarlas solo al terminar evita contarlas dos veces en el monitor de deriva.
+    """
+
+    def __init__(self, monitor):
+        self._monitor = monitor
+        self._observed = []
+
+    def observe_imputation(self, columns, counts, rows):
+        self._observed.append((columns, counts, rows))
+
+    def commit(self):
+        for columns, counts, rows in self._observed:
+            self._monitor.observe_imputation(columns, counts, rows)
+
+
+def _predict_model(df, cfg, artifacts, monitor=None):
+    modelo = artifacts.model
+    model_features = modelo.feature_names_in_
+    pending = _PendingImputation(monitor) if monitor is not None else None
+
+    if artifacts.fused is not None:
+        # una sola pasada NumPy equivalente a los pipelines dill
+        with track('fused_transform'):
+            df_for_prediction = artifacts.fused.transform(df, model_features, pending)
+        if not isinstance(modelo, LinearKernel):
+            df_for_prediction = pd.DataFrame(df_for_prediction, columns=model_features)
+    else:
+        df_for_prediction = full_pipeline(df, cfg, artifacts, pending)[model_features]
+
+    with track('predict'):
+        predicciones = np.asarray(modelo.predict(df_for_prediction), dtype=float)
+    if pending is not None:
+        pending.commit()
+    return predicciones
+
+
+@dataclass
+class ScoredBatch:
+    """Resultado de `score_batch`.
+
+    Attributes:
+        results (list): Un diccionario por fila de entrada con `claim_id`, `prediccion` y
+            `error`.
+        model_positions (list): Posiciones de las filas predichas por el pipeline y el modelo,
+            sin error; excluye las resueltas por una regla o por la caché.
+        model_seconds (float): Segundos dentro de `predict_frame`, incluidos los reintentos.
+    """
+
+    results: list
+    model_positions: list = field(default_factory=list)
+    model_seconds: float = 0.0
+
+
+def score_claims(records, cfg, artifacts, cache=None, monitor=None):
+    """Valida y predice un lote de siniestros reportando los errores fila a fila.
+
+    Las filas válidas se procesan en una única pasada vectorizada. Si esa pasada falla, se
+    vuelve a procesar cada fila por separado para aislar las filas con error.
+
+    Las filas que cumplen una regla de negocio toman su predicción sin consultar la caché.
+    Con `cache`, las filas cuya tupla de variables ya se predijo con la misma versión de
+    artefactos no pasan por el pipeline.
+
+    Args:
+        records (list): Lista de diccionarios con los campos de `Claim`.
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Modelo, pipelines e imputaciones cargados.
+        cache (PredictionCache, optional): Caché de predicciones.
+        monitor (DriftMonitor, optional): Recibe los nulos imputados por columna; las entradas
+            y las predicciones las registra quien sirve las filas.
+
+    Returns:
+        list: Un diccionario por fila de entrada con `claim_id`, `prediccion` y `error`.
+    """
+    return score_batch(records, cfg, artifacts, cache, monitor).results
+
+
+def score_batch(records, cfg, artifacts, cache=None, monitor=None):
+    """Igual que `score_claims`, indicando además qué filas pasaron por el modelo y cuánto
+    tardó, para comparar solo esas filas con la versión en sombra.
+
+    Returns:
+        ScoredBatch: Resultados por fila, posiciones predichas por el modelo y su latencia.
+    """
+    logger = get_logger()
+
+    batch = ScoredBatch(
+        [{'claim_id': None, 'prediccion': None, 'error': None} for _ in records]
+    )
+    results = batch.results
+
+    claims, positions, keys = [], [], []
+    for position, record in enumerate(records):
+        if isinstance(record, dict):
+            results[position]['claim_id'] = record.get('claim_id')
+        try:
+            claim = record if isinstance(record, Claim) else Claim(**record)
+        except (ValidationError, TypeError) as e:
+            results[position]['error'] = f'Datos inválidos: {e}'
+            continue
+        results[position]['claim_id'] = claim.claim_id
+        rule = artifacts.rules.match(claim) if artifacts.rules is not None else None
+        if rule is not None:
+            results[position]['prediccion'] = rule.prediction
+            continue
+        key = cache_key(claim)
+        if cache is not None:
+            cached = cache.get(artifacts.version, key)
+            if cached is not None:
+                results[position]['prediccion'] = cached
+                continue
+        claims.append(claim.dict())
+        positions.append(position)
+        keys.append(key)
+
+    if not claims:
+        return batch
+
+    started = time.perf_counter()
+    try:
+        try:
+            predicciones = predict_frame(pd.DataFrame(claims), cfg, artifacts, monitor)
+        except SchemaError as e:
+            # el esquema indica las filas inválidas: las demás se predicen en una pasada
+            logger.error(f'Filas inválidas en el lote: {e}')
+            valid_claims, valid_positions = [], []
+            for row, (claim, position) in enumerate(zip(claims, positions)):
+                message = e.message_for(row)
+                if message is None:
+                    valid_claims.append(claim)
+                    valid_positions.append(position)
+                else:
+                    results[position]['error'] = f'Error en la predicción: {message}'
+            claims, positions = valid_claims, valid_positions
+            predicciones = (
+                predict_frame(pd.DataFrame(claims), cfg, artifacts, monitor)
+                if claims
+                else np.empty(0)
+            )
+    except Exception as e:
+        logger.error(f'Error en la predicción del lote, procesando fila a fila: {e}')
+        for claim, position in zip(claims, positions):
+            try:
+                results[position]['prediccion'] = float(
+                    predict_frame(pd.DataFrame([claim]), cfg, artifacts, monitor)[0]
+                )
+            except Exception as row_error:
+                results[position]['error'] = f'Error en la predicción: {row_error}'
+    else:
+        for prediccion, position in zip(predicciones.tolist(), positions):
+            results[position]['prediccion'] = prediccion
+    batch.model_seconds = time.perf_counter() - started
+    batch.model_positions = [
+        position for position in positions if results[position]['error'] is None
+    ]
+
+    if cache is not None:
+        for key, position in zip(keys, positions):
+            if results[position]['error'] is None:
+                cache.put(artifacts.version, key, results[position]['prediccion'])
+
+    return batch
@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from models import Claim
+from modules.logger_manager import get_logger
+from modules.metrics import METRICS
+
+from .scoring import predict_frame
+
+# buckets de diferencia absoluta entre predicciones, en semanas
+DELTA_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SHADOW_REQUESTS = METRICS.counter(
+    'hdi_shadow_requests_total',
+    'Solicitudes muestreadas para el scoring en sombra por resultado.',
+    ('result',),
+)
+SHADOW_LATENCY = METRICS.histogram(
+    'hdi_shadow_latency_seconds',
+    'Latencia de predicción de la versión activa y de la versión en sombra.',
+    ('model',),
+)
+SHADOW_DELTA = METRICS.histogram(
+    'hdi_shadow_prediction_delta',
+    'Diferencia absoluta por fila entre la versión en sombra y la versión activa.',
+    buckets=DELTA_BUCKETS,
+)
+
+
+class ShadowScorer:
+    """Predice una fracción muestreada del tráfico con la versión en sombra del registro.
+
+    La predicción en sombra se ejecuta en un hilo propio, después de responder, y nunca
+    afecta a la respuesta. Si hay más de `registry.shadow.max_pending` solicitudes pendientes,
+    las nuevas se descartan.
+
+    Args:
+        cfg (DictConfig): Configuración de Hydra (sección `registry.shadow`).
+        registry (ArtifactRegistry): Registro con la versión en sombra.
+    """
+
+    def __init__(self, cfg: 'DictConfig', registry):
+        self._cfg = cfg
+        self._registry = registry
+        self._sample_rate = float(cfg.registry.shadow.sample_rate)
+        self._max_pending = int(cfg.registry.shadow.max_pending)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='shadow-scoring'
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {}
+
+    def submit(self, records, predictions, primary_seconds):
+        """Muestrea una solicitud y, si corresponde, la encola para el scoring en sombra.
+
+        Args:
+            records (list): Siniestros de la solicitud (diccionarios con los campos de `Claim`).
+            predictions (Sequence): Predicciones de la versión activa para `records`.
+            primary_seconds (float): Latencia de la predicción de la versión activa.
+
+        Returns:
+            bool: True si la solicitud se encoló.
+        """
+        shadow = self._registry.shadow_snapshot()
+        if shadow is None or not records or random.random() >= self._sample_rate:
+            return False
+        with self._lock:
+            if self._pending >= self._max_pending:
+                SHADOW_REQUESTS.inc(result='dropped')
+                return False
+            self._pending += 1
+        self._executor.submit(
+            self._score, shadow, list(records), list(predictions), primary_seconds
+        )
+        return True
+
+    def _score(self, shadow, records, predictions, primary_seconds):
+        try:
+            df = pd.DataFrame(
+                [
+                    record.dict()
+                    if isinstance(record, Claim)
+                    else Claim(**record).dict()
+                    for record in records
+                ]
+            )
+            started = time.perf_counter()
+            shadow_predictions = predict_frame(df, self._cfg, shadow)
+            shadow_seconds = time.perf_counter() - started
+
+            primary = np.asarray(predictions, dtype=float)
+            deltas = np.abs(shadow_predictions - primary)
+            deltas = deltas[np.isfinite(deltas)]
+            for delta in deltas:
+                SHADOW_DELTA.observe(float(delta))
+            SHADOW_LATENCY.observe(primary_seconds, model='active')
+            SHADOW_LATENCY.observe(shadow_seconds, model='shadow')
+            SHADOW_REQUESTS.inc(result='scored')
+            self._record(shadow.version, deltas, primary_seconds, shadow_seconds)
+        except Exception as e:
+            SHADOW_REQUESTS.inc(result='error')
+            get_logger().error(f'Error en el scoring en sombra: {e}')
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, version, deltas, primary_seconds, shadow_seconds):
+        with self._lock:
+            if self._stats.get('version') != version:
+                self._stats = {
+                    'version': version,
+                    'requests': 0,
+                    'rows': 0,
+                    'delta_sum': 0.0,
+                    'delta_max': 0.0,
+                    'active_seconds': 0.0,
+                    'shadow_seconds': 0.0,
+                }
+            stats = self._stats
+            stats['requests'] += 1
+            stats['rows'] += len(deltas)
+            stats['delta_sum'] += float(deltas.sum())
+            stats['delta_max'] = max(stats['delta_max'], float(deltas.max(initial=0.0)))
+            stats['active_seconds'] += primary_seconds
+            stats['shadow_seconds'] += shadow_seconds
+
+    def stats(self):
+        """Resumen del scoring en sombra de la versión en sombra vigente.
+
+        Returns:
+            dict: Versión, solicitudes y filas comparadas, diferencia absoluta media y máxima,
+            latencia media de ambas versiones y solicitudes pendientes.
+        """
+        shadow = self._registry.shadow_snapshot()
+        with self._lock:
+            stats = dict(self._stats)
+            pending = self._pending
+        if shadow is None or stats.get('version') != shadow.version:
+            stats = {
+                'version': shadow.version if shadow else None,
+                'requests': 0,
+                'rows': 0,
+            }
+        requests, rows = stats['requests'], stats['rows']
+        return {
+            'version': stats['version'],
+            'sample_rate': self._sample_rate,
+            'requests': requests,
+            'rows': rows,
+            'mean_abs_delta': stats['delta_sum'] / rows if rows else None,
+            'max_abs_delta': stats['delta_max'] if rows else None,
+            'active_mean_seconds': stats['active_seconds'] / requests
+            if requests
+            else None,
+            'shadow_mean_seconds': stats['shadow_seconds'] / requests
+            if requests
+            else None,
+            'pending': pending,
+        }
+
+    def close(self):
+        """Descarta las predicciones en sombra pendientes."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
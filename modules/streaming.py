@@ -0,0 +1,248 @@
+import io
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from models import Claim
+from modules.logger_manager import get_logger
+
+from .scoring import predict_frame, score_claims
+
+# columnas de salida del scoring masivo
+OUTPUT_COLUMNS = ['claim_id', 'prediccion', 'error']
+# campos de entrada que se registran en la auditoría
+AUDIT_FIELDS = list(Claim.__annotations__)
+
+
+class LineChunker:
+    """Agrupa en bloques de líneas un flujo de bytes delimitado por saltos de línea que llega
+    por partes, por ejemplo el cuerpo de una solicitud.
+
+    Solo se mantiene en memoria el bloque en curso, por lo que el consumo de memoria no depende
+    del tamaño total del archivo.
+
+    Args:
+        chunk_rows (int): Filas por bloque.
+        first_chunk_rows (int, optional): Filas del primer bloque, para entregar antes el primer resultado.
+    """
+
+    def __init__(self, chunk_rows, first_chunk_rows=None):
+        self.header = None
+        self._chunk_rows = chunk_rows
+        self._limit = first_chunk_rows or chunk_rows
+        self._pending = b''
+        self._lines = []
+
+    def _add(self, line):
+        if self.header is None:
+            self.header = line
+        elif line.strip():
+            self._lines.append(line)
+
+    def feed(self, data):
+        """Añade bytes del flujo.
+
+        Returns:
+            list: Bloques completos como tuplas de cabecera (bytes) y líneas de datos (bytes).
+        """
+        chunks = []
+        if not data:
+            return chunks
+        self._pending += data
+        *complete, self._pending = self._pending.split(b'\n')
+        for line in complete:
+            self._add(line.rstrip(b'\r'))
+            if len(self._lines) >= self._limit:
+                chunks.append((self.header, self._lines))
+                self._lines = []
+                self._limit = self._chunk_rows
+        return chunks
+
+    def close(self):
+        """Termina el flujo.
+
+        Returns:
+            list: El último bloque, con la última línea aunque no termine en salto de línea.
+        """
+        line = self._pending.rstrip(b'\r')
+        self._pending = b''
+        if line.strip():
+            self._add(line)
+        chunks, self._lines = ([(self.header, self._lines)] if self._lines else []), []
+        return chunks
+
+
+def iter_line_chunks(blocks, chunk_rows, first_chunk_rows=None):
+    """Agrupa en bloques de líneas un iterable de bloques de bytes (ver `LineChunker`).
+
+    Args:
+        blocks (Iterable[bytes]): Bloques de bytes del archivo.
+        chunk_rows (int): Filas por bloque.
+        first_chunk_rows (int, optional): Filas del primer bloque.
+
+    Yields:
+        tuple: Cabecera (bytes) y lista de líneas de datos (bytes) del bloque.
+    """
+    chunker = LineChunker(chunk_rows, first_chunk_rows)
+    for data in blocks:
+        yield from chunker.feed(data)
+    yield from chunker.close()
+
+
+def score_chunk(header, lines, cfg, artifacts, sep='|', monitor=None, audit=None):
+    """Parsea y predice un bloque de líneas del archivo de siniestros.
+
+    Args:
+        header (bytes): Cabecera del archivo.
+        lines (list): Líneas de datos del bloque.
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Modelo, pipelines e imputaciones cargados.
+        sep (str): Separador de columnas.
+        monitor (DriftMonitor, optional): Recibe las entradas, las imputaciones y las
+            predicciones de las filas sin error.
+        audit (list, optional): Recibe las filas de auditoría de las filas sin error (ver
+            `audit_records`).
+
+    Returns:
+        DataFrame: Columnas `claim_id`, `prediccion` y `error` en el orden de entrada.
+    """
+    df = pd.read_csv(io.BytesIO(header + b'\n' + b'\n'.join(lines)), sep=sep)
+    chunk = score_frame(df, cfg, artifacts, monitor)
+    if audit is not None:
+        audit.extend(audit_records(df, chunk))
+    return chunk
+
+
+def score_frame(df, cfg, artifacts, monitor=None):
+    """Predice un DataFrame de siniestros en crudo reportando los errores fila a fila.
+
+    El bloque se predice en una sola pasada vectorizada; si falla, se procesa fila a fila para
+    reportar el error de cada fila.
+
+    Args:
+        df (DataFrame): Siniestros con las columnas de `Claim`.
+        cfg (DictConfig): Configuración de Hydra.
+        artifacts (ArtifactSnapshot): Modelo, pipelines e imputaciones cargados.
+        monitor (DriftMonitor, optional): Recibe las entradas, las imputaciones y las
+            predicciones de las filas sin error.
+
+    Returns:
+        DataFrame: Columnas `claim_id`, `prediccion` y `error` en el orden de entrada.
+    """
+    try:
+        predicciones = predict_frame(df.copy(), cfg, artifacts, monitor)
+        if monitor is not None:
+            monitor.observe(df, predicciones)
+        return pd.DataFrame(
+            {
+                'claim_id': df['claim_id'].to_numpy(),
+                'prediccion': predicciones,
+                'error': None,
+            }
+        )
+    except Exception as e:
+        get_logger().error(
+            f'Error en la predicción del bloque, procesando fila a fila: {e}'
+        )
+
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    for record in records:
+        if record.get('marca_vehiculo') is None and 'marca_vehiculo' in record:
+            record['marca_vehiculo'] = 'nan'
+    resultados = score_claims(records, cfg, artifacts, monitor=monitor)
+    if monitor is not None:
+        scored = [
+            (record, resultado['prediccion'])
+            for record, resultado in zip(records, resultados)
+            if resultado['error'] is None
+        ]
+        monitor.observe_claims(
+            [record for record, _ in scored], [prediccion for _, prediccion in scored]
+        )
+    return pd.DataFrame(resultados, columns=OUTPUT_COLUMNS)
+
+
+def audit_records(df, scored):
+    """Filas del CSV de auditoría de los siniestros predichos sin error.
+
+    Args:
+        df (DataFrame): Siniestros con las columnas de `Claim`.
+        scored (DataFrame): Resultado de `score_frame` para `df`.
+
+    Returns:
+        list: Diccionarios con los campos de `Claim` y `prediction`, sin `timestamp` ni
+            `execution_time`, que se añaden al registrarlas.
+    """
+    ok = scored['error'].isna().to_numpy()
+    if not ok.any():
+        return []
+    frame = df.loc[ok, AUDIT_FIELDS].assign(
+        prediction=scored['prediccion'].to_numpy()[ok]
+    )
+    return frame.astype(object).to_dict('records')
+
+
+def serialize_chunk(chunk, output_format, include_header, sep='|'):
+    """Serializa un bloque de resultados como NDJSON o CSV.
+
+    Args:
+        chunk (DataFrame): Resultado de `score_chunk`.
+        output_format (str): "ndjson" o "csv".
+        include_header (bool): Si se escribe la cabecera (solo CSV).
+        sep (str): Separador de columnas del CSV.
+
+    Returns:
+        bytes: Bloque serializado.
+    """
+    if output_format == 'csv':
+        return chunk.to_csv(sep=sep, index=False, header=include_header).encode('utf-8')
+
+    claim_ids = chunk['claim_id'].tolist()
+    predicciones = [
+        None if p is None or (isinstance(p, float) and np.isnan(p)) else p
+        for p in chunk['prediccion'].tolist()
+    ]
+    errores = chunk['error'].tolist()
+    return ''.join(
+        json.dumps({'claim_id': c, 'prediccion': p, 'error': e}) + '\n'
+        for c, p, e in zip(claim_ids, predicciones, errores)
+    ).encode('utf-8')
+
+
+class ResultSpool:
+    """Resultados serializados pendientes de enviar al cliente.
+
+    Permite seguir leyendo y prediciendo el cuerpo de la solicitud mientras el cliente no lee
+    la respuesta (por ejemplo, si solo la lee después de enviar todo el archivo). Se guardan en
+    memoria hasta `max_size` bytes y en un archivo temporal a partir de ahí; al leerse todo lo
+    pendiente el archivo se vacía.
+
+    Args:
+        max_size (int): Bytes en memoria antes de pasar a disco.
+    """
+
+    def __init__(self, max_size):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self._read = 0
+        self._written = 0
+
+    def write(self, data):
+        self._file.seek(self._written)
+        self._file.write(data)
+        self._written += len(data)
+
+    def read(self):
+        """Devuelve los bytes escritos desde la última lectura."""
+        self._file.seek(self._read)
+        data = self._file.read(self._written - self._read)
+        self._read += len(data)
+        if self._read == self._written:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read = self._written = 0
+        return data
+
+    def close(self):
+        self._file.close()
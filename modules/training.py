@@ -0,0 +1,364 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from multiprocessing import get_context
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger, setup_logger
+from utils import load_dict
+
+from .offline import byte_shards, iter_shard_lines
+from .preprocessing import full_pipeline, load_pipeline
+from .registry import ArtifactSnapshot
+from .rules import RuleEngine
+from .schema import CompiledSchema
+
+# estado de cada proceso del pool, cargado una sola vez por `_init_worker`
+_worker = {}
+
+
+@dataclass
+class SufficientStats:
+    """Estadísticos suficientes de una regresión lineal con intercepto.
+
+    Con la matriz de diseño aumentada `A = [1, X]`, `xtx = A^T A`, `xty = A^T y` e `yty = y^T y`
+    bastan para resolver los coeficientes y para calcular el error de cualquier coeficiente
+    sobre las mismas filas. Se suman entre bloques y entre procesos.
+
+    Attributes:
+        xtx (ndarray): Matriz `(p + 1, p + 1)`.
+        xty (ndarray): Vector `(p + 1,)`.
+        yty (float): Suma de cuadrados del objetivo.
+        n (int): Filas acumuladas.
+    """
+
+    xtx: np.ndarray
+    xty: np.ndarray
+    yty: float = 0.0
+    n: int = 0
+
+    @classmethod
+    def zeros(cls, n_features):
+        size = n_features + 1
+        return cls(np.zeros((size, size)), np.zeros(size))
+
+    def update(self, X, y):
+        """Acumula un bloque de filas.
+
+        Args:
+            X (ndarray): Variables `(filas, p)`.
+            y (ndarray): Objetivo `(filas,)`.
+        """
+        A = np.empty((len(X), X.shape[1] + 1))
+        A[:, 0] = 1.0
+        A[:, 1:] = X
+        self.xtx += A.T @ A
+        self.xty += A.T @ y
+        self.yty += float(y @ y)
+        self.n += len(y)
+
+    def __add__(self, other):
+        return SufficientStats(
+            self.xtx + other.xtx,
+            self.xty + other.xty,
+            self.yty + other.yty,
+            self.n + other.n,
+        )
+
+    def solve(self):
+        """Resuelve las ecuaciones normales.
+
+        Returns:
+            tuple: Coeficientes `(p,)` e intercepto.
+
+        Raises:
+            ValueError: Si no hay filas acumuladas.
+        """
+        if self.n == 0:
+            raise ValueError('No hay filas de entrenamiento')
+        # lstsq en lugar de solve: tolera variables constantes o colineales
+        beta = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        return beta[1:], float(beta[0])
+
+    def evaluate(self, coef, intercept):
+        """Calcula el error de unos coeficientes sobre las filas acumuladas.
+
+        Returns:
+            dict: `r2`, `rmse` y `n`. Vacío si no hay filas.
+        """
+        if self.n == 0:
+            return {}
+        beta = np.concatenate([[intercept], coef])
+        sse = self.yty - 2 * beta @ self.xty + beta @ self.xtx @ beta
+        mean = self.xty[0] / self.n
+        sst = self.yty - self.n * mean**2
+        return {
+            'r2': float(1 - sse / sst) if sst > 0 else float('nan'),
+            'rmse': float(np.sqrt(max(sse, 0.0) / self.n)),
+            'n': self.n,
+        }
+
+
+def holdout_mask(claim_ids, test_size, random_state):
+    """Asigna filas al conjunto de prueba con un hash estable del `claim_id`.
+
+    La asignación depende solo del identificador y de la semilla, no del orden de lectura ni de
+    la división en bloques o procesos.
+
+    Args:
+        claim_ids (Series): Identificadores de los siniestros.
+        test_size (float): Fracción de filas de prueba.
+        random_state (int): Semilla del hash.
+
+    Returns:
+        ndarray: Máscara booleana de filas de prueba.
+    """
+    hashes = pd.util.hash_pandas_object(
+        claim_ids.astype(str),
+        index=False,
+        hash_key=f'{random_state:016d}'[-16:],
+    ).to_numpy()
+    return (hashes % 10_000) < round(test_size * 10_000)
+
+
+def load_training_artifacts(cfg: 'DictConfig'):
+    """Carga los pasos del pipeline y las imputaciones, sin el modelo."""
+    imputation_dict = load_dict(cfg.pipeline.imputacion_path)
+    return ArtifactSnapshot(
+        model=None,
+        pipelines=tuple(
+            load_pipeline(step.pipeline, cfg.pipeline.mode)
+            for step in cfg.pipeline.steps
+        ),
+        imputation_dict=imputation_dict,
+        version='',
+        schema=CompiledSchema(imputation_dict),
+    )
+
+
+def accumulate_chunk(df, cfg, artifacts, train_stats, test_stats):
+    """Transforma un bloque con el pipeline completo y acumula sus estadísticos.
+
+    Las filas con variables u objetivo no finitos se descartan.
+
+    Returns:
+        int: Filas descartadas.
+    """
+    features = list(cfg.train.features)
+    holdout = holdout_mask(df['claim_id'], cfg.train.test_size, cfg.train.random_state)
+    df = full_pipeline(df, cfg, artifacts)
+
+    X = df[features].to_numpy(dtype=np.float64)
+    y = df[cfg.train.target_column].to_numpy(dtype=np.float64)
+    finite = np.isfinite(X).all(axis=1) & np.isfinite(y)
+
+    train_stats.update(X[finite & ~holdout], y[finite & ~holdout])
+    test_stats.update(X[finite & holdout], y[finite & holdout])
+    return int((~finite).sum())
+
+
+def _init_worker(cfg):
+    """Inicializa un proceso del pool: logger y pipelines se cargan una sola vez."""
+    setup_logger(cfg)
+    _worker['cfg'] = cfg
+    _worker['artifacts'] = load_training_artifacts(cfg)
+
+
+def accumulate_shard(path, start, end, header, chunk_rows, sep='|', on_chunk=None):
+    """Acumula los estadísticos de un rango de bytes en el proceso actual del pool.
+
+    Args:
+        on_chunk (Callable, optional): Recibe los bytes leídos después de cada bloque.
+
+    Returns:
+        tuple: Estadísticos de entrenamiento, de prueba y filas descartadas.
+    """
+    cfg, artifacts = _worker['cfg'], _worker['artifacts']
+    n_features = len(cfg.train.features)
+    train_stats = SufficientStats.zeros(n_features)
+    test_stats = SufficientStats.zeros(n_features)
+    dropped = 0
+
+    for lines in iter_shard_lines(path, start, end, chunk_rows):
+        df = pd.read_csv(io.BytesIO(header + b'\n' + b'\n'.join(lines)), sep=sep)
+        dropped += accumulate_chunk(df, cfg, artifacts, train_stats, test_stats)
+        if on_chunk is not None:
+            on_chunk(sum(len(line) + 1 for line in lines))
+    return train_stats, test_stats, dropped
+
+
+def build_model(features, coef, intercept):
+    """Construye un `LinearRegression` de sklearn con los coeficientes resueltos."""
+    from sklearn.linear_model import LinearRegression
+
+    model = LinearRegression()
+    model.coef_ = np.asarray(coef, dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+    model.n_features_in_ = len(features)
+    return model
+
+
+def train_streaming(
+    path, cfg: 'DictConfig', workers=None, chunk_rows=None, sep='|', progress=None
+):
+    """Entrena un modelo lineal leyendo el archivo en bloques.
+
+    Cada bloque pasa por `full_pipeline` y se reduce a `X^T X` y `X^T y`, por lo que la
+    memoria depende del número de variables y del tamaño de bloque, no del tamaño del archivo.
+    Con `workers > 1` el archivo se divide en rangos de bytes y los estadísticos de cada proceso
+    se suman. Las filas de prueba se eligen con `holdout_mask` y se evalúan con sus propios
+    estadísticos, en la misma pasada.
+
+    Args:
+        path (str): Archivo de entrenamiento delimitado por `sep` con cabecera.
+        cfg (DictConfig): Configuración de Hydra (sección `train`).
+        workers (int, optional): Procesos. Por defecto `train.workers`.
+        chunk_rows (int, optional): Filas por bloque. Por defecto `train.chunk_rows`.
+        sep (str): Separador de columnas.
+        progress (Callable, optional): Recibe los bytes procesados y el total después de cada
+            bloque (o de cada rango con varios procesos). Una excepción lanzada por
+            `progress` interrumpe el entrenamiento.
+
+    Returns:
+        tuple: Modelo `LinearRegression` entrenado y diccionario de métricas.
+    """
+    logger = get_logger()
+
+    workers = workers or int(cfg.train.workers) or 1
+    chunk_rows = chunk_rows or int(cfg.train.chunk_rows)
+    started = time.perf_counter()
+
+    header, ranges = byte_shards(path, workers * 4 if workers > 1 else 1)
+    total_bytes = sum(end - start for start, end in ranges)
+    done_bytes = 0
+
+    def advance(n_bytes):
+        nonlocal done_bytes
+        done_bytes += n_bytes
+        if progress is not None:
+            progress(min(done_bytes, total_bytes), total_bytes)
+
+    logger.info(
+        f'Entrenamiento por bloques de {path} en {len(ranges)} rangos '
+        f'con {workers} procesos'
+    )
+
+    if workers > 1:
+        # spawn: los procesos no heredan los hilos del logger del proceso principal
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(cfg,),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    accumulate_shard, path, start, end, header, chunk_rows, sep
+                ): end - start
+                for start, end in ranges
+            }
+            try:
+                for future in as_completed(futures):
+                    advance(futures[future])
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            outputs = [future.result() for future in futures]
+    else:
+        _worker['cfg'] = cfg
+        _worker['artifacts'] = load_training_artifacts(cfg)
+        outputs = [
+            accumulate_shard(path, start, end, header, chunk_rows, sep, advance)
+            for start, end in ranges
+        ]
+
+    n_features = len(cfg.train.features)
+    train_stats = sum(
+        (train for train, _, _ in outputs), SufficientStats.zeros(n_features)
+    )
+    test_stats = sum(
+        (test for _, test, _ in outputs), SufficientStats.zeros(n_features)
+    )
+    dropped = sum(dropped for _, _, dropped in outputs)
+
+    coef, intercept = train_stats.solve()
+    model = build_model(list(cfg.train.features), coef, intercept)
+
+    metrics = {
+        'train_rows': train_stats.n,
+        'test_rows': test_stats.n,
+        'dropped_rows': dropped,
+        'seconds': time.perf_counter() - started,
+    }
+    metrics.update(
+        {
+            f'test_{name}': value
+            for name, value in test_stats.evaluate(coef, intercept).items()
+            if name != 'n'
+        }
+    )
+    logger.info(
+        f'Modelo entrenado con {train_stats.n} filas en {round(metrics["seconds"], 4)}s; '
+        f'prueba: {metrics}'
+    )
+    return model, metrics
+
+
+def train_model_streaming(path, cfg: 'DictConfig', workers=None, progress=None):
+    """Entrena por bloques, registra el modelo en MLflow y lo guarda.
+
+    Args:
+        path (str): Archivo de entrenamiento delimitado por `|` con cabecera.
+        cfg (DictConfig): Configuración de Hydra.
+        workers (int, optional): Procesos de la reducción.
+        progress (Callable, optional): Ver `train_streaming`.
+
+    Con `drift.enabled` también guarda, junto al modelo (`<modelo>.drift.json`), la línea base
+    de deriva calculada prediciendo el archivo de entrenamiento con el modelo nuevo.
+
+    Returns:
+        dict: Métricas del entrenamiento, ruta del modelo guardado y de su línea base.
+    """
+    from .mlflow import save_model
+
+    logger = get_logger()
+    model, metrics = train_streaming(path, cfg, workers=workers, progress=progress)
+
+    if cfg.train.log_mlflow:
+        import mlflow
+        import mlflow.sklearn
+
+        logger.info('Registrando el modelo en MLflow...')
+        with mlflow.start_run():
+            mlflow.log_param('test_size', cfg.train.test_size)
+            mlflow.log_param('random_state', cfg.train.random_state)
+            mlflow.log_param('train_rows', metrics['train_rows'])
+            for name in ('test_r2', 'test_rmse'):
+                if name in metrics:
+                    mlflow.log_metric(name, metrics[name])
+            mlflow.sklearn.log_model(model, 'modelo_reentrenado')
+
+    save_model(model, cfg.models.retrained_model_path)
+    metrics['model_path'] = os.path.abspath(cfg.models.retrained_model_path)
+
+    if cfg.drift.enabled:
+        # línea base de deriva del modelo nuevo, junto al modelo
+        from .drift import build_baseline
+
+        artifacts = replace(
+            load_training_artifacts(cfg), model=model, rules=RuleEngine.from_config(cfg)
+        )
+        baseline_path = os.path.splitext(metrics['model_path'])[0] + '.drift.json'
+        build_baseline(path, cfg, artifacts).save(baseline_path)
+        metrics['drift_baseline_path'] = baseline_path
+    return metrics
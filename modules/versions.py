@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+from modules.logger_manager import get_logger
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# identificadores de versión: v<fecha>-<huella>, sin separadores de ruta
+VERSION_PATTERN = re.compile(r'^v\d{8}T\d{6}-[0-9a-f]{8}$')
+
+# los modelos publicables están bajo este directorio y con una de estas extensiones
+MODELS_DIR = os.path.join(root_dir, 'models')
+MODEL_SUFFIXES = ('.pkl', '.json')
+
+
+def resolve_model_path(model_path):
+    """Ruta absoluta de un modelo publicable.
+
+    La ruta se resuelve (incluidos `..` y enlaces simbólicos) antes de comprobarla, porque el
+    modelo de una versión activada se deserializa con joblib.
+
+    Args:
+        model_path (str): Modelo relativo a la raíz del proyecto o absoluto.
+
+    Raises:
+        ValueError: Si la ruta queda fuera de `models/` o no termina en `.pkl` o `.json`.
+
+    Returns:
+        str: Ruta absoluta y resuelta del modelo.
+    """
+    path = os.path.realpath(os.path.join(root_dir, model_path))
+    models_dir = os.path.realpath(MODELS_DIR)
+    if os.path.commonpath([path, models_dir]) != models_dir:
+        raise ValueError(f'El modelo debe estar dentro de models/: {model_path}')
+    if os.path.splitext(path)[1] not in MODEL_SUFFIXES:
+        raise ValueError(
+            f'El modelo debe ser un archivo {" o ".join(MODEL_SUFFIXES)}: {model_path}'
+        )
+    return path
+
+
+def _write_pointer(path, value):
+    # escritura atómica: los demás procesos leen el puntero anterior o el nuevo, nunca uno parcial
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.pointer.')
+    with os.fdopen(fd, 'w') as file:
+        file.write(value)
+    os.replace(tmp_path, path)
+
+
+def _read_pointer(path):
+    try:
+        with open(path, 'r') as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ModelStore:
+    """Almacén de versiones en el sistema de archivos local.
+
+    Cada versión es un directorio inmutable con el modelo, los pasos del pipeline, el
+    diccionario de imputaciones y un `manifest.json`. Los punteros `ACTIVE` y `SHADOW` indican
+    la versión en servicio y la candidata evaluada en sombra; se reemplazan de forma atómica y
+    el `ArtifactRegistry` de cada proceso los lee en su comprobación periódica.
+
+    Con `backend: "mlflow"`, cada versión publicada también se registra como artefactos de un
+    run de MLflow, y las versiones que no estén en disco se descargan desde MLflow.
+
+    Args:
+        path (str): Directorio del almacén, relativo a la raíz del proyecto.
+        backend (str): "local" o "mlflow".
+    """
+
+    def __init__(self, path, backend='local'):
+        if backend not in ('local', 'mlflow'):
+            raise ValueError(f'Backend de versiones {backend} desconocido')
+        self.path = os.path.join(root_dir, path)
+        self.backend = backend
+        self.versions_dir = os.path.join(self.path, 'versions')
+
+    @classmethod
+    def from_config(cls, cfg: 'DictConfig'):
+        """Construye el almacén desde `registry.store`, o devuelve None si no está configurado."""
+        store = cfg.registry.get('store')
+        if not store or not store.get('path'):
+            return None
+        return cls(store.path, store.get('backend', 'local'))
+
+    def _version_dir(self, version):
+        if not VERSION_PATTERN.match(str(version)):
+            raise KeyError(version)
+        return os.path.join(self.versions_dir, version)
+
+    def publish(self, model_path, steps, imputation_path, metadata=None):
+        """Copia un conjunto de artefactos como una nueva versión inmutable.
+
+        Args:
+            model_path (str): Modelo (`.pkl` o `.json`) dentro de `models/`, relativo a la raíz
+                o absoluto.
+            steps (Sequence): Pares `(nombre, ruta)` de los pasos del pipeline, en orden.
+            imputation_path (str): Diccionario de imputaciones.
+            metadata (dict, optional): Datos adicionales para el manifiesto.
+
+        Raises:
+            ValueError: Si el modelo está fuera de `models/` o no es `.pkl` ni `.json`.
+
+        Returns:
+            dict: Manifiesto de la versión publicada.
+        """
+        logger = get_logger()
+        sources = {
+            'model': resolve_model_path(model_path),
+            'imputation': os.path.join(root_dir, imputation_path),
+            **{
+                f'pipeline_{i}': os.path.join(root_dir, path)
+                for i, (_, path) in enumerate(steps)
+            },
+        }
+        digest = hashlib.sha1()
+        for key in sorted(sources):
+            with open(sources[key], 'rb') as file:
+                digest.update(key.encode('utf-8') + file.read())
+        version = (
+            f'v{time.strftime("%Y%m%dT%H%M%S", time.gmtime())}-{digest.hexdigest()[:8]}'
+        )
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        if os.path.isdir(self._version_dir(version)):
+            # mismos archivos publicados en el mismo segundo
+            return self.manifest(version)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix='.staging-')
+        try:
+            files = {
+                'model': 'model' + os.path.splitext(sources['model'])[1],
+                'imputation': 'imputations.json',
+                **{f'pipeline_{i}': f'pipeline_{i}.pkl' for i in range(len(steps))},
+            }
+            for key, name in files.items():
+                shutil.copyfile(sources[key], os.path.join(staging, name))
+            manifest = {
+                'version': version,
+                'created_at': time.time(),
+                'model': files['model'],
+                'imputation': files['imputation'],
+                'steps': [
+                    {'name': name, 'pipeline': files[f'pipeline_{i}']}
+                    for i, (name, _) in enumerate(steps)
+                ],
+                'sources': sources,
+                'metadata': dict(metadata or {}),
+            }
+            with open(os.path.join(staging, 'manifest.json'), 'w') as file:
+                json.dump(manifest, file, indent=4)
+            # el directorio aparece completo o no aparece
+            os.rename(staging, self._version_dir(version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if self.backend == 'mlflow':
+            self._log_mlflow(version)
+        logger.info(f'Versión {version} publicada en {self.versions_dir}')
+        return manifest
+
+    def publish_from_config(self, cfg: 'DictConfig', model_path=None, metadata=None):
+        """Publica el modelo (por defecto `models.model_path`) con los pasos e imputaciones
+        de la configuración."""
+        return self.publish(
+            model_path or cfg.models.model_path,
+            [(step.name, step.pipeline) for step in cfg.pipeline.steps],
+            cfg.pipeline.imputacion_path,
+            metadata,
+        )
+
+    def _log_mlflow(self, version):
+        import mlflow
+
+        with mlflow.start_run(run_name=f'hdi-{version}'):
+            mlflow.set_tag('hdi_version', version)
+            mlflow.log_artifacts(self._version_dir(version), artifact_path='bundle')
+
+    def _fetch_mlflow(self, version):
+        import mlflow
+
+        runs = mlflow.search_runs(
+            filter_string=f"tags.hdi_version = '{version}'",
+            search_all_experiments=True,
+            output_format='list',
+        )
+        if not runs:
+            raise KeyError(version)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix='.staging-')
+        try:
+            mlflow.artifacts.download_artifacts(
+                run_id=runs[0].info.run_id, artifact_path='bundle', dst_path=staging
+            )
+            os.rename(os.path.join(staging, 'bundle'), self._version_dir(version))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def manifest(self, version):
+        """Devuelve el manifiesto de una versión.
+
+        Raises:
+            KeyError: Si la versión no existe.
+        """
+        version_dir = self._version_dir(version)
+        if not os.path.isdir(version_dir) and self.backend == 'mlflow':
+            os.makedirs(self.versions_dir, exist_ok=True)
+            self._fetch_mlflow(version)
+        try:
+            with open(os.path.join(version_dir, 'manifest.json'), 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise KeyError(version)
+
+    def paths(self, version):
+        """Rutas absolutas de los artefactos de una versión, con las claves de
+        `ArtifactRegistry`, y los pares `(nombre, ruta)` de sus pasos."""
+        manifest = self.manifest(version)
+        version_dir = self._version_dir(version)
+        paths = {
+            'model': os.path.join(version_dir, manifest['model']),
+            'imputation': os.path.join(version_dir, manifest['imputation']),
+        }
+        steps = []
+        for i, step in enumerate(manifest['steps']):
+            paths[f'pipeline_{i}'] = os.path.join(version_dir, step['pipeline'])
+            steps.append((step['name'], paths[f'pipeline_{i}']))
+        return paths, tuple(steps)
+
+    def versions(self):
+        """Manifiestos de las versiones en disco, de la más reciente a la más antigua."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        manifests = [
+            self.manifest(name)
+            for name in os.listdir(self.versions_dir)
+            if VERSION_PATTERN.match(name)
+        ]
+        return sorted(manifests, key=lambda m: m['created_at'], reverse=True)
+
+    def active(self):
+        """Versión en servicio, o None si se usan las rutas de la configuración."""
+        return _read_pointer(os.path.join(self.path, 'ACTIVE'))
+
+    def shadow(self):
+        """Versión candidata evaluada en sombra, o None."""
+        return _read_pointer(os.path.join(self.path, 'SHADOW'))
+
+    def set_active(self, version):
+        self.manifest(version)
+        os.makedirs(self.path, exist_ok=True)
+        _write_pointer(os.path.join(self.path, 'ACTIVE'), version)
+
+    def set_shadow(self, version):
+        """Fija la versión en sombra; con None se desactiva el modo sombra."""
+        os.makedirs(self.path, exist_ok=True)
+        if version is None:
+            _write_pointer(os.path.join(self.path, 'SHADOW'), '')
+            return
+        self.manifest(version)
+        _write_pointer(os.path.join(self.path, 'SHADOW'), version)
@@ -1,2 +1,5 @@
 from .predict import router as predict
 from .train import router as train
+from .registry import router as registry
+from .predictions import router as predictions
+from .monitoring import router as monitoring
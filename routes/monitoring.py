@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+router = APIRouter()
+
+
+def _monitor(request):
+    monitor = request.app.state.drift
+    if monitor is None:
+        raise HTTPException(
+            status_code=409, detail='El monitoreo de deriva está deshabilitado'
+        )
+    return monitor
+
+
+@router.get('/api/v1/monitoring/drift')
+async def drift_report(request: Request):
+    # statistics of this process compared with the training baseline
+    return await run_in_threadpool(_monitor(request).report)
+
+
+@router.post('/api/v1/monitoring/drift/reset')
+async def reset_drift(request: Request):
+    _monitor(request).reset()
+    return {'status': 'reiniciado'}
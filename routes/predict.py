@@ -1,76 +1,472 @@
+import asyncio
 import numpy as np
 import pandas as pd
 import time
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Request
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 
 from models import Claim
-from modules import full_pipeline, load_model, log_to_csv
+from modules import (
+    cache_key,
+    full_pipeline,
+    log_rows_to_csv,
+    log_to_csv,
+    score_batch,
+    track,
+)
+from modules.columnar import MEDIA_TYPES, ColumnarError, body_format, score_columnar
+from modules.metrics import observe_since
+from modules.streaming import (
+    LineChunker,
+    ResultSpool,
+    score_chunk,
+    serialize_chunk,
+)
 
 router = APIRouter()
 
-@router.post("/api/v1/predict/", include_in_schema=True)
+
+@router.post('/api/v1/predict/', include_in_schema=True)
 async def predict_claim(claim: Claim, request: Request):
     cfg = request.app.state.cfg
     logger = request.app.state.logger
     start_time = time.time()
+    observe_since('request_parsing', getattr(request.state, 'request_start', None))
+
+    logger.info('Solicitud recibida en /api/v1/predict/')
+
+    # get preloaded artifacts from the registry
+    try:
+        logger.info('Obteniendo los artefactos del registro...')
+        with track('model_retrieval'):
+            artifacts = request.app.state.registry.snapshot()
+    except Exception as e:
+        logger.error(f'Error al cargar el modelo: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al cargar el modelo: {str(e)}'
+        )
+
+    # business rules short-circuit the cache, the pipeline and the model
+    rule = artifacts.rules.match(claim) if artifacts.rules is not None else None
+
+    # in idempotent mode a claim already scored by the same artifact version returns its
+    # stored prediction
+    store = request.app.state.predictions
+    stored = None
+    if rule is None and store is not None and cfg.predictions.idempotent:
+        stored = await run_in_threadpool(store.lookup, claim, artifacts.version)
+
+    # repeated feature tuples are served from the prediction cache
+    cache = request.app.state.cache if rule is None and stored is None else None
+    key = cache_key(claim)
+    cached = cache.get(artifacts.version, key) if cache is not None else None
 
-    logger.info("Solicitud recibida en /api/v1/predict/")
+    batcher = request.app.state.batcher
+    admission = request.app.state.admission
+    model_started = time.perf_counter()
+    if rule is not None:
+        logger.info(
+            f'Regla {rule.name} aplicada, devolviendo predicción {rule.prediction}'
+        )
+        prediccion = [rule.prediction]
+    elif stored is not None:
+        logger.info('Predicción obtenida del almacén de predicciones')
+        prediccion = [stored]
+    elif cached is not None:
+        logger.info('Predicción obtenida de la caché')
+        prediccion = [cached]
+    else:
+        # only pipeline and model work goes through admission control
+        deadline = admission.deadline(request)
+        async with admission.admit(deadline):
+            prediccion = await _score_claim(
+                claim, cfg, artifacts, batcher, admission, deadline, logger,
+                request.app.state.drift,
+            )
+
+    model_seconds = time.perf_counter() - model_started
+
+    if cache is not None and cached is None:
+        # a memory-only put is a dict insert; only the disk tier needs a thread
+        if cache.has_disk_tier:
+            await run_in_threadpool(
+                cache.put, artifacts.version, key, float(prediccion[0])
+            )
+        else:
+            cache.put(artifacts.version, key, float(prediccion[0]))
+
+    # input and prediction distributions for drift monitoring
+    if request.app.state.drift is not None:
+        request.app.state.drift.observe_claims([claim], prediccion)
+
+    # sampled requests are re-scored with the shadow version off the request path
+    shadow = request.app.state.shadow
+    if shadow is not None and rule is None and stored is None and cached is None:
+        shadow.submit([claim], prediccion, model_seconds)
+
+    end_time = time.time()
+    execution_time = round(end_time - start_time, 4)
+
+    # log to csv
+    log_data = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'claim_id': claim.claim_id,
+        'marca_vehiculo': claim.marca_vehiculo,
+        'antiguedad_vehiculo': claim.antiguedad_vehiculo,
+        'tipo_poliza': claim.tipo_poliza,
+        'taller': claim.taller,
+        'partes_a_reparar': claim.partes_a_reparar,
+        'partes_a_reemplazar': claim.partes_a_reemplazar,
+        'prediction': prediccion[0],
+        'execution_time': execution_time,
+    }
+    with track('audit_logging'):
+        log_to_csv(log_data, cfg)
+        if store is not None and stored is None:
+            store.record([log_data], artifacts.version)
+
+    logger.info(
+        f'Predicción realizada para claim_id {claim.claim_id} en {execution_time}s'
+    )
+
+    return {'prediccion': prediccion[0]}
+
+
+async def _score_claim(
+    claim, cfg, artifacts, batcher, admission, deadline, logger, monitor
+):
+    """Runs the pipeline and the model for one claim, checking the deadline before each stage."""
+    if batcher is not None:
+        # micro-batched pipeline and predict, waiting at most until the deadline
+        deadline.check('predict')
+        try:
+            logger.info('Encolando la predicción en el micro-batcher...')
+            prediccion = [
+                await asyncio.wait_for(batcher.submit(claim), deadline.timeout())
+            ]
+            logger.info(f'Predicción: {prediccion[0]}')
+            return prediccion
+        except asyncio.TimeoutError:
+            deadline.check('predict')
+            raise
+        except Exception as e:
+            logger.error(f'Error en la predicción: {str(e)}')
+            raise HTTPException(
+                status_code=500, detail=f'Error en la predicción: {str(e)}'
+            )
 
     # convert claim to dataframe
     data = pd.DataFrame([claim.dict()])
 
-    # load model asynchronously
+    # full pipeline on the prediction executor
+    deadline.check('pipeline')
     try:
-        logger.info("Cargando el modelo...")
-        modelo = await run_in_threadpool(load_model, cfg)
+        logger.info('Ejecutando el pipeline de transformación...')
+        df_procesado = await admission.run(
+            full_pipeline, data, cfg, artifacts, monitor
+        )
     except Exception as e:
-        logger.error(f"Error al cargar el modelo: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error al cargar el modelo: {str(e)}")
+        logger.error(f'Error en el pipeline de transformación: {str(e)}')
+        raise HTTPException(
+            status_code=500,
+            detail=f'Error en el pipeline de transformación: {str(e)}',
+        )
 
-    # full pipeline asynchronously
+    # predict on the prediction executor
+    deadline.check('predict')
     try:
-        logger.info("Ejecutando el pipeline de transformación...")
-        df_procesado = await run_in_threadpool(full_pipeline, data, cfg)
+        logger.info('Realizando la predicción...')
+        model_features = artifacts.model.feature_names_in_
+        df_for_prediction = df_procesado[model_features]
+        with track('predict'):
+            prediccion = await admission.run(
+                artifacts.model.predict, df_for_prediction
+            )
+        logger.info(f'Predicción: {prediccion[0]}')
     except Exception as e:
-        logger.error(f"Error en el pipeline de transformación: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error en el pipeline de transformación: {str(e)}")
+        logger.error(f'Error en la predicción: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error en la predicción: {str(e)}'
+        )
+    return prediccion
+
+
+def record_predictions(request, log_rows, version):
+    """Queue scored rows for the audit CSV and the prediction store."""
+    if not log_rows:
+        return
+    with track('audit_logging'):
+        log_rows_to_csv(log_rows, request.app.state.cfg)
+        if request.app.state.predictions is not None:
+            request.app.state.predictions.record(log_rows, version)
+
 
-    # predict asynchronously
+def audit_rows(records, start_time):
+    """Add the timestamp and the elapsed request time to rows from `audit_records`."""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    execution_time = round(time.time() - start_time, 4)
+    return [
+        {'timestamp': timestamp, **record, 'execution_time': execution_time}
+        for record in records
+    ]
+
+
+@router.post('/api/v1/predict/batch', include_in_schema=True)
+async def predict_batch(request: Request, claims: List[Dict[str, Any]] = Body(...)):
+    cfg = request.app.state.cfg
+    logger = request.app.state.logger
+    start_time = time.time()
+    observe_since('request_parsing', getattr(request.state, 'request_start', None))
+
+    logger.info(
+        f'Solicitud recibida en /api/v1/predict/batch con {len(claims)} siniestros'
+    )
+
+    # get preloaded artifacts from the registry
     try:
-        logger.info("Realizando la predicción...")
-        if claim.tipo_poliza == 4:
-            logger.info("Tipo de póliza es 4, devolviendo predicción -1")
-            prediccion = [-1]
-        else:
-            logger.info("Tipo de póliza no es 4, realizando predicción...")
-            model_features = modelo.feature_names_in_
-            df_for_prediction = df_procesado[model_features]
-            prediccion = await run_in_threadpool(modelo.predict, df_for_prediction)
-            logger.info(f"Predicción: {prediccion[0]}")
+        with track('model_retrieval'):
+            artifacts = request.app.state.registry.snapshot()
     except Exception as e:
-        logger.error(f"Error en la predicción: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error en la predicción: {str(e)}")
+        logger.error(f'Error al cargar el modelo: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al cargar el modelo: {str(e)}'
+        )
+
+    # single vectorized pipeline and predict pass with per-row errors
+    admission = request.app.state.admission
+    deadline = admission.deadline(request)
+    async with admission.admit(deadline):
+        deadline.check('pipeline')
+        batch = await admission.run(
+            score_batch,
+            claims,
+            cfg,
+            artifacts,
+            request.app.state.cache,
+            request.app.state.drift,
+        )
+    resultados = batch.results
+
+    scored = [
+        (claim, resultado['prediccion'])
+        for claim, resultado in zip(claims, resultados)
+        if resultado['error'] is None
+    ]
+    if request.app.state.drift is not None:
+        request.app.state.drift.observe_claims(
+            [claim for claim, _ in scored], [prediccion for _, prediccion in scored]
+        )
+
+    # only rows scored by the model are compared, timed without admission or queueing
+    shadow = request.app.state.shadow
+    if shadow is not None and batch.model_positions:
+        shadow.submit(
+            [claims[position] for position in batch.model_positions],
+            [resultados[position]['prediccion'] for position in batch.model_positions],
+            batch.model_seconds,
+        )
 
     end_time = time.time()
     execution_time = round(end_time - start_time, 4)
 
     # log to csv
-    log_data = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "claim_id": claim.claim_id,
-            "marca_vehiculo": claim.marca_vehiculo,
-            "antiguedad_vehiculo": claim.antiguedad_vehiculo,
-            "tipo_poliza": claim.tipo_poliza,
-            "taller": claim.taller,
-            "partes_a_reparar": claim.partes_a_reparar,
-            "partes_a_reemplazar": claim.partes_a_reemplazar,
-            "prediction": prediccion[0],
-            "execution_time": execution_time
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    log_rows = [
+        {
+            'timestamp': timestamp,
+            **{
+                field: claim.get(field)
+                for field in (
+                    'claim_id',
+                    'marca_vehiculo',
+                    'antiguedad_vehiculo',
+                    'tipo_poliza',
+                    'taller',
+                    'partes_a_reparar',
+                    'partes_a_reemplazar',
+                )
+            },
+            'prediction': resultado['prediccion'],
+            'execution_time': execution_time,
         }
-    log_to_csv(log_data, cfg)
+        for claim, resultado in zip(claims, resultados)
+        if resultado['error'] is None
+    ]
+    record_predictions(request, log_rows, artifacts.version)
+
+    errores = sum(resultado['error'] is not None for resultado in resultados)
+    logger.info(
+        f'Lote de {len(claims)} siniestros procesado en {execution_time}s con {errores} errores'
+    )
+
+    return {'predicciones': resultados}
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response whose body generator may still be reading the request body.
+
+    On ASGI servers older than spec 2.4 (uvicorn reports 2.3), StreamingResponse listens for
+    the disconnect on `receive` while streaming, which would consume the request body
+    messages. Here only the body reader calls `receive`, through `request.stream()`, which
+    raises ClientDisconnect if the client goes away during the upload.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+@router.post('/api/v1/predict/stream', include_in_schema=True)
+async def predict_stream(
+    request: Request, format: str = Query('ndjson', pattern='^(ndjson|csv)$')
+):
+    cfg = request.app.state.cfg
+    logger = request.app.state.logger
+
+    logger.info(f'Solicitud recibida en /api/v1/predict/stream con formato {format}')
+
+    # get preloaded artifacts from the registry
+    try:
+        with track('model_retrieval'):
+            artifacts = request.app.state.registry.snapshot()
+    except Exception as e:
+        logger.error(f'Error al cargar el modelo: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al cargar el modelo: {str(e)}'
+        )
+
+    # score the upload chunk by chunk while it arrives; only the current chunk is buffered
+    start_time = time.time()
+    chunker = LineChunker(cfg.streaming.chunk_rows, cfg.streaming.first_chunk_rows)
+    spool = ResultSpool(cfg.streaming.spool_max_bytes)
+    ready = asyncio.Event()
+    rows = 0
+
+    async def score(header, lines):
+        nonlocal rows
+        # parse and score each chunk off the event loop
+        audit = []
+        chunk = await run_in_threadpool(
+            score_chunk,
+            header,
+            lines,
+            cfg,
+            artifacts,
+            monitor=request.app.state.drift,
+            audit=audit,
+        )
+        spool.write(serialize_chunk(chunk, format, include_header=rows == 0))
+        rows += len(chunk)
+        ready.set()
+        record_predictions(request, audit_rows(audit, start_time), artifacts.version)
+
+    async def produce():
+        # the body keeps being read while the client is not reading the response, so clients
+        # that only read after sending the whole file do not stall the upload
+        try:
+            async for data in request.stream():
+                for header, lines in chunker.feed(data):
+                    await score(header, lines)
+            for header, lines in chunker.close():
+                await score(header, lines)
+        except ClientDisconnect:
+            logger.warning(f'Cliente desconectado tras {rows} siniestros del archivo')
+        finally:
+            ready.set()
+
+    async def results():
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                finished = producer.done()
+                data = spool.read()
+                if data:
+                    yield data
+                elif finished:
+                    producer.result()
+                    break
+                else:
+                    await ready.wait()
+                    ready.clear()
+        finally:
+            producer.cancel()
+            spool.close()
+        logger.info(
+            f'Archivo de {rows} siniestros procesado en {round(time.time() - start_time, 4)}s'
+        )
+
+    media_type = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    return DuplexStreamingResponse(results(), media_type=media_type)
+
+
+@router.post('/api/v1/predict/columnar', include_in_schema=True)
+async def predict_columnar(
+    request: Request,
+    format: Optional[str] = Query(None, pattern='^(arrow|parquet)$'),
+):
+    cfg = request.app.state.cfg
+    logger = request.app.state.logger
+    start_time = time.time()
+
+    # Arrow IPC or Parquet body, answered in the same format unless `format` is given
+    input_format = body_format(request.headers.get('content-type'))
+    if input_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f'Content-Type debe ser uno de: {", ".join(MEDIA_TYPES.values())}',
+        )
+    output_format = format or input_format
+    body = await request.body()
+    observe_since('request_parsing', getattr(request.state, 'request_start', None))
+
+    logger.info(
+        f'Solicitud recibida en /api/v1/predict/columnar en formato {input_format}'
+    )
+
+    # get preloaded artifacts from the registry
+    try:
+        with track('model_retrieval'):
+            artifacts = request.app.state.registry.snapshot()
+    except Exception as e:
+        logger.error(f'Error al cargar el modelo: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al cargar el modelo: {str(e)}'
+        )
+
+    # decode, score and encode in the predict executor, without per-row objects
+    admission = request.app.state.admission
+    deadline = admission.deadline(request)
+    async with admission.admit(deadline):
+        deadline.check('pipeline')
+        audit = []
+        try:
+            content, rows, errores = await admission.run(
+                score_columnar,
+                body,
+                input_format,
+                output_format,
+                cfg,
+                artifacts,
+                request.app.state.drift,
+                audit,
+            )
+        except ColumnarError as e:
+            logger.error(f'Cuerpo columnar inválido: {str(e)}')
+            raise HTTPException(status_code=422, detail=str(e))
 
-    logger.info(f"Predicción realizada para claim_id {claim.claim_id} en {execution_time}s")
+    record_predictions(request, audit_rows(audit, start_time), artifacts.version)
 
-    return {"prediccion": prediccion[0]}
+    logger.info(
+        f'Lote columnar de {rows} siniestros procesado en '
+        f'{round(time.time() - start_time, 4)}s con {errores} errores'
+    )
+    return Response(content, media_type=MEDIA_TYPES[output_format])
@@ -0,0 +1,46 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+router = APIRouter()
+
+
+def _store(request):
+    store = request.app.state.predictions
+    if store is None:
+        raise HTTPException(
+            status_code=409, detail='El almacén de predicciones está deshabilitado'
+        )
+    return store
+
+
+@router.get('/api/v1/predictions/daily')
+async def daily_predictions(
+    request: Request, start: date, end: Optional[date] = None
+):
+    store = _store(request)
+    # the end day is included
+    end = end or start
+    days = await run_in_threadpool(
+        store.daily,
+        datetime.combine(start, time.min),
+        datetime.combine(end + timedelta(days=1), time.min),
+    )
+    return {'dias': days}
+
+
+@router.get('/api/v1/predictions/{claim_id}')
+async def claim_predictions(
+    claim_id: int, request: Request, limit: int = Query(100, ge=1, le=1000)
+):
+    store = _store(request)
+    # indexed lookup on claim_id, newest first
+    predicciones = await run_in_threadpool(store.history, claim_id, limit)
+    if not predicciones:
+        raise HTTPException(
+            status_code=404,
+            detail=f'No hay predicciones para el siniestro {claim_id}',
+        )
+    return {'claim_id': claim_id, 'predicciones': predicciones}
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from models import PublishVersionRequest, ShadowRequest
+
+router = APIRouter()
+
+
+def _store(request):
+    store = request.app.state.registry.store
+    if store is None:
+        raise HTTPException(
+            status_code=409, detail='No hay un almacén de versiones configurado'
+        )
+    return store
+
+
+@router.get('/api/v1/registry/versions')
+async def list_versions(request: Request):
+    registry = request.app.state.registry
+    store = _store(request)
+    versions = await run_in_threadpool(store.versions)
+    shadow = registry.shadow_snapshot()
+    return {
+        'active': registry.snapshot().version,
+        'shadow': shadow.version if shadow is not None else None,
+        'versions': versions,
+    }
+
+
+@router.post('/api/v1/registry/versions', status_code=201)
+async def publish_version(body: PublishVersionRequest, request: Request):
+    cfg = request.app.state.cfg
+    logger = request.app.state.logger
+    store = _store(request)
+
+    # the new model is bundled with the configured pipeline steps and imputations
+    try:
+        manifest = await run_in_threadpool(
+            store.publish_from_config, cfg, body.model_path, body.metadata
+        )
+    except Exception as e:
+        logger.error(f'Error al publicar la versión: {str(e)}')
+        raise HTTPException(
+            status_code=400, detail=f'Error al publicar la versión: {str(e)}'
+        )
+    return manifest
+
+
+@router.post('/api/v1/registry/versions/{version}/activate')
+async def activate_version(version: str, request: Request):
+    logger = request.app.state.logger
+    _store(request)
+
+    # the version is loaded and warmed up in a worker thread; the swap is a pointer change
+    try:
+        snapshot = await run_in_threadpool(request.app.state.registry.activate, version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f'Versión {version} no encontrada')
+    except Exception as e:
+        logger.error(f'Error al activar la versión {version}: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al activar la versión: {str(e)}'
+        )
+    return {'active': snapshot.version}
+
+
+@router.get('/api/v1/registry/shadow')
+async def shadow_stats(request: Request):
+    return request.app.state.shadow.stats()
+
+
+@router.put('/api/v1/registry/shadow')
+async def set_shadow(body: ShadowRequest, request: Request):
+    logger = request.app.state.logger
+    _store(request)
+    try:
+        await run_in_threadpool(request.app.state.registry.set_shadow, body.version)
+    except KeyError:
+        raise HTTPException(
+            status_code=404, detail=f'Versión {body.version} no encontrada'
+        )
+    except Exception as e:
+        logger.error(f'Error al cargar la versión en sombra: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al cargar la versión en sombra: {str(e)}'
+        )
+    return request.app.state.shadow.stats()
@@ -1,29 +1,48 @@
-import pandas as pd
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from sklearn.model_selection import train_test_split
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
 from starlette.concurrency import run_in_threadpool
 
-from modules import train_model
-
 router = APIRouter()
 
-@router.post("/api/v1/train/")
-async def train(file: UploadFile = File(...)):
+
+@router.post('/api/v1/train/', status_code=202)
+async def train(request: Request, file: UploadFile = File(...)):
+    logger = request.app.state.logger
+    logger.info('Solicitud recibida en /api/v1/train/')
+
+    # the fit runs in a separate process; the request only spools the upload
     try:
-        # get logger from api state
-        logger = request.app.state.logger
-        logger.info("Solicitud recibida en /api/v1/train/")
+        job = await run_in_threadpool(request.app.state.training.submit, file.file)
+    except Exception as e:
+        logger.error(f'Error al encolar el entrenamiento: {str(e)}')
+        raise HTTPException(
+            status_code=500, detail=f'Error al encolar el entrenamiento: {str(e)}'
+        )
 
-        df = await run_in_threadpool(pd.read_csv, file.file)
-        logger.info(f"Datos recibidos: {df}")
+    logger.info(f'Entrenamiento encolado con job_id {job["job_id"]}')
+    return {
+        'message': 'Entrenamiento encolado',
+        'job_id': job['job_id'],
+        'status': job['status'],
+    }
 
-        logger.info("Iniciando el entrenamiento del modelo...")
-        resultado = await run_in_threadpool(train_model, df)
 
-        return {
-            "message": "Modelo entrenado con éxito",
-            "details": resultado
-        }
-    except Exception as e:
-        logger.error(f"Error en el entrenamiento: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error en el entrenamiento: {str(e)}")
+@router.get('/api/v1/train/jobs')
+async def list_jobs(request: Request):
+    return {'jobs': await run_in_threadpool(request.app.state.training.list)}
+
+
+@router.get('/api/v1/train/jobs/{job_id}')
+async def job_status(job_id: str, request: Request):
+    try:
+        return await run_in_threadpool(request.app.state.training.status, job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f'Trabajo {job_id} no encontrado')
+
+
+@router.delete('/api/v1/train/jobs/{job_id}')
+async def cancel_job(job_id: str, request: Request):
+    request.app.state.logger.info(f'Cancelación solicitada para el trabajo {job_id}')
+    try:
+        return await run_in_threadpool(request.app.state.training.cancel, job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f'Trabajo {job_id} no encontrado')
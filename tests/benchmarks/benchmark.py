@@ -0,0 +1,240 @@
+"""Suite de benchmarks de rendimiento con umbrales de regresión.
+
+Uso:
+    python tests/benchmarks/benchmark.py --save            # guarda una nueva línea base
+    python tests/benchmarks/benchmark.py --tolerance 0.2   # compara contra la línea base
+
+Termina con código 1 si el throughput o el p95 de algún caso empeora más que la tolerancia.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# los logs de la ejecución van a un directorio temporal para no ensuciar logs/ ni medir su rotación
+log_dir = tempfile.mkdtemp(prefix='hdi-benchmarks-')
+os.environ['CONFIG_OVERRIDES'] = ' '.join([
+    os.environ.get('CONFIG_OVERRIDES', ''),
+    f"logger.log_file={os.path.join(log_dir, 'logger.log')}",
+    f"logger.csv_file={os.path.join(log_dir, 'logger.csv')}",
+    f"predictions.path={os.path.join(log_dir, 'predictions.db')}",
+]).strip()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from synthetic import synthetic_claims  # noqa: E402
+
+from api.main import app, cfg  # noqa: E402
+from modules import PredictionStore, full_pipeline, load_model  # noqa: E402
+from modules.predictions import COLUMNS  # noqa: E402
+from modules.preprocessing import pipeline_run  # noqa: E402
+from modules.imputation import null_imputation  # noqa: E402
+from utils import validate_types  # noqa: E402
+
+BASELINE_PATH = os.path.join(root_dir, 'tests', 'benchmarks', 'results', 'baseline.json')
+BATCH_SIZES = (1, 100, 10000)
+STORE_ROWS = 1_000_000
+ARROW_HEADERS = {'content-type': 'application/vnd.apache.arrow.stream'}
+
+
+def measure(function, make_args, rows, min_time=1.0, max_iterations=1000, warmup=2):
+    """Mide la latencia por llamada de `function` y su throughput en filas por segundo.
+
+    Args:
+        function (Callable): Función a medir.
+        make_args (Callable): Devuelve los argumentos de cada llamada; no se incluye en la medición.
+        rows (int): Filas procesadas por llamada.
+        min_time (float): Tiempo mínimo de medición en segundos.
+        max_iterations (int): Número máximo de llamadas.
+        warmup (int): Llamadas de calentamiento que no se miden.
+
+    Returns:
+        dict: Iteraciones, p50, p95, media y throughput.
+    """
+    for _ in range(warmup):
+        function(*make_args())
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_iterations and (time.perf_counter() - started < min_time or len(latencies) < 5):
+        args = make_args()
+        start = time.perf_counter()
+        function(*args)
+        latencies.append(time.perf_counter() - start)
+
+    latencies = np.asarray(latencies)
+    return {
+        'rows': rows,
+        'iterations': int(len(latencies)),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'mean_ms': float(latencies.mean() * 1000),
+        'rows_per_sec': float(rows * len(latencies) / latencies.sum()),
+    }
+
+
+def arrow_stream(df):
+    """Serializa un DataFrame como Arrow IPC (stream)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def run_benchmarks(batch_sizes=BATCH_SIZES, min_time=1.0):
+    """Ejecuta todos los casos y devuelve sus resultados indexados por nombre."""
+    client = TestClient(app)
+    artifacts = app.state.registry.snapshot()
+    results = {}
+
+    results['load_model'] = measure(load_model, lambda: (cfg,), rows=1, min_time=min_time, max_iterations=200)
+
+    for size in batch_sizes:
+        raw = synthetic_claims(size, seed=size)
+
+        results[f'full_pipeline[{size}]'] = measure(
+            full_pipeline, lambda: (raw.copy(), cfg, artifacts), rows=size, min_time=min_time
+        )
+
+        # entrada de la imputación: salida de los pasos del pipeline sin imputar
+        transformed = raw.copy()
+        for pipeline in artifacts.pipelines:
+            transformed = pipeline_run(transformed, pipeline)
+        results[f'null_imputation[{size}]'] = measure(
+            null_imputation, lambda: (transformed.copy(), artifacts.imputation_dict), rows=size, min_time=min_time
+        )
+
+        imputed = null_imputation(transformed.copy(), artifacts.imputation_dict)
+        results[f'validate_columns_and_types[{size}]'] = measure(
+            validate_types, lambda: (imputed.copy(),), rows=size, min_time=min_time
+        )
+
+        # imputación y validación en una sola pasada (reemplaza a los dos casos anteriores)
+        results[f'compiled_schema[{size}]'] = measure(
+            artifacts.schema.apply, lambda: (transformed.copy(),), rows=size, min_time=min_time
+        )
+
+        payload = json.loads(raw.to_json(orient='records'))
+        if size == 1:
+            results['predict_endpoint[1]'] = measure(
+                lambda body: client.post('/api/v1/predict/', json=body), lambda: (payload[0],),
+                rows=1, min_time=min_time, max_iterations=500
+            )
+        results[f'predict_batch_endpoint[{size}]'] = measure(
+            lambda body: client.post('/api/v1/predict/batch', json=body), lambda: (payload,),
+            rows=size, min_time=min_time, max_iterations=200
+        )
+
+        # mismo lote como Arrow IPC, sin JSON ni un Claim por fila
+        arrow_body = arrow_stream(raw)
+        results[f'predict_columnar_endpoint[{size}]'] = measure(
+            lambda body: client.post('/api/v1/predict/columnar', content=body, headers=ARROW_HEADERS),
+            lambda: (arrow_body,), rows=size, min_time=min_time, max_iterations=200
+        )
+
+    results[f'prediction_store_history[{STORE_ROWS}]'] = prediction_store_benchmark(min_time)
+
+    return results
+
+
+def prediction_store_benchmark(min_time, rows=STORE_ROWS):
+    """Mide la consulta por claim_id en un almacén de predicciones con `rows` filas."""
+    store = PredictionStore(os.path.join(log_dir, 'predictions_benchmark.db'))
+    rng = np.random.default_rng(0)
+    claim_ids = rng.integers(0, rows * 10, rows)
+    with store._connection() as connection:
+        connection.executemany(
+            f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            ((int(claim_id), 1.7e9 + i, 'v', 'ferd', 1, 1, 1, 1, 1, 2.0, 0.01) for i, claim_id in enumerate(claim_ids)),
+        )
+    return measure(store.history, lambda: (int(rng.choice(claim_ids)),), rows=1, min_time=min_time)
+
+
+def compare(results, baseline, tolerance):
+    """Compara los resultados con la línea base.
+
+    Los casos de la línea base que no se ejecutaron también se reportan, para que un caso
+    eliminado o renombrado no pase el control sin medirse.
+
+    Returns:
+        list: Mensajes de regresión; vacía si no hay regresiones.
+    """
+    regressions = []
+    for name, base in baseline['results'].items():
+        current = results.get(name)
+        if current is None:
+            regressions.append(f'{name}: presente en la línea base pero no en esta ejecución')
+            continue
+        if current['rows_per_sec'] < base['rows_per_sec'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['rows_per_sec']:.1f} filas/s < línea base {base['rows_per_sec']:.1f}"
+            )
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.3f} ms > línea base {base['p95_ms']:.3f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de rendimiento de la API de siniestros.')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Ruta del JSON de línea base.')
+    parser.add_argument('--output', default=None, help='Ruta donde guardar los resultados de esta ejecución.')
+    parser.add_argument('--save', action='store_true', help='Guarda los resultados como nueva línea base.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Empeoramiento relativo permitido.')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Segundos de medición por caso.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BATCH_SIZES), help='Tamaños de lote.')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.min_time)
+    report = {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    for name, result in results.items():
+        print(
+            f"{name:<40} p50 {result['p50_ms']:>10.3f} ms  p95 {result['p95_ms']:>10.3f} ms  "
+            f"{result['rows_per_sec']:>14.1f} filas/s"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f'Línea base guardada en {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(
+            f'ERROR: no existe la línea base {args.baseline}; ejecute con --save para crearla.',
+            file=sys.stderr,
+        )
+        return 1
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESIÓN {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
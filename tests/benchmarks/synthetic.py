@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATASET_PATH = os.path.join(root_dir, 'data', 'claims_dataset.csv')
+
+
+def load_schema(path=DATASET_PATH):
+    """Lee el dataset de siniestros y devuelve los valores observados por columna."""
+    df = pd.read_csv(path, sep='|', keep_default_na=False)
+    return {column: df[column].to_numpy() for column in df.columns if column != 'claim_id'}
+
+
+def synthetic_claims(n_rows, seed=0, path=DATASET_PATH):
+    """Genera siniestros sintéticos muestreando cada columna de la distribución empírica del dataset.
+
+    Args:
+        n_rows (int): Número de filas.
+        seed (int): Semilla del generador.
+        path (str): Dataset del que se toma el esquema y las frecuencias.
+
+    Returns:
+        DataFrame: Siniestros con las columnas de `Claim` y `claim_id` únicos.
+    """
+    rng = np.random.default_rng(seed)
+    schema = load_schema(path)
+    data = {'claim_id': np.arange(1, n_rows + 1)}
+    for column, values in schema.items():
+        data[column] = rng.choice(values, size=n_rows, replace=True)
+    return pd.DataFrame(data)
@@ -1,25 +1,282 @@
-from locust import HttpUser, TaskSet, task, between
+"""Pruebas de carga en lazo cerrado de la API de siniestros.
 
-class PredictTaskSet(TaskSet):
+Cada usuario envía una solicitud, espera la respuesta y `--think-time` segundos, y envía la
+siguiente. Los siniestros se muestrean con la distribución de `--dataset` (ver `payloads.py`).
+La carga sigue `--load-shape` durante `--steps` etapas de `--stage-duration` segundos:
+
+- `constant`: `-u` usuarios desde el principio, arrancados a `-r` usuarios por segundo.
+- `step`: `-u / steps` usuarios más en cada etapa hasta llegar a `-u`.
+- `ramp`: crecimiento lineal de 1 a `-u` usuarios a lo largo de todas las etapas.
+
+Al terminar se calculan los percentiles de latencia, la tasa de error y el throughput de cada
+etapa; el throughput de saturación es el de la etapa con más solicitudes correctas por segundo.
+Con `--results-json` el resumen se guarda en JSON, y si no se cumple algún umbral `--slo-*` el
+proceso termina con código 1.
+
+Uso:
+    python tests/stress/run.py --load-shape step -u 64 --steps 4 --slo-p99-ms 500  # arranca la API
+    locust -f tests/stress/locustfile.py --host http://127.0.0.1:8000               # interfaz web
+    locust -f tests/stress/locustfile.py --headless --host ... BatchUser            # solo lotes
+"""
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from locust import HttpUser, LoadTestShape, events, task
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from payloads import DATASET_PATH, ClaimSampler, parse_mix  # noqa: E402
+
+# generador compartido por todos los usuarios, creado al iniciar locust
+SAMPLER = None
+
+
+@events.init_command_line_parser.add_listener
+def _add_arguments(parser):
+    parser.add_argument('--dataset', default=DATASET_PATH, help='Archivo de siniestros del que se muestrean las solicitudes.')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2, help='Fracción de solicitudes que repiten un siniestro ya enviado.')
+    parser.add_argument('--policy-mix', default='', help='Pesos de tipo_poliza, por ejemplo 1=0.4,3=0.4,4=0.2 (por defecto los del archivo).')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla del generador de siniestros.')
+    parser.add_argument('--batch-size', type=int, default=50, help='Siniestros por solicitud de BatchUser.')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Segundos que espera cada usuario entre respuesta y solicitud.')
+    parser.add_argument('--load-shape', choices=('constant', 'step', 'ramp'), default='step', help='Forma de la carga.')
+    parser.add_argument('--steps', type=int, default=5, help='Número de etapas de la prueba.')
+    parser.add_argument('--stage-duration', type=float, default=30.0, help='Segundos de cada etapa.')
+    parser.add_argument('--results-json', default=None, help='Ruta donde guardar el resumen de la prueba.')
+    parser.add_argument('--slo-p95-ms', type=float, default=0.0, help='p95 máximo de las solicitudes correctas (0 sin límite).')
+    parser.add_argument('--slo-p99-ms', type=float, default=0.0, help='p99 máximo de las solicitudes correctas (0 sin límite).')
+    parser.add_argument('--slo-min-rps', type=float, default=0.0, help='Throughput de saturación mínimo (0 sin límite).')
+    parser.add_argument('--slo-max-error-rate', type=float, default=0.01, help='Tasa de error máxima, incluidos 429 y 503 (1 sin límite).')
+
+
+class LoadResults:
+    """Latencias y errores de la prueba agrupados por etapa y por endpoint.
+
+    Solo ve las solicitudes del propio proceso: la prueba debe ejecutarse sin `--processes` ni
+    workers distribuidos.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.stage_duration = 1.0
+        self.environment = None
+        self.stages = defaultdict(self._bucket)
+        self.endpoints = defaultdict(self._bucket)
+
+    @staticmethod
+    def _bucket():
+        return {'users': 0, 'latencies': [], 'claims': 0, 'status': Counter()}
+
+    def start(self, environment):
+        self.environment = environment
+        self.stage_duration = environment.parsed_options.stage_duration
+        self.stages.clear()
+        self.endpoints.clear()
+        self.started = time.perf_counter()
+
+    def record(self, name, response_time, status, failed, claims):
+        if self.started is None:
+            return
+        index = int((time.perf_counter() - self.started) // self.stage_duration)
+        for bucket in (self.stages[index], self.endpoints[name]):
+            bucket['users'] = max(bucket['users'], self.environment.runner.user_count)
+            bucket['status'][str(status)] += 1
+            if not failed:
+                bucket['latencies'].append(response_time)
+                bucket['claims'] += claims
+
+    @staticmethod
+    def _summary(bucket, duration):
+        requests = sum(bucket['status'].values())
+        ok = len(bucket['latencies'])
+        latencies = np.asarray(bucket['latencies'], dtype=float)
+        p50, p95, p99 = (float(value) for value in np.percentile(latencies, (50, 95, 99))) if ok else (None,) * 3
+        return {
+            'users': bucket['users'],
+            'duration_s': round(duration, 3),
+            'requests': requests,
+            'failures': requests - ok,
+            'error_rate': (requests - ok) / requests if requests else 0.0,
+            'rps': ok / duration if duration else 0.0,
+            'claims_per_sec': bucket['claims'] / duration if duration else 0.0,
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'status': dict(bucket['status']),
+        }
+
+    def summary(self):
+        """Resumen total, por endpoint y por etapa, y throughput de saturación."""
+        elapsed = time.perf_counter() - self.started
+        total = self._bucket()
+        for bucket in self.endpoints.values():
+            total['users'] = max(total['users'], bucket['users'])
+            total['latencies'].extend(bucket['latencies'])
+            total['claims'] += bucket['claims']
+            total['status'].update(bucket['status'])
+
+        stages = []
+        for index in sorted(self.stages):
+            start = index * self.stage_duration
+            duration = min(start + self.stage_duration, elapsed) - start
+            stages.append({'stage': index, 'start_s': start, **self._summary(self.stages[index], duration)})
+        # las etapas cortadas al detener la prueba no cuentan para la saturación
+        complete = [stage for stage in stages if stage['duration_s'] >= self.stage_duration / 2]
+        peak = max(complete or stages, key=lambda stage: stage['rps'], default=None)
+        return {
+            'duration_s': round(elapsed, 3),
+            'total': self._summary(total, elapsed),
+            'endpoints': {name: self._summary(bucket, elapsed) for name, bucket in self.endpoints.items()},
+            'stages': stages,
+            'saturation': {
+                'rps': peak['rps'] if peak else 0.0,
+                'claims_per_sec': peak['claims_per_sec'] if peak else 0.0,
+                'users': peak['users'] if peak else 0,
+                'stage': peak['stage'] if peak else None,
+            },
+        }
+
+
+RESULTS = LoadResults()
+
+
+def check_slos(summary, options):
+    """Compara el resumen con los umbrales `--slo-*`.
+
+    Returns:
+        list: Mensajes de los umbrales que no se cumplen.
+    """
+    total = summary['total']
+    violations = []
+    for name, threshold in (('p95_ms', options.slo_p95_ms), ('p99_ms', options.slo_p99_ms)):
+        if threshold and (total[name] is None or total[name] > threshold):
+            violations.append(f'{name} = {_ms(total[name])} > {threshold} ms')
+    if options.slo_min_rps and summary['saturation']['rps'] < options.slo_min_rps:
+        violations.append(f"rps de saturación = {summary['saturation']['rps']:.1f} < {options.slo_min_rps}")
+    if total['error_rate'] > options.slo_max_error_rate:
+        violations.append(f"error_rate = {total['error_rate']:.4f} > {options.slo_max_error_rate}")
+    return violations
+
+
+def _ms(value):
+    return '-' if value is None else f'{value:.1f} ms'
+
+
+@events.init.add_listener
+def _create_sampler(environment, **kwargs):
+    global SAMPLER
+    options = environment.parsed_options
+    if options is None:
+        return
+    SAMPLER = ClaimSampler(
+        options.dataset,
+        duplicate_ratio=options.duplicate_ratio,
+        policy_mix=parse_mix(options.policy_mix),
+        seed=options.seed,
+    )
+
+
+@events.test_start.add_listener
+def _start_results(environment, **kwargs):
+    RESULTS.start(environment)
+
+
+@events.request.add_listener
+def _record_request(name, response_time, response, exception, context, **kwargs):
+    status = getattr(response, 'status_code', 0) or 0
+    RESULTS.record(name, response_time, status, exception is not None, (context or {}).get('claims', 1))
+
+
+@events.quitting.add_listener
+def _report(environment, **kwargs):
+    if RESULTS.started is None:
+        return
+    options = environment.parsed_options
+    summary = RESULTS.summary()
+    violations = check_slos(summary, options)
+    summary['options'] = {
+        key: getattr(options, key)
+        for key in ('host', 'num_users', 'load_shape', 'steps', 'stage_duration', 'think_time', 'duplicate_ratio',
+                    'policy_mix', 'batch_size', 'seed')
+    }
+    summary['slo'] = {
+        'thresholds': {
+            'p95_ms': options.slo_p95_ms,
+            'p99_ms': options.slo_p99_ms,
+            'min_rps': options.slo_min_rps,
+            'max_error_rate': options.slo_max_error_rate,
+        },
+        'passed': not violations,
+        'violations': violations,
+    }
+
+    for stage in summary['stages']:
+        logging.info(
+            f"etapa {stage['stage']}: {stage['users']} usuarios, {stage['rps']:.1f} rps, p95 {_ms(stage['p95_ms'])}, "
+            f"p99 {_ms(stage['p99_ms'])}, errores {stage['error_rate']:.2%}"
+        )
+    logging.info(f"throughput de saturación: {summary['saturation']['rps']:.1f} rps con {summary['saturation']['users']} usuarios")
+    if options.results_json:
+        os.makedirs(os.path.dirname(os.path.abspath(options.results_json)), exist_ok=True)
+        with open(options.results_json, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, indent=2)
+        logging.info(f'Resumen guardado en {options.results_json}')
+    if violations:
+        logging.error(f"SLO incumplidos: {'; '.join(violations)}")
+        environment.process_exit_code = 1
+
+
+class ConfiguredShape(LoadTestShape):
+    """Forma de carga elegida con `--load-shape` (ver la descripción del módulo)."""
+
+    use_common_options = True
+
+    def tick(self):
+        options = self.runner.environment.parsed_options
+        elapsed = self.get_run_time()
+        total = options.steps * options.stage_duration
+        if elapsed >= total:
+            return None
+        users = options.num_users
+        if options.load_shape == 'step':
+            users = math.ceil(users * (int(elapsed // options.stage_duration) + 1) / options.steps)
+            return users, users
+        if options.load_shape == 'ramp':
+            users = max(1, math.ceil(users * elapsed / total))
+            return users, users
+        return users, options.spawn_rate
+
+
+class PredictUser(HttpUser):
+    """Usuario del endpoint de un siniestro."""
+
+    weight = 4
+
+    def wait_time(self):
+        return self.environment.parsed_options.think_time
 
     @task
     def predict(self):
+        self.client.post('/api/v1/predict/', json=SAMPLER.claim(), name='predict')
 
-        payload = {
-            "claim_id": 1,
-            "marca_vehiculo": "ford",
-            "antiguedad_vehiculo": 5,
-            "tipo_poliza": 2,
-            "taller": 1,
-            "partes_a_reparar": 3,
-            "partes_a_reemplazar": 1
-        }
 
-        response = self.client.post("/api/v1/predict/", json=payload)
+class BatchUser(HttpUser):
+    """Usuario del endpoint por lotes, con `--batch-size` siniestros por solicitud."""
 
-        assert response.status_code == 200, f"Error: {response.status_code}"
+    weight = 1
 
+    def wait_time(self):
+        return self.environment.parsed_options.think_time
 
-class PredictTestUser(HttpUser):
-    tasks = [PredictTaskSet]
-    wait_time = between(1, 5)
+    @task
+    def predict_batch(self):
+        size = self.environment.parsed_options.batch_size
+        self.client.post(
+            '/api/v1/predict/batch', json=SAMPLER.claims(size), name='predict_batch', context={'claims': size}
+        )
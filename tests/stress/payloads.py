@@ -0,0 +1,87 @@
+"""Generador de siniestros para las pruebas de carga.
+
+Los campos se muestrean de forma independiente con la distribución de cada columna del archivo
+de siniestros, de modo que aparecen las marcas sin mapear y las pólizas que resuelven las reglas
+de negocio en la misma proporción que en los datos. Una fracción configurable de las solicitudes
+reenvía un siniestro ya enviado para ejercitar la caché y el almacén de predicciones.
+"""
+import csv
+import os
+import random
+import threading
+from collections import Counter, deque
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATASET_PATH = os.path.join(root_dir, 'data', 'claims_dataset.csv')
+FIELDS = ('marca_vehiculo', 'antiguedad_vehiculo', 'tipo_poliza', 'taller', 'partes_a_reparar', 'partes_a_reemplazar')
+
+
+def parse_mix(text):
+    """Interpreta una mezcla de pólizas como `1=0.4,3=0.4,4=0.2`.
+
+    Returns:
+        dict: Póliza -> peso, o un diccionario vacío si `text` está vacío.
+
+    Raises:
+        ValueError: Si algún par no tiene la forma `póliza=peso` o los pesos no son positivos.
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        policy, _, weight = item.partition('=')
+        mix[int(policy)] = float(weight)
+    if mix and (min(mix.values()) < 0 or sum(mix.values()) <= 0):
+        raise ValueError(f'Mezcla de pólizas no válida: {text}')
+    return mix
+
+
+class ClaimSampler:
+    """Muestrea siniestros con la distribución de un archivo de siniestros.
+
+    Args:
+        path (str): Archivo delimitado por `|` con cabecera.
+        duplicate_ratio (float): Fracción de solicitudes que reenvían un siniestro ya enviado.
+        policy_mix (dict, optional): Póliza -> peso; sustituye a la distribución de `tipo_poliza`.
+        pool_size (int): Siniestros recientes entre los que se eligen los duplicados.
+        seed (int, optional): Semilla del generador.
+    """
+
+    def __init__(self, path=DATASET_PATH, duplicate_ratio=0.0, policy_mix=None, pool_size=1000, seed=None):
+        if not 0 <= duplicate_ratio <= 1:
+            raise ValueError(f'duplicate_ratio debe estar entre 0 y 1: {duplicate_ratio}')
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file, delimiter='|'))
+        if not rows:
+            raise ValueError(f'El archivo de siniestros está vacío: {path}')
+
+        # valor -> frecuencia de cada campo
+        self.distributions = {}
+        for field in FIELDS:
+            counts = Counter(row[field] if field == 'marca_vehiculo' else int(row[field]) for row in rows)
+            self.distributions[field] = (list(counts), list(counts.values()))
+        if policy_mix:
+            self.distributions['tipo_poliza'] = (list(policy_mix), list(policy_mix.values()))
+
+        self.duplicate_ratio = duplicate_ratio
+        self._random = random.Random(seed)
+        self._recent = deque(maxlen=pool_size)
+        self._next_id = self._random.randrange(10_000_000, 90_000_000)
+        # los usuarios de locust comparten el generador desde varios greenlets
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Devuelve un siniestro nuevo o, con probabilidad `duplicate_ratio`, uno ya enviado."""
+        with self._lock:
+            if self._recent and self._random.random() < self.duplicate_ratio:
+                return dict(self._random.choice(self._recent))
+            claim = {'claim_id': self._next_id}
+            self._next_id += 1
+            for field, (values, weights) in self.distributions.items():
+                claim[field] = self._random.choices(values, weights)[0]
+            self._recent.append(claim)
+            return dict(claim)
+
+    def claims(self, n):
+        """Devuelve `n` siniestros para el endpoint por lotes."""
+        return [self.claim() for _ in range(n)]
@@ -0,0 +1,110 @@
+"""Arranca la API en local, ejecuta las pruebas de carga sin interfaz y detiene la API.
+
+Uso:
+    python tests/stress/run.py --load-shape step -u 64 --steps 4 --slo-p95-ms 200 --slo-p99-ms 500
+    python tests/stress/run.py --workers 4 --load-shape ramp -u 128 --slo-min-rps 300
+    python tests/stress/run.py -u 16 --load-shape constant BatchUser --batch-size 200
+
+Los argumentos que no reconoce se pasan a locust (ver `locustfile.py`). Los logs, el CSV de
+auditoría y el almacén de predicciones de la API van a un directorio temporal. Termina con el
+código de locust: 1 si no se cumple algún SLO.
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# root dir
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOCUSTFILE = os.path.join(root_dir, 'tests', 'stress', 'locustfile.py')
+RESULTS_PATH = os.path.join(root_dir, 'tests', 'stress', 'results', 'latest.json')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, port, log_dir):
+    """Lanza la API con uvicorn o, con `workers`, con el servidor pre-fork."""
+    env = dict(os.environ)
+    env['CONFIG_OVERRIDES'] = ' '.join([
+        env.get('CONFIG_OVERRIDES', ''),
+        f"logger.log_file={os.path.join(log_dir, 'logger.log')}",
+        f"logger.csv_file={os.path.join(log_dir, 'logger.csv')}",
+        f"predictions.path={os.path.join(log_dir, 'predictions.db')}",
+    ]).strip()
+    if workers is None:
+        command = [sys.executable, '-m', 'uvicorn', 'api.main:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'api.serve', '--workers', str(workers), '--host', '127.0.0.1',
+                   '--port', str(port)]
+    with open(os.path.join(log_dir, 'server.out'), 'wb') as output:
+        return subprocess.Popen(command, cwd=root_dir, env=env, stdout=output, stderr=subprocess.STDOUT)
+
+
+def wait_ready(server, url, timeout):
+    """Espera a que la API responda en `url`.
+
+    Raises:
+        RuntimeError: Si el proceso termina o no responde antes de `timeout` segundos.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'La API terminó al arrancar con código {server.returncode}')
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'La API no respondió en {timeout} s')
+
+
+def stop_server(server, timeout=30):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pruebas de carga contra una API arrancada en local.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Workers del servidor pre-fork (por defecto un proceso uvicorn).')
+    parser.add_argument('--port', type=int, default=None, help='Puerto de la API (por defecto uno libre).')
+    parser.add_argument('--results-json', default=RESULTS_PATH, help='Ruta del resumen en JSON.')
+    parser.add_argument('--startup-timeout', type=float, default=60.0, help='Segundos máximos de arranque.')
+    args, locust_args = parser.parse_known_args(argv)
+
+    port = args.port or free_port()
+    url = f'http://127.0.0.1:{port}'
+    log_dir = tempfile.mkdtemp(prefix='hdi-stress-')
+    server = start_server(args.workers, port, log_dir)
+    try:
+        try:
+            wait_ready(server, f'{url}/', args.startup_timeout)
+        except RuntimeError as e:
+            print(f"{e}; salida de la API en {os.path.join(log_dir, 'server.out')}", file=sys.stderr)
+            return 2
+        print(f'API lista en {url} (logs en {log_dir})', flush=True)
+        command = [sys.executable, '-m', 'locust', '-f', LOCUSTFILE, '--headless', '--host', url,
+                   '--results-json', args.results_json, *locust_args]
+        return subprocess.call(command, cwd=root_dir)
+    finally:
+        stop_server(server)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -60,3 +60,996 @@ def test_predict_endpoint(hydra_cfg):
     assert response.status_code == 200, "La respuesta del endpoint debe ser 200 OK"
     json_data = response.json()
     assert "prediccion" in json_data, "La respuesta debe contener el campo 'prediccion'"
+
+    payload["tipo_poliza"] = 4
+    response = client.post("/api/v1/predict/", json=payload)
+    assert response.text == '{"prediccion":-1}', "Las pólizas tipo 4 deben devolver el entero -1"
+
+def test_artifact_registry(hydra_cfg):
+    from modules import ArtifactRegistry
+    import os
+
+    registry = ArtifactRegistry(hydra_cfg)
+    snapshot = registry.load()
+    assert len(snapshot.pipelines) == len(hydra_cfg.pipeline.steps), "Deben cargarse todos los pasos del pipeline"
+    assert registry.snapshot() is snapshot, "Sin cambios en disco el snapshot debe reutilizarse"
+    assert not registry.refresh(), "Sin cambios en disco no debe recargarse nada"
+
+    # Simular un cambio en el diccionario de imputaciones
+    path = hydra_cfg.pipeline.imputacion_path
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    try:
+        assert registry.refresh(), "Un cambio de mtime debe provocar la recarga"
+        reloaded = registry.snapshot()
+        assert reloaded.version != snapshot.version
+        assert reloaded.model is snapshot.model, "Solo deben recargarse los artefactos modificados"
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+def test_artifact_registry_background_reload(hydra_cfg, monkeypatch):
+    from modules import ArtifactRegistry
+    import modules.registry
+    import os
+
+    registry = ArtifactRegistry(hydra_cfg)
+    snapshot = registry.load()
+
+    def broken(path):
+        raise ValueError("artefacto corrupto")
+
+    # una recarga fallida se registra y se sigue sirviendo el snapshot anterior
+    monkeypatch.setattr(modules.registry, "load_dict", broken)
+    path = hydra_cfg.pipeline.imputacion_path
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    try:
+        registry._last_check = 0.0
+        assert registry.snapshot() is snapshot, "La recarga no debe bloquear la solicitud"
+        registry._reload_thread.join(timeout=10)
+        assert registry.snapshot() is snapshot, "Una recarga fallida debe conservar el snapshot anterior"
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+def test_predict_batch_endpoint(hydra_cfg):
+    payload = [
+        {"claim_id": 1, "marca_vehiculo": "ford", "antiguedad_vehiculo": 5, "tipo_poliza": 2,
+         "taller": 1, "partes_a_reparar": 3, "partes_a_reemplazar": 1},
+        {"claim_id": 2, "marca_vehiculo": "ferd", "antiguedad_vehiculo": 2, "tipo_poliza": 4,
+         "taller": 3, "partes_a_reparar": 1, "partes_a_reemplazar": 2},
+        {"claim_id": 3, "marca_vehiculo": "fait", "antiguedad_vehiculo": "abc", "tipo_poliza": 1,
+         "taller": 2, "partes_a_reparar": 2, "partes_a_reemplazar": 2},
+    ]
+
+    response = client.post("/api/v1/predict/batch", json=payload)
+    assert response.status_code == 200, "La respuesta del endpoint debe ser 200 OK"
+    predicciones = response.json()["predicciones"]
+    assert [p["claim_id"] for p in predicciones] == [1, 2, 3], "Las predicciones deben respetar el orden de entrada"
+
+    single = client.post("/api/v1/predict/", json=payload[0]).json()["prediccion"]
+    assert predicciones[0]["prediccion"] == pytest.approx(single), "El lote debe coincidir con la predicción individual"
+    assert predicciones[1]["prediccion"] == -1, "Las pólizas tipo 4 deben predecir -1"
+    assert predicciones[2]["error"] is not None and predicciones[2]["prediccion"] is None, "Las filas inválidas deben reportar su error"
+
+def test_micro_batcher(hydra_cfg, monkeypatch):
+    import asyncio
+    import modules.batching
+    from modules import ArtifactRegistry, MicroBatcher
+
+    calls = []
+    score_claims = modules.batching.score_claims
+    monkeypatch.setattr(
+        modules.batching, "score_claims", lambda claims, *args: calls.append(len(claims)) or score_claims(claims, *args)
+    )
+
+    registry = ArtifactRegistry(hydra_cfg)
+    batcher = MicroBatcher(hydra_cfg, registry)
+    claims = [
+        Claim(claim_id=i, marca_vehiculo="ferd", antiguedad_vehiculo=i, tipo_poliza=4 if i == 2 else 1,
+              taller=1, partes_a_reparar=2, partes_a_reemplazar=1)
+        for i in range(1, 5)
+    ]
+
+    async def run():
+        results = await asyncio.gather(*(batcher.submit(claim) for claim in claims))
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert len(results) == len(claims), "Cada solicitud debe recibir su propia predicción"
+    assert results[1] == -1, "Las pólizas tipo 4 deben predecir -1"
+    assert len(set(results)) == len(results), "Cada fila debe resolver su propio resultado"
+    assert calls == [len(claims)], "Las solicitudes concurrentes deben resolverse con un solo lote"
+
+def test_load_pipeline_blocking_calls(hydra_cfg):
+    import time
+    from modules import load_pipeline, pipeline_report
+
+    pipeline = load_pipeline("pipes/pipeline_2.pkl", mode="production")
+    report = pipeline_report()
+    findings = [finding for path, items in report.items() if path.endswith("pipeline_2.pkl") for finding in items]
+    assert [(f.call, f.action) for f in findings] == [("time.sleep", "patched")], "Debe reportarse el time.sleep parcheado"
+
+    start = time.perf_counter()
+    result = pipeline(pd.DataFrame({"total_piezas": [4]}))
+    assert time.perf_counter() - start < 1, "En modo producción el sleep debe ser un no-op"
+    assert result["log_total_piezas"].iloc[0] == pytest.approx(1.3863, abs=1e-4)
+
+    from modules import inspect_pipeline
+
+    def carga(df):
+        return np.load("datos.npy")
+
+    assert "np" not in carga.__globals__
+    assert [f.call for f in inspect_pipeline(carga)] == ["numpy.load"], "np debe resolverse como numpy"
+
+def test_fused_transform_equivalence(hydra_cfg):
+    import numpy as np
+    from modules import ArtifactRegistry
+    from modules.fused import FEATURES, check_equivalence
+
+    snapshot = ArtifactRegistry(hydra_cfg).load()
+    assert snapshot.fused is not None, "El transform fusionado debe compilar y ser equivalente a los pipelines"
+    assert snapshot.fused.marca_vehiculo == {"chepy": 1, "fait": 2, "ferd": 3}, "Las tablas deben leerse de los pasos dill"
+    assert snapshot.fused.valor_por_pieza == {1: 50, 2: 100, 3: 200, 4: 300, 5: 400}
+
+    data = pd.read_csv("data/claims_dataset.csv", sep="|")
+    assert check_equivalence(snapshot.fused, hydra_cfg, snapshot, data), "Debe coincidir con los pipelines en el dataset"
+
+    matrix = snapshot.fused.transform(data)
+    assert matrix.shape == (len(data), len(FEATURES)) and matrix.flags["C_CONTIGUOUS"]
+    assert not np.isnan(matrix).any(), "El transform debe imputar todos los valores nulos"
+
+def test_linear_kernel(hydra_cfg, tmp_path):
+    import numpy as np
+    from modules import LinearKernel, compile_linear_model, export_linear_model, load_linear_model
+
+    model = load_model(hydra_cfg)
+    kernel = compile_linear_model(model)
+    assert isinstance(kernel, LinearKernel), "Un LinearRegression debe compilarse a un kernel lineal"
+
+    X = np.random.default_rng(0).uniform(0, 10, size=(100, len(kernel.coef_)))
+    expected = model.predict(pd.DataFrame(X, columns=model.feature_names_in_))
+    np.testing.assert_allclose(kernel.predict(X), expected, rtol=1e-12)
+
+    path = tmp_path / "linear.json"
+    export_linear_model(model, path)
+    np.testing.assert_allclose(load_linear_model(path).predict(X), expected, rtol=1e-12)
+
+    no_lineal = object()
+    assert compile_linear_model(no_lineal) is no_lineal, "Los modelos no lineales deben usar sklearn"
+
+    from sklearn.linear_model import PoissonRegressor
+    glm = PoissonRegressor().fit(pd.DataFrame(X, columns=model.feature_names_in_), np.arange(100) % 5)
+    assert compile_linear_model(glm) is glm, "Los modelos con función de enlace no se compilan"
+
+    X[0, 0] = -np.inf
+    with pytest.raises(ValueError):
+        kernel.predict(X)
+
+def test_serving_without_sklearn():
+    import subprocess
+    import sys
+
+    # la configuración por defecto y la carga del registro, como en cada worker
+    code = (
+        "import sys; from api.main import app; snapshot = app.state.registry.load(); "
+        "assert type(snapshot.model).__name__ == 'LinearKernel', type(snapshot.model); "
+        "assert 'sklearn' not in sys.modules, 'sklearn importado'"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_audit_log_writer(tmp_path):
+    import csv
+    import threading
+    from modules import AuditLogWriter
+
+    path = str(tmp_path / "audit.csv")
+    writer = AuditLogWriter(path, batch_size=16, flush_interval=0.05, max_bytes=2000, backup_count=50)
+    row = {"timestamp": "2024-01-01 00:00:00", "claim_id": 1, "marca_vehiculo": "ferd", "antiguedad_vehiculo": 1,
+           "tipo_poliza": 1, "taller": 1, "partes_a_reparar": 1, "partes_a_reemplazar": 1,
+           "prediction": 1.5, "execution_time": 0.001}
+
+    threads = [threading.Thread(target=writer.write_many, args=([row] * 25,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    files = [path] + sorted(str(p) for p in tmp_path.glob("audit.csv.*"))
+    assert len(files) > 1, "El archivo debe rotar al superar max_bytes"
+    total = 0
+    for file in files:
+        with open(file, newline="", encoding="utf-8") as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        assert all(r["claim_id"] == "1" and r["execution_time"] == "0.001" for r in rows), "Las filas no deben entrelazarse"
+        total += len(rows)
+    assert total == 100 and writer.dropped == 0, "Al cerrar deben escribirse todas las filas pendientes"
+
+    # varios procesos escribiendo y rotando el mismo archivo
+    import multiprocessing
+    from modules.logger_manager import write_csv_rows
+
+    path = str(tmp_path / "procesos.csv")
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=lambda: [write_csv_rows(path, [row] * 5, 2000, 100) for _ in range(20)])
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    total = 0
+    for file in [path] + list(tmp_path.glob("procesos.csv.*")):
+        with open(file, newline="", encoding="utf-8") as csvfile:
+            lines = csvfile.read().splitlines()
+        assert lines[0].startswith("timestamp,") and not any(line.startswith("timestamp,") for line in lines[1:])
+        total += len(lines) - 1
+    assert total == 400, "Cada fila debe escribirse una sola vez"
+
+def test_request_id_and_log_sampling():
+    import logging
+    from modules import request_id_var
+    from modules.logger_manager import JsonFormatter, RequestContextFilter
+
+    response = client.get("/", headers={"X-Request-ID": "abc123"})
+    assert response.headers["X-Request-ID"] == "abc123", "El id de la solicitud debe devolverse en la respuesta"
+    assert client.get("/").headers["X-Request-ID"], "Debe generarse un id si la solicitud no lo trae"
+
+    sampler = RequestContextFilter(info_sample_rate=0.0)
+    info = logging.LogRecord("process_logger", logging.INFO, __file__, 1, "mensaje", None, None)
+    error = logging.LogRecord("process_logger", logging.ERROR, __file__, 1, "error", None, None)
+    assert sampler.filter(info), "Fuera de una solicitud no se muestrea"
+
+    token = request_id_var.set("req-1")
+    try:
+        assert not sampler.filter(info), "Con tasa 0 los INFO de la solicitud se descartan"
+        assert sampler.filter(error), "Los errores nunca se descartan"
+        assert '"request_id": "req-1"' in JsonFormatter().format(error)
+    finally:
+        request_id_var.reset(token)
+
+def test_metrics_endpoint():
+    from modules.metrics import STAGE_ERRORS
+
+    payload = {"claim_id": 7, "marca_vehiculo": "fait", "antiguedad_vehiculo": 3, "tipo_poliza": 1,
+               "taller": 2, "partes_a_reparar": 2, "partes_a_reemplazar": 1}
+    assert client.post("/api/v1/predict/", json=payload).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    for stage in ("request_parsing", "model_retrieval", "predict", "audit_logging"):
+        assert f'hdi_stage_latency_seconds_count{{stage="{stage}"}}' in body, f"Falta el histograma de la etapa {stage}"
+    assert 'hdi_request_latency_seconds_bucket{method="POST",route="/api/v1/predict/",status="200",le="+Inf"}' in body
+    assert "hdi_threadpool_queue_depth" in body
+    assert "hdi_predict_executor_busy_threads" in body and "hdi_predict_executor_queue_depth" in body
+
+    # partes 0 + 0 produce log(0) = -inf y el modelo rechaza la fila
+    payload.update(partes_a_reparar=0, partes_a_reemplazar=0)
+    before = STAGE_ERRORS.value(stage="predict")
+    assert client.post("/api/v1/predict/", json=payload).status_code == 500
+    assert STAGE_ERRORS.value(stage="predict") > before, "Debe contarse el error de la etapa predict"
+    assert 'hdi_stage_errors_total{stage="predict"}' in client.get("/metrics").text
+
+def test_metrics_dill_pipeline_stages(hydra_cfg):
+    from omegaconf import OmegaConf
+    from modules import ArtifactRegistry, predict_frame
+    from modules.metrics import STAGE_LATENCY
+
+    # sin el transform fusionado se miden los pasos dill y el esquema de imputación y tipos
+    cfg = OmegaConf.merge(hydra_cfg, {"pipeline": {"fused": {"enabled": False}}})
+    artifacts = ArtifactRegistry(cfg).load()
+    assert artifacts.fused is None
+    data = pd.read_csv("data/claims_dataset.csv", sep="|").head(10)
+    predict_frame(data, cfg, artifacts)
+
+    stages = [f"pipeline:{step.name}" for step in cfg.pipeline.steps] + ["schema"]
+    for stage in stages:
+        assert STAGE_LATENCY.count(stage=stage) > 0, f"Falta el histograma de la etapa {stage}"
+
+def test_predict_stream_endpoint(tmp_path, monkeypatch):
+    import io
+    import json
+    from modules import PredictionStore
+
+    with open("data/claims_dataset_predict.csv", "rb") as file:
+        expected = pd.read_csv(file, sep="|")
+    with open("data/claims_dataset.csv", "rb") as file:
+        content = file.read()
+
+    response = client.post("/api/v1/predict/stream", content=content)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["claim_id"] for row in rows] == expected["claim_id"].tolist(), "Los resultados deben respetar el orden"
+    assert [row["prediccion"] for row in rows] == pytest.approx(expected["prediccion"].tolist(), abs=1e-3)
+
+    response = client.post("/api/v1/predict/stream?format=csv", content=content)
+    result = pd.read_csv(io.StringIO(response.text), sep="|")
+    assert result["prediccion"].tolist() == pytest.approx(expected["prediccion"].tolist(), abs=1e-3)
+
+    # las filas predichas se registran como en el endpoint por lotes
+    store = PredictionStore(str(tmp_path / "predictions.db"))
+    monkeypatch.setattr(client.app.state, "predictions", store)
+    claims = pd.read_csv(io.BytesIO(content), sep="|").head(3).assign(claim_id=[727271, 727272, 727273])
+    claims["taller"] = claims["taller"].astype(object)
+    claims.loc[1, "taller"] = "x"
+    response = client.post("/api/v1/predict/stream", content=claims.to_csv(sep="|", index=False).encode())
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[1]["error"] is not None
+    store.flush()
+    assert store.history(727271)[0]["prediction"] == pytest.approx(rows[0]["prediccion"])
+    assert store.history(727273)[0]["prediction"] == pytest.approx(rows[2]["prediccion"])
+    assert store.history(727272) == [], "Las filas con error no se registran"
+    store.close()
+
+def test_predict_stream_scores_while_uploading():
+    import socket
+    import threading
+    import time
+    import uvicorn
+
+    # servidor real: el TestClient envía todo el cuerpo antes de leer la respuesta
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    with open("data/claims_dataset.csv", "rb") as file:
+        header, *rows = [line for line in file.read().splitlines() if line.strip()]
+    first = header + b"\n" + b"\n".join(rows * 15) + b"\n"
+    chunk = lambda data: f"{len(data):x}\r\n".encode() + data + b"\r\n"
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+            sock.sendall(b"POST /api/v1/predict/stream HTTP/1.1\r\nHost: test\r\n"
+                         b"Transfer-Encoding: chunked\r\n\r\n" + chunk(first))
+            # el primer bloque se responde antes de que termine la subida
+            data = b""
+            while b'"claim_id"' not in data:
+                data += sock.recv(65536)
+            sock.sendall(chunk(b"\n".join(rows) + b"\n") + b"0\r\n\r\n")
+            while not data.endswith(b"0\r\n\r\n"):
+                data += sock.recv(65536)
+        assert data.count(b'"claim_id"') == len(rows) * 16
+    finally:
+        server.should_exit = True
+        thread.join()
+
+def test_offline_scoring(hydra_cfg, tmp_path):
+    from modules.offline import score_file
+
+    expected = pd.read_csv("data/claims_dataset_predict.csv", sep="|")
+    output = tmp_path / "predicciones.parquet"
+    report = score_file("data/claims_dataset.csv", str(output), hydra_cfg, workers=2, shards=7, chunk_rows=2)
+
+    result = pd.read_parquet(output)
+    assert result["claim_id"].tolist() == expected["claim_id"].tolist(), "Cada fila debe escribirse una vez y en orden"
+    assert result["prediccion"].tolist() == pytest.approx(expected["prediccion"].tolist(), abs=1e-3)
+    assert report["rows"] == len(expected) and report["errors"] == 0
+    assert sum(stats["rows"] for stats in report["workers"].values()) == len(expected)
+
+def test_prediction_cache(tmp_path):
+    import time
+    from modules import PredictionCache
+    from modules.cache import SQLiteCacheTier
+
+    cache = PredictionCache(max_entries=2, ttl_seconds=60)
+    cache.put("v1", ("a",), 1.0)
+    cache.put("v1", ("b",), 2.0)
+    assert cache.get("v1", ("a",)) == 1.0
+    cache.put("v1", ("c",), 3.0)
+    assert cache.get("v1", ("b",)) is None, "Debe descartarse la entrada usada hace más tiempo"
+    assert len(cache) == 2 and cache.hits == 1 and cache.misses == 1
+    assert cache.get("v2", ("a",)) is None and len(cache) == 0, "Una nueva versión debe invalidar la caché"
+
+    expiring = PredictionCache(max_entries=10, ttl_seconds=0.01)
+    expiring.put("v1", ("a",), 1.0)
+    time.sleep(0.02)
+    assert expiring.get("v1", ("a",)) is None, "Las entradas deben caducar"
+
+    # el nivel en disco se comparte entre instancias (procesos)
+    path = str(tmp_path / "cache.sqlite")
+    PredictionCache(10, 60, SQLiteCacheTier(path, 60)).put("v1", ("a",), 1.5)
+    other = PredictionCache(10, 60, SQLiteCacheTier(path, 60))
+    assert other.get("v1", ("a",)) == 1.5 and other.get("v2", ("a",)) is None
+
+    # endpoint: la segunda solicitud idéntica no pasa por el pipeline
+    payload = {"claim_id": 99, "marca_vehiculo": "chepy", "antiguedad_vehiculo": 9, "tipo_poliza": 3,
+               "taller": 5, "partes_a_reparar": 4, "partes_a_reemplazar": 2}
+    first = client.post("/api/v1/predict/", json=payload).json()
+    hits = app.state.cache.hits
+    assert client.post("/api/v1/predict/", json={**payload, "claim_id": 100}).json() == first
+    assert app.state.cache.hits == hits + 1, "La tupla repetida debe resolverse desde la caché"
+
+def test_rule_engine(hydra_cfg):
+    import numpy as np
+    from modules import ArtifactRegistry, Rule, RuleEngine
+    from modules.rules import RULE_MATCHES
+    from modules.scoring import predict_frame
+
+    engine = RuleEngine([
+        Rule(name="tipo_4", field="tipo_poliza", op="eq", value=4, prediction=-1),
+        Rule(name="taller_viejo", field="taller", op="in", value=[6, 7], prediction=0),
+    ])
+    df = pd.DataFrame({"tipo_poliza": [4, 1, 4, 2], "taller": [6, 1, 1, 7]})
+    matched, predicciones = engine.evaluate(df)
+    assert matched.tolist() == [True, False, True, True]
+    assert predicciones[[0, 2, 3]].tolist() == [-1, -1, 0], "Debe aplicarse la primera regla que se cumple"
+    assert np.isnan(predicciones[1])
+    with pytest.raises(ValueError):
+        RuleEngine([Rule(name="x", field="taller", op="like", value=1, prediction=0)])
+
+    # las filas resueltas por una regla no pasan por el modelo: partes 0 + 0 no falla
+    snapshot = ArtifactRegistry(hydra_cfg).load()
+    data = pd.DataFrame([
+        {"claim_id": 1, "marca_vehiculo": "ford", "antiguedad_vehiculo": 5, "tipo_poliza": 4,
+         "taller": 1, "partes_a_reparar": 0, "partes_a_reemplazar": 0},
+        {"claim_id": 2, "marca_vehiculo": "fait", "antiguedad_vehiculo": 3, "tipo_poliza": 1,
+         "taller": 2, "partes_a_reparar": 2, "partes_a_reemplazar": 1},
+    ])
+    expected = predict_frame(data.iloc[[1]].reset_index(drop=True), hydra_cfg, snapshot)[0]
+    before = RULE_MATCHES.value(rule="tipo_poliza_4")
+    predicciones = predict_frame(data, hydra_cfg, snapshot)
+    assert predicciones[0] == -1 and predicciones[1] == pytest.approx(expected)
+    assert RULE_MATCHES.value(rule="tipo_poliza_4") == before + 1
+
+    payload = data.iloc[0].to_dict()
+    response = client.post("/api/v1/predict/", json={k: int(v) if k != "marca_vehiculo" else v for k, v in payload.items()})
+    assert response.status_code == 200 and response.text == '{"prediccion":-1}'
+
+def _training_frame(cfg, size, seed=0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "claim_id": np.arange(size),
+        "marca_vehiculo": rng.choice(["chepy", "fait", "ferd"], size),
+        "antiguedad_vehiculo": rng.integers(1, 11, size),
+        "tipo_poliza": rng.integers(1, 4, size),
+        "taller": rng.integers(1, 6, size),
+        "partes_a_reparar": rng.integers(1, 6, size),
+        "partes_a_reemplazar": rng.integers(1, 6, size),
+    })
+    X = full_pipeline(data.copy(), cfg)[list(cfg.train.features)].to_numpy(dtype=float)
+    data["semanas_en_taller"] = X @ [2.0, -0.5, 1e-4, 0.002, -0.3] + 9 + rng.normal(0, 0.1, size)
+    return data, X
+
+def test_streaming_training(hydra_cfg, tmp_path):
+    import numpy as np
+    from omegaconf import OmegaConf
+    from sklearn.linear_model import LinearRegression
+    from modules import load_linear_model
+    from modules.training import holdout_mask, train_model_streaming, train_streaming
+
+    data, X = _training_frame(hydra_cfg, 3000)
+    features = list(hydra_cfg.train.features)
+    path = tmp_path / "train.csv"
+    data.to_csv(path, sep="|", index=False)
+
+    # referencia: sklearn en memoria sobre las mismas filas de entrenamiento
+    test = holdout_mask(data["claim_id"], hydra_cfg.train.test_size, hydra_cfg.train.random_state)
+    reference = LinearRegression().fit(X[~test], data["semanas_en_taller"][~test])
+
+    model, metrics = train_streaming(str(path), hydra_cfg, workers=1, chunk_rows=500)
+    np.testing.assert_allclose(model.coef_, reference.coef_, rtol=1e-6)
+    assert model.intercept_ == pytest.approx(reference.intercept_, rel=1e-6)
+    assert metrics["train_rows"] == (~test).sum() and metrics["test_rows"] == test.sum()
+    assert metrics["test_r2"] == pytest.approx(reference.score(X[test], data["semanas_en_taller"][test]), rel=1e-6)
+    np.testing.assert_allclose(model.predict(pd.DataFrame(X, columns=features)), reference.predict(X), rtol=1e-6)
+
+    # la reducción entre procesos da el mismo ajuste
+    parallel, _ = train_streaming(str(path), hydra_cfg, workers=2, chunk_rows=300)
+    np.testing.assert_allclose(parallel.coef_, model.coef_, rtol=1e-8)
+
+    cfg = OmegaConf.merge(hydra_cfg, {"train": {"log_mlflow": False},
+                                      "models": {"retrained_model_path": str(tmp_path / "modelo.json")}})
+    result = train_model_streaming(str(path), cfg)
+    np.testing.assert_allclose(load_linear_model(result["model_path"]).coef_, model.coef_)
+
+def test_training_job_queue(hydra_cfg, tmp_path):
+    import io
+    import time
+    from omegaconf import OmegaConf
+    from modules import TrainingJobQueue, load_linear_model
+
+    data, _ = _training_frame(hydra_cfg, 2000)
+    content = data.to_csv(sep="|", index=False).encode()
+    cfg = OmegaConf.merge(hydra_cfg, {
+        "jobs": {"dir": str(tmp_path / "jobs"), "nice": 0},
+        "train": {"log_mlflow": False, "chunk_rows": 500},
+        "models": {"retrained_model_path": str(tmp_path / "modelo.json")},
+    })
+    queue = TrainingJobQueue(cfg)
+    app.state.training = queue
+    try:
+        response = client.post("/api/v1/train/", files={"file": ("train.csv", content)})
+        assert response.status_code == 202, "El entrenamiento debe encolarse sin esperar el ajuste"
+        job_id = response.json()["job_id"]
+
+        # con un solo proceso, el segundo trabajo queda encolado y se cancela de inmediato
+        queued = queue.submit(io.BytesIO(content))["job_id"]
+        assert client.delete(f"/api/v1/train/jobs/{queued}").status_code == 200
+
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            job = client.get(f"/api/v1/train/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed", "cancelled"):
+                break
+            time.sleep(0.2)
+        assert job["status"] == "succeeded", job
+        assert job["progress"]["fraction"] == 1.0 and job["result"]["train_rows"] > 0
+        assert load_linear_model(str(tmp_path / "modelo.json")).n_features_in_ == 5
+        assert queue.status(queued)["status"] == "cancelled"
+        assert {j["job_id"] for j in client.get("/api/v1/train/jobs").json()["jobs"]} == {job_id, queued}
+        assert client.get("/api/v1/train/jobs/" + "0" * 32).status_code == 404
+        assert client.get("/api/v1/train/jobs/no-existe").status_code == 404
+    finally:
+        queue.close()
+
+def test_versioned_registry_and_shadow(hydra_cfg, tmp_path):
+    import os
+    import shutil
+    import numpy as np
+    from omegaconf import OmegaConf
+    from modules import ArtifactRegistry, LinearKernel, ShadowScorer, export_linear_model, load_model
+    from modules.scoring import predict_frame
+
+    cfg = OmegaConf.merge(hydra_cfg, {"registry": {"check_interval": 0, "store": {"path": str(tmp_path / "store")},
+                                                   "shadow": {"sample_rate": 1.0}}})
+    registry = ArtifactRegistry(cfg)
+    before = registry.load()
+    data = pd.read_csv("data/claims_dataset.csv", sep="|")
+    expected = predict_frame(data.copy(), cfg, before)
+
+    # candidata: mismo pipeline con coeficientes distintos; solo se publican modelos de models/
+    model = load_model(cfg)
+    export_linear_model(LinearKernel(model.feature_names_in_, model.coef_ * 1.1, model.intercept_),
+                        str(tmp_path / "candidata.json"))
+    with pytest.raises(ValueError):
+        registry.store.publish_from_config(cfg, str(tmp_path / "candidata.json"))
+    candidate_path = os.path.join("models", f"candidata-{os.getpid()}.json")
+    shutil.copyfile(tmp_path / "candidata.json", candidate_path)
+    try:
+        current = registry.store.publish_from_config(cfg)["version"]
+        candidate = registry.store.publish_from_config(cfg, candidate_path)["version"]
+    finally:
+        os.remove(candidate_path)
+    assert [m["version"] for m in registry.store.versions()] == [candidate, current]
+
+    activated = registry.activate(current)
+    assert registry.snapshot() is activated and activated.version == current
+    np.testing.assert_allclose(predict_frame(data.copy(), cfg, activated), expected)
+    np.testing.assert_allclose(predict_frame(data.copy(), cfg, before), expected), "Las solicitudes en curso conservan su snapshot"
+
+    # otro proceso toma los punteros en su siguiente comprobación
+    registry.set_shadow(candidate)
+    other = ArtifactRegistry(cfg)
+    assert other.load().version == current and other.shadow_snapshot().version == candidate
+
+    shadow = ShadowScorer(cfg, registry)
+    claims = data.astype(object).where(data.notna(), None).to_dict("records")
+    valid = [claim for claim in claims if claim["marca_vehiculo"] is not None and claim["antiguedad_vehiculo"] is not None]
+    primary = predict_frame(pd.DataFrame(valid), cfg, activated)
+    assert shadow.submit(valid, primary, 0.001)
+    shadow._executor.submit(lambda: None).result()
+    stats = shadow.stats()
+    assert stats["version"] == candidate and stats["requests"] == 1 and stats["rows"] == len(valid)
+    assert stats["mean_abs_delta"] > 0, "La candidata predice distinto y la diferencia debe registrarse"
+    shadow.close()
+
+    registry.set_shadow(None)
+    assert other.refresh() is False and other.shadow_snapshot() is None
+
+    # endpoints de administración
+    previous = app.state.registry, app.state.shadow
+    app.state.registry, app.state.shadow = registry, ShadowScorer(cfg, registry)
+    try:
+        listing = client.get("/api/v1/registry/versions").json()
+        assert listing["active"] == current and listing["shadow"] is None
+        assert client.post("/api/v1/registry/versions/v20000101T000000-00000000/activate").status_code == 404
+        for model_path in ("/etc/passwd", "models/../config/config.yaml", "models/claim_model.py"):
+            response = client.post("/api/v1/registry/versions", json={"model_path": model_path})
+            assert response.status_code == 400, f"{model_path} no debe poder publicarse"
+        assert len(client.get("/api/v1/registry/versions").json()["versions"]) == 2
+        assert client.put("/api/v1/registry/shadow", json={"version": candidate}).json()["version"] == candidate
+        # en lotes solo se comparan las filas que pasan por el modelo: no las de reglas ni caché
+        batch = [{**valid[0], "claim_id": 1, "antiguedad_vehiculo": 37},
+                 {**valid[0], "claim_id": 2, "tipo_poliza": 4}]
+        for _ in range(2):
+            assert client.post("/api/v1/predict/batch", json=batch).status_code == 200
+            app.state.shadow._executor.submit(lambda: None).result()
+        stats = app.state.shadow.stats()
+        assert stats["requests"] == 1 and stats["rows"] == 1
+        assert client.post(f"/api/v1/registry/versions/{candidate}/activate").json() == {"active": candidate}
+        assert client.post("/api/v1/predict/", json=valid[0]).status_code == 200
+    finally:
+        app.state.shadow.close()
+        app.state.registry, app.state.shadow = previous
+
+def test_frozen_config_and_cold_start(hydra_cfg, tmp_path, monkeypatch):
+    import os
+    import pickle
+    import subprocess
+    import sys
+    from omegaconf import OmegaConf
+    from modules import FrozenConfig, compile_config, load_config
+
+    path = str(tmp_path / "config.frozen.json")
+    compile_config(path=path)
+    monkeypatch.setenv("HOST", "127.0.0.1")
+    cfg = load_config(path=path)
+    assert isinstance(cfg, FrozenConfig) and cfg.api.host == "127.0.0.1", "Las variables de entorno se resuelven al cargar"
+    assert cfg.pipeline.steps[0].name == hydra_cfg.pipeline.steps[0].name and cfg["rules"].get("enabled") is True
+    expected = OmegaConf.to_container(hydra_cfg, resolve=False)
+    expected["api"].update(host="127.0.0.1", port=os.environ.get("PORT"))
+    assert cfg.to_dict() == expected
+    with pytest.raises(AttributeError):
+        cfg.models.model_path = "otro.pkl"
+    assert pickle.loads(pickle.dumps(cfg)) == cfg, "La configuración debe poder enviarse a los procesos del pool"
+
+    # con el snapshot compilado, servir no importa Hydra, OmegaConf, MLflow ni sklearn
+    compile_config()
+    code = (
+        "import sys, api.main; "
+        "loaded = [m for m in ('mlflow', 'sklearn', 'hydra', 'omegaconf', 'joblib', 'uvicorn') if m in sys.modules]; "
+        "assert not loaded, loaded"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    # un cambio en los overrides invalida el snapshot
+    monkeypatch.setenv("CONFIG_OVERRIDES", "cache.max_entries=7")
+    assert load_config(path=path).cache.max_entries == 7
+
+    metrics = client.get("/metrics").text
+    assert 'hdi_startup_seconds{phase="import_modules"}' in metrics and 'hdi_startup_seconds{phase="config"}' in metrics
+
+def test_prefork_server(tmp_path):
+    import json
+    import os
+    import signal
+    import socket
+    import subprocess
+    import sys
+    import time
+    import urllib.request
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, CONFIG_OVERRIDES="server.heartbeat_timeout=2 server.graceful_timeout=5")
+    master = subprocess.Popen([sys.executable, "-m", "api.serve", "--workers", "2", "--host", "127.0.0.1",
+                               "--port", str(port)], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def workers():
+        with open(f"/proc/{master.pid}/task/{master.pid}/children") as file:
+            return set(file.read().split())
+
+    def wait_for(condition, timeout=20):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if condition():
+                    return True
+            except OSError:
+                pass
+            time.sleep(0.1)
+        return False
+
+    def predict():
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/api/v1/predict/", headers={"content-type": "application/json"},
+                                         data=json.dumps({"claim_id": 1, "marca_vehiculo": "ford", "antiguedad_vehiculo": 5, "tipo_poliza": 2,
+                                                          "taller": 1, "partes_a_reparar": 3, "partes_a_reemplazar": 1}).encode())
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.load(response)["prediccion"]
+
+    try:
+        assert wait_for(lambda: predict() is not None), "El servidor pre-fork debe responder"
+        first = workers()
+        assert len(first) == 2
+
+        # un worker que muere se reemplaza
+        crashed = sorted(first)[0]
+        os.kill(int(crashed), signal.SIGKILL)
+        assert wait_for(lambda: len(workers()) == 2 and crashed not in workers()), "El worker caído debe reiniciarse"
+
+        # un worker sin latido (event loop detenido) se mata y se reemplaza
+        hung = sorted(workers())[0]
+        os.kill(int(hung), signal.SIGSTOP)
+        assert wait_for(lambda: len(workers()) == 2 and hung not in workers()), "El worker sin latido debe reiniciarse"
+        assert predict() is not None
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=20) == 0, "El maestro debe drenar los workers y terminar"
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
+
+def test_compiled_schema(hydra_cfg):
+    import numpy as np
+    from modules import ArtifactRegistry, CompiledSchema, SchemaError
+    from modules.imputation import null_imputation
+    from modules.preprocessing import pipeline_run
+    from utils import validate_types
+
+    artifacts = ArtifactRegistry(hydra_cfg).load()
+    assert isinstance(artifacts.schema, CompiledSchema)
+    data = pd.read_csv("data/claims_dataset.csv", sep="|")
+    for pipeline in artifacts.pipelines:
+        data = pipeline_run(data, pipeline)
+    assert data.isna().any().any(), "La prueba necesita nulos que imputar"
+
+    for frame in (data, data.head(1)):
+        expected = validate_types(null_imputation(frame.copy(), artifacts.imputation_dict))
+        pd.testing.assert_frame_equal(artifacts.schema.apply(frame.copy()), expected)
+
+    # errores precisos por columna y por fila
+    schema = CompiledSchema({k: v for k, v in artifacts.imputation_dict.items() if k != "antiguedad_vehiculo"})
+    frame = data.head(4).copy()
+    frame["valor_vehiculo"] = frame["valor_vehiculo"].astype(object)
+    frame.loc[frame.index[1], "valor_vehiculo"] = "no-numerico"
+    frame.loc[frame.index[2], "antiguedad_vehiculo"] = np.nan
+    with pytest.raises(SchemaError) as error:
+        schema.apply(frame)
+    assert {column: rows for column, rows, _ in error.value.errors} == {
+        "valor_vehiculo": [frame.index[1]], "antiguedad_vehiculo": [frame.index[2]]}
+    assert error.value.message_for(frame.index[0]) is None and "no numéricos" in error.value.message_for(frame.index[1])
+    with pytest.raises(SchemaError) as error:
+        schema.apply(frame.drop(columns=["taller", "valor_por_pieza"]))
+    assert error.value.rows is None and [column for column, _, _ in error.value.errors] == ["valor_por_pieza", "taller"]
+
+def test_admission_control(hydra_cfg):
+    import asyncio
+    import math
+    from omegaconf import OmegaConf
+    from modules import AdmissionController, AdmissionRejected, Deadline
+
+    cfg = OmegaConf.merge(hydra_cfg, {"admission": {"max_concurrency": 1, "max_queue": 1, "queue_timeout_ms": 50}})
+    admission = AdmissionController(cfg)
+    unlimited = Deadline(math.inf)
+
+    async def run():
+        statuses = []
+
+        async def request(hold):
+            try:
+                async with admission.admit(unlimited):
+                    await asyncio.sleep(hold)
+                    statuses.append(200)
+            except AdmissionRejected as e:
+                statuses.append(e.status_code)
+
+        # el primero ocupa el hueco, el segundo espera en cola y el tercero encuentra la cola llena
+        first = asyncio.create_task(request(0.2))
+        await asyncio.sleep(0)
+        await asyncio.gather(request(0), request(0))
+        await first
+        assert admission.in_flight == 0 and admission.queued == 0, "Los huecos deben liberarse"
+
+        # un hueco liberado pasa al siguiente en cola
+        await asyncio.gather(request(0.02), request(0))
+        thread = await admission.run(lambda: __import__("threading").current_thread().name)
+
+        # hilos ocupados y tareas en cola del executor, también si se cancela una tarea en cola
+        executor = AdmissionController(OmegaConf.merge(cfg, {"admission": {"executor_workers": 1}}))
+        release = __import__("threading").Event()
+        running = asyncio.create_task(executor.run(release.wait))
+        waiting = asyncio.create_task(executor.run(release.wait))
+        cancelled = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert (executor.executor_busy, executor.executor_queued) == (1, 2)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert executor.executor_queued == 1, "Una tarea cancelada en cola deja de contarse"
+        release.set()
+        await asyncio.gather(running, waiting)
+        assert (executor.executor_busy, executor.executor_queued) == (0, 0)
+        executor.close()
+        return statuses, thread
+
+    statuses, thread = asyncio.run(run())
+    admission.close()
+    assert statuses == [429, 503, 200, 200, 200], "Cola llena con 429, espera agotada con 503"
+    assert thread.startswith("predict"), "El pipeline debe ejecutarse en el executor de predicción"
+
+    with pytest.raises(AdmissionRejected) as error:
+        Deadline(0).check("predict")
+    assert error.value.status_code == 503 and error.value.reason == "deadline"
+
+    # plazo vencido antes del pipeline: 503 con Retry-After; las reglas no pasan por la admisión
+    payload = {"claim_id": 1, "marca_vehiculo": "ferd", "antiguedad_vehiculo": 41, "tipo_poliza": 2,
+               "taller": 1, "partes_a_reparar": 3, "partes_a_reemplazar": 1}
+    response = client.post("/api/v1/predict/", json=payload, headers={"X-Request-Timeout-Ms": "0"})
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    payload["tipo_poliza"] = 4
+    response = client.post("/api/v1/predict/", json=payload, headers={"X-Request-Timeout-Ms": "0"})
+    assert response.json() == {"prediccion": -1}
+
+def test_prediction_store(hydra_cfg, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from omegaconf import OmegaConf
+    from modules import PredictionStore
+
+    store = PredictionStore(str(tmp_path / "predictions.db"), batch_size=2, flush_interval=0.05)
+    claim = Claim(claim_id=7, marca_vehiculo="ferd", antiguedad_vehiculo=3, tipo_poliza=1,
+                  taller=1, partes_a_reparar=2, partes_a_reemplazar=1)
+    store.record([{**claim.dict(), "prediction": 4.5, "execution_time": 0.01}], "v1")
+    assert store.history(7)[0]["prediction"] == 4.5, "Las filas pendientes deben consultarse en memoria"
+    store.record([{**claim.dict(), "prediction": 5.5, "execution_time": 0.01},
+                  {**claim.dict(), "claim_id": 8, "prediction": 1.0, "execution_time": 0.01}], "v2")
+    store.flush()
+    history = store.history(7)
+    assert [row["prediction"] for row in history] == [5.5, 4.5] and history[0]["version"] == "v2"
+    assert store.history(7, limit=1)[0]["prediction"] == 5.5 and store.history(9) == []
+    assert store.lookup(claim, "v2") == 5.5, "Un siniestro ya evaluado debe devolver su predicción"
+    assert store.lookup(claim.copy(update={"taller": 2}), "v2") is None, "Con otras variables se recalcula"
+    assert store.lookup(claim, "v3") is None, "Con otra versión de artefactos se recalcula"
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    assert store.daily(today, today + timedelta(days=1))[0]["count"] == 3
+    plan = store._connection().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM predictions WHERE claim_id = 7 ORDER BY timestamp DESC").fetchall()
+    assert "predictions_claim_id" in str([tuple(row) for row in plan]), "La consulta debe usar el índice"
+    store.close()
+
+    # endpoint y modo idempotente
+    monkeypatch.setattr(client.app.state, "predictions", store)
+    payload = {**claim.dict(), "claim_id": 424242, "antiguedad_vehiculo": 43}
+    prediccion = client.post("/api/v1/predict/", json=payload).json()["prediccion"]
+    response = client.get("/api/v1/predictions/424242")
+    assert response.status_code == 200 and response.json()["predicciones"][0]["prediction"] == prediccion
+    assert client.get("/api/v1/predictions/424243").status_code == 404
+
+    cfg = OmegaConf.merge(client.app.state.cfg.to_dict(), {"predictions": {"idempotent": True}})
+    monkeypatch.setattr(client.app.state, "cfg", cfg)
+    store.flush()
+    with store._connection() as connection:
+        connection.execute("UPDATE predictions SET prediction = -5 WHERE claim_id = 424242")
+    assert client.post("/api/v1/predict/", json=payload).json() == {"prediccion": -5.0}
+    assert len(client.get("/api/v1/predictions/424242").json()["predicciones"]) == 1, "No debe volver a registrarse"
+    # tras activar otra versión la predicción guardada ya no vale
+    with store._connection() as connection:
+        connection.execute("UPDATE predictions SET version = 'anterior' WHERE claim_id = 424242")
+    assert client.post("/api/v1/predict/", json=payload).json() == {"prediccion": prediccion}
+    assert len(client.get("/api/v1/predictions/424242").json()["predicciones"]) == 2
+    store.close()
+
+
+def test_drift_monitor(hydra_cfg, tmp_path, monkeypatch):
+    import numpy as np
+    import pandas as pd
+    from modules import DriftMonitor, QuantileSketch, predict_frame
+    from modules.drift import build_baseline
+
+    # el sketch de cuantiles mantiene el error relativo configurado
+    values = np.random.default_rng(0).lognormal(1.0, 1.0, 100000)
+    sketch = QuantileSketch(0.01)
+    sketch.add_many(values[:10])
+    sketch.add_many(values[10:])
+    sketch.add_many([None])
+    assert sketch.count == len(values)
+    for estimate, exact in zip(sketch.quantiles([0.5, 0.99]), np.quantile(values, [0.5, 0.99])):
+        assert abs(estimate - exact) / exact < 0.02
+
+    # línea base del archivo de entrenamiento y comparación con tráfico desplazado
+    artifacts = client.app.state.registry.load()
+    baseline = build_baseline("data/claims_dataset.csv", hydra_cfg, artifacts, chunk_rows=4)
+    assert baseline.rows == 10 and baseline.sketches["prediction"].count == 10
+    baseline.save(str(tmp_path / "baseline.json"))
+    baseline = DriftMonitor.load(str(tmp_path / "baseline.json"))
+    assert baseline.rows == 10, "La línea base debe sobrevivir al guardado"
+
+    monitor = DriftMonitor(0.01, 0.2, baseline)
+    df = pd.DataFrame([{"claim_id": i, "marca_vehiculo": "tesla", "antiguedad_vehiculo": 40 + i % 5,
+                        "tipo_poliza": 1, "taller": None, "partes_a_reparar": 2,
+                        "partes_a_reemplazar": 1} for i in range(50)])
+    predicciones = predict_frame(df, hydra_cfg, artifacts, monitor=monitor)
+    monitor.observe(df, predicciones)
+    report = monitor.report()
+    assert report["rows"] == 50 and report["baseline_rows"] == 10
+    assert report["features"]["marca_vehiculo"]["unseen"] == {"tesla": 50}
+    assert {"marca_vehiculo", "antiguedad_vehiculo"} <= set(report["drifted"])
+    # marca desconocida y taller nulo terminan imputados en las variables del modelo
+    assert report["imputation"]["marca_vehiculo_encoded"]["rate"] == 1.0
+    assert report["imputation"]["valor_por_pieza"]["rate"] == 1.0, "Los nulos imputados deben contarse"
+
+    # una pasada que falla en el modelo no cuenta sus imputaciones antes de reintentar fila a fila
+    from dataclasses import replace
+    from modules.streaming import score_frame
+
+    class SingleRowModel:
+        feature_names_in_ = artifacts.model.feature_names_in_
+
+        def predict(self, X):
+            if len(X) > 1:
+                raise RuntimeError("solo predice filas sueltas")
+            return artifacts.model.predict(X)
+
+    retried = DriftMonitor(0.01, 0.2)
+    scored = score_frame(df.assign(taller=1), hydra_cfg, replace(artifacts, model=SingleRowModel()), retried)
+    assert scored["error"].isna().all()
+    assert retried.imputation_rows == 50 and retried.imputed["marca_vehiculo_encoded"] == 50
+
+    # endpoint
+    monkeypatch.setattr(client.app.state, "drift", monitor)
+    response = client.get("/api/v1/monitoring/drift")
+    assert response.status_code == 200 and response.json()["rows"] == 50
+    claim = {**df.iloc[0].to_dict(), "taller": 1, "claim_id": 99}
+    client.post("/api/v1/predict/", json=claim)
+    assert client.get("/api/v1/monitoring/drift").json()["rows"] == 51
+    assert client.post("/api/v1/monitoring/drift/reset").status_code == 200
+    assert client.get("/api/v1/monitoring/drift").json()["rows"] == 0
+    monkeypatch.setattr(client.app.state, "drift", None)
+    assert client.get("/api/v1/monitoring/drift").status_code == 409
+
+
+def test_predict_columnar_endpoint(tmp_path, monkeypatch):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from modules import PredictionStore
+
+    claims = [
+        {"claim_id": 1, "marca_vehiculo": "ferd", "antiguedad_vehiculo": 3, "tipo_poliza": 1, "taller": 1,
+         "partes_a_reparar": 2, "partes_a_reemplazar": 1},
+        {"claim_id": 2, "marca_vehiculo": "tesla", "antiguedad_vehiculo": 7, "tipo_poliza": 2, "taller": 3,
+         "partes_a_reparar": 4, "partes_a_reemplazar": 2},
+        {"claim_id": 3, "marca_vehiculo": "fait", "antiguedad_vehiculo": 1, "tipo_poliza": 4, "taller": 2,
+         "partes_a_reparar": 1, "partes_a_reemplazar": 1},
+    ]
+    esperado = [r["prediccion"] for r in client.post("/api/v1/predict/batch", json=claims).json()["predicciones"]]
+
+    # marca como diccionario, taller como float con un nulo y una fila con float no entero
+    table = pa.Table.from_pylist(claims + [{**claims[0], "claim_id": 4}, {**claims[0], "claim_id": 5}])
+    table = table.set_column(1, "marca_vehiculo", table.column("marca_vehiculo").dictionary_encode())
+    table = table.set_column(4, "taller", pa.array([1.0, 3.0, 2.0, None, 1.5]))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/api/v1/predict/columnar", content=sink.getvalue().to_pybytes(),
+                           headers={"content-type": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    result = pa.ipc.open_stream(response.content).read_all().to_pydict()
+    assert result["claim_id"] == [1, 2, 3, 4, 5]
+    assert result["prediccion"][:3] == pytest.approx(esperado), "Debe coincidir con el endpoint JSON"
+    assert result["prediccion"][3:] == [None, None] and "taller" in result["error"][3]
+    assert result["error"][:3] == [None, None, None]
+
+    # Parquet de entrada y de salida
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pylist(claims), sink)
+    response = client.post("/api/v1/predict/columnar?format=parquet", content=sink.getvalue().to_pybytes(),
+                           headers={"content-type": "application/vnd.apache.parquet"})
+    assert response.status_code == 200
+    result = pq.read_table(pa.BufferReader(response.content)).to_pydict()
+    assert result["prediccion"] == pytest.approx(esperado)
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pylist(claims).drop_columns(["taller"]), sink)
+    response = client.post("/api/v1/predict/columnar", content=sink.getvalue().to_pybytes(),
+                           headers={"content-type": "application/vnd.apache.parquet"})
+    assert response.status_code == 422 and "taller" in response.json()["detail"]
+    response = client.post("/api/v1/predict/columnar", content=b"{}", headers={"content-type": "application/json"})
+    assert response.status_code == 415
+
+    # las filas predichas se registran como en el endpoint por lotes
+    store = PredictionStore(str(tmp_path / "predictions.db"))
+    monkeypatch.setattr(client.app.state, "predictions", store)
+    table = pa.Table.from_pylist([{**claim, "claim_id": 626260 + claim["claim_id"]} for claim in claims])
+    table = table.set_column(4, "taller", pa.array([1, None, 2]))
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    response = client.post("/api/v1/predict/columnar", content=sink.getvalue().to_pybytes(),
+                           headers={"content-type": "application/vnd.apache.parquet"})
+    assert response.status_code == 200
+    store.flush()
+    assert store.history(626261)[0]["prediction"] == pytest.approx(esperado[0])
+    assert store.history(626263)[0]["prediction"] == pytest.approx(esperado[2])
+    assert store.history(626262) == [], "Las filas con error no se registran"
+    store.close()
@@ -1,2 +1,2 @@
 from .load_imputation_dict import load_dict
-from .validations import validate_columns_and_types as validate_types
+from .validations import EXPECTED_COLUMNS, validate_columns_and_types as validate_types
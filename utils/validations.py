@@ -1,5 +1,14 @@
 import pandas as pd
 
+# columnas que requiere el modelo y su tipo
+EXPECTED_COLUMNS = {
+    'log_total_piezas': float,
+    'marca_vehiculo_encoded': int,
+    'valor_vehiculo': int,
+    'valor_por_pieza': int,
+    'antiguedad_vehiculo': int
+}
+
 
 def validate_columns_and_types(df):
     """Valida y convierte las columnas al tipo requerido antes de ejecutar el predict.
@@ -10,16 +19,8 @@ def validate_columns_and_types(df):
     Returns:
         DataFrame: DataFrame con columnas convertidas al tipo requerido.
     """
-    expected_columns = {
-        'log_total_piezas': float,
-        'marca_vehiculo_encoded': int,
-        'valor_vehiculo': int,
-        'valor_por_pieza': int,
-        'antiguedad_vehiculo': int
-    }
-
     try:
-        for column, dtype in expected_columns.items():
+        for column, dtype in EXPECTED_COLUMNS.items():
             if column not in df.columns:
                 raise ValueError(f"Falta la columna '{column}' en el DataFrame.")
 